@@ -0,0 +1,42 @@
+import threading
+
+from flask import Flask
+
+from models import db, StoreStatus, StoreTimezone, BusinessHours
+from database import configure_database
+
+
+def make_admin_app(db_uri: str, secret_key: str) -> Flask:
+    from flask_admin import Admin
+    from flask_admin.contrib.sqla import ModelView
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = secret_key  # Required by Flask-Admin
+    configure_database(app, db_uri)
+
+    admin = Admin(app, name="Store Monitoring Admin", url="/", template_mode="bootstrap3")
+    admin.add_view(ModelView(StoreStatus, db.session))
+    admin.add_view(ModelView(StoreTimezone, db.session))
+    admin.add_view(ModelView(BusinessHours, db.session))
+    return app
+
+
+class LazyAdmin:
+    """WSGI app mounted at /admin that imports Flask-Admin and builds its views on the first request."""
+
+    def __init__(self, db_uri: str, secret_key: str):
+        self.db_uri = db_uri
+        self.secret_key = secret_key
+        self._app = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._app is not None
+
+    def __call__(self, environ, start_response):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = make_admin_app(self.db_uri, self.secret_key)
+        return self._app(environ, start_response)
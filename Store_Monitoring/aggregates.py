@@ -0,0 +1,379 @@
+import argparse
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+from sqlalchemy import and_, func, insert
+
+from models import db, StoreStatus, StoreHourlyUptime
+from business_hours import BusinessHoursIndex, report_window_index
+from report_engine import (NS_PER_HOUR, NS_PER_SECOND, POLL_BUFFER, REPORT_WINDOWS, ReportEngine, StoreSchedules,
+                           format_report_rows, to_ns)
+from changes import changed_stores, latest_change_seq
+from report_cache import AGGREGATES_CHANGE_SEQ, set_version, table_versions
+from config import AGGREGATE_HORIZON, logger
+
+HOUR = timedelta(hours=1)
+
+POLL_COLUMNS = ["id", "store_id", "timestamp_utc", "status"]
+
+
+def naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(pytz.UTC).replace(tzinfo=None)
+    return dt
+
+
+def hour_floor(dt: datetime) -> datetime:
+    return naive_utc(dt).replace(minute=0, second=0, microsecond=0)
+
+
+def load_polls_around(start: datetime, end: datetime, store_ids=None) -> pd.DataFrame:
+    """Polls in [start, end] plus, per store, the last poll before start and the first after end."""
+    def scoped(query):
+        return query if store_ids is None else query.filter(StoreStatus.store_id.in_(store_ids))
+
+    columns = (StoreStatus.id, StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.status)
+    inside = scoped(db.session.query(*columns)).filter(
+        StoreStatus.timestamp_utc >= start,
+        StoreStatus.timestamp_utc <= end
+    ).all()
+
+    edges = []
+    for bound, condition in ((func.max, StoreStatus.timestamp_utc < start),
+                             (func.min, StoreStatus.timestamp_utc > end)):
+        edge = scoped(db.session.query(
+            StoreStatus.store_id, bound(StoreStatus.timestamp_utc).label("timestamp_utc")
+        )).filter(condition).group_by(StoreStatus.store_id).subquery()
+        edges += db.session.query(*columns).join(edge, and_(
+            StoreStatus.store_id == edge.c.store_id,
+            StoreStatus.timestamp_utc == edge.c.timestamp_utc
+        )).all()
+
+    polls = pd.DataFrame(inside + edges, columns=POLL_COLUMNS)
+    return polls.sort_values(["store_id", "timestamp_utc", "id"], kind="stable", ignore_index=True)
+
+
+def hourly_buckets(polls: pd.DataFrame, hours_index, ranges: dict) -> pd.DataFrame:
+    """Business-hour uptime/downtime seconds per (store, UTC hour).
+
+    Each poll's status holds until the store's next poll and is clipped to the
+    store's ``[range_start, range_end)`` from ``ranges``; a store's last poll
+    has no successor and contributes nothing. Every hour's piece is measured
+    against the openings placed for its whole poll interval, as ReportEngine
+    measures the interval, so the pieces add up to the report's figures.
+    """
+    store_ids = list(ranges)
+    schedules = StoreSchedules(store_ids, hours_index)
+    valid = schedules.valid_mask()
+    position = {store_id: idx for idx, store_id in enumerate(store_ids) if valid[idx]}
+
+    polls = polls[polls["store_id"].isin(position)]
+    store_idx = polls["store_id"].map(position).to_numpy(dtype=np.int64)
+    ts_ns = pd.to_datetime(polls["timestamp_utc"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    active = (polls["status"] == "active").to_numpy()
+
+    range_ns = np.array([[to_ns(start), to_ns(end)] for start, end in ranges.values()], dtype=np.int64).reshape(-1, 2)
+
+    paired = store_idx[1:] == store_idx[:-1]
+    stores = store_idx[:-1][paired]
+    statuses = active[:-1][paired]
+    poll_starts = ts_ns[:-1][paired]
+    poll_ends = ts_ns[1:][paired]
+    starts = np.maximum(poll_starts, range_ns[stores, 0])
+    ends = np.minimum(poll_ends, range_ns[stores, 1])
+    live = ends > starts
+    stores, statuses, starts, ends = stores[live], statuses[live], starts[live], ends[live]
+    poll_starts, poll_ends = poll_starts[live], poll_ends[live]
+
+    first_hour = starts // NS_PER_HOUR
+    piece_counts = (ends - 1) // NS_PER_HOUR - first_hour + 1
+    piece = np.repeat(np.arange(len(starts)), piece_counts)
+    hour = first_hour[piece] + (np.arange(len(piece)) - np.repeat(np.cumsum(piece_counts) - piece_counts, piece_counts))
+    piece_ns = schedules.business_ns(
+        stores[piece], poll_starts[piece], poll_ends[piece],
+        np.maximum(starts[piece], hour * NS_PER_HOUR),
+        np.minimum(ends[piece], (hour + 1) * NS_PER_HOUR),
+    )
+
+    seconds = piece_ns / NS_PER_SECOND
+    pieces = pd.DataFrame({
+        "store_idx": stores[piece],
+        "hour": hour,
+        "uptime_seconds": np.where(statuses[piece], seconds, 0.0),
+        "downtime_seconds": np.where(statuses[piece], 0.0, seconds),
+    })
+    buckets = pieces.groupby(["store_idx", "hour"], as_index=False, sort=True).sum()
+    buckets.insert(0, "store_id", np.asarray(store_ids, dtype=object)[buckets.pop("store_idx").to_numpy()])
+    buckets.insert(1, "hour_start", pd.to_datetime(buckets.pop("hour") * NS_PER_HOUR))
+    return buckets
+
+
+class HourlyAggregates:
+    """Maintains store_hourly_uptime, the per-store, per-UTC-hour business uptime/downtime table.
+
+    Changes are staged in the current session; callers commit together with the
+    polls that caused them.
+    """
+
+    def __init__(self, horizon: timedelta = AGGREGATE_HORIZON):
+        self.horizon = horizon
+
+    def apply_new_polls(self, ranges: dict):
+        """Recompute the hours touched by new polls; ``ranges`` maps store_id to (first, last) new timestamp.
+
+        A poll changes the interval from the store's previous poll up to its next
+        one, so the recomputed span runs from the previous poll's hour through
+        the next poll's hour.
+        """
+        plans = {}
+        for store_id, (first_ts, last_ts) in ranges.items():
+            first_ts, last_ts = naive_utc(first_ts), naive_utc(last_ts)
+            previous_ts = db.session.query(func.max(StoreStatus.timestamp_utc)).filter(
+                StoreStatus.store_id == store_id, StoreStatus.timestamp_utc < first_ts).scalar()
+            next_ts = db.session.query(func.min(StoreStatus.timestamp_utc)).filter(
+                StoreStatus.store_id == store_id, StoreStatus.timestamp_utc > last_ts).scalar()
+            plans[store_id] = (hour_floor(previous_ts or first_ts), hour_floor(next_ts or last_ts) + HOUR)
+
+        if plans:
+            self._recompute(plans)
+
+    def rebuild(self, since: datetime = None) -> int:
+        """Drop every bucket and rebuild the table from store_status, from ``since`` (default: the horizon)."""
+        span = self._full_span(since)
+        db.session.query(StoreHourlyUptime).delete()
+        set_version(AGGREGATES_CHANGE_SEQ, latest_change_seq())
+        if span is None:
+            return 0
+
+        start, end = span
+        store_ids = [row[0] for row in db.session.query(StoreStatus.store_id).distinct()]
+        buckets = self._buckets({store_id: (start, end) for store_id in store_ids})
+        self._insert(buckets)
+        logger.info(f"Rebuilt {len(buckets)} hourly uptime buckets for {len(store_ids)} stores since {start}")
+        return len(buckets)
+
+    def refresh_changed_stores(self) -> int:
+        """Recompute all buckets of stores logged in store_changes since the last refresh or rebuild.
+
+        Catches edits that bypass apply_new_polls, such as business hours,
+        timezones or polls changed in /admin. Returns the stores refreshed.
+        """
+        refreshed, latest = table_versions().get(AGGREGATES_CHANGE_SEQ, 0), latest_change_seq()
+        if latest <= refreshed:
+            return 0
+
+        store_ids = changed_stores(refreshed)
+        if store_ids is None:
+            self.rebuild()
+            return db.session.query(func.count(StoreStatus.store_id.distinct())).scalar()
+
+        span = self._full_span(None)
+        if span is not None and store_ids:
+            self._recompute({store_id: span for store_id in store_ids})
+        set_version(AGGREGATES_CHANGE_SEQ, latest)
+        logger.info(f"Refreshed hourly uptime buckets of {len(store_ids)} changed stores")
+        return len(store_ids)
+
+    def check_consistency(self, as_of: datetime = None, tolerance_seconds: float = 1.0) -> dict:
+        """Compare an AggregateReport as of ``as_of`` (default: the latest poll) with ReportEngine's from-scratch one."""
+        as_of = as_of or db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        if as_of is None:
+            return {"consistent": True, "checked_stores": 0, "mismatches": []}
+
+        store_ids = [row[0] for row in db.session.query(StoreStatus.store_id).distinct()]
+        aggregated = AggregateReport(as_of, store_ids).compute()
+        expected = ReportEngine(as_of, store_ids).compute().reindex(aggregated.index)
+        drift = (aggregated - expected).abs() * 3600 > tolerance_seconds
+        mismatches = [
+            {
+                "store_id": store_id,
+                "column": column,
+                "aggregated_hours": aggregated.at[store_id, column],
+                "report_hours": expected.at[store_id, column],
+            }
+            for store_id, column in drift.stack().loc[lambda flags: flags].index
+        ]
+        return {
+            "consistent": not mismatches,
+            "checked_stores": len(aggregated),
+            "mismatches": mismatches[:100],
+        }
+
+    def _full_span(self, since):
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        if latest is None:
+            return None
+        end = hour_floor(latest) + HOUR
+        return hour_floor(since) if since else end - self.horizon, end
+
+    def _recompute(self, plans: dict):
+        for store_id, (start, end) in plans.items():
+            db.session.query(StoreHourlyUptime).filter(
+                StoreHourlyUptime.store_id == store_id,
+                StoreHourlyUptime.hour_start >= start,
+                StoreHourlyUptime.hour_start < end
+            ).delete(synchronize_session=False)
+        self._insert(self._buckets(plans))
+
+    def _buckets(self, plans: dict) -> pd.DataFrame:
+        start = min(span[0] for span in plans.values())
+        end = max(span[1] for span in plans.values())
+        scope = list(plans) if len(plans) <= 500 else None
+        polls = load_polls_around(start, end, scope)
+        hours_index = BusinessHoursIndex.build(start, end, scope)
+        return hourly_buckets(polls, hours_index, plans)
+
+    def _insert(self, buckets: pd.DataFrame):
+        if not buckets.empty:
+            db.session.execute(insert(StoreHourlyUptime), buckets.to_dict("records"))
+
+
+class AggregateReport:
+    """Hour/day/week figures summed from store_hourly_uptime instead of raw polls, with ReportEngine's results.
+
+    A window's figures are the buckets from the first whole UTC hour inside it,
+    corrected from raw polls at the window's start: the part before that hour
+    of intervals starting inside the window is added, and the rest of the
+    interval running across the window start is taken off, since ReportEngine
+    only counts polls inside the window. The open interval after each store's
+    last poll is not stored and is added here, and stores without polls around
+    a window get ReportEngine's all-up default. Buckets run up to the latest
+    poll, so a report as of an earlier time is left to ReportEngine.
+    """
+
+    def __init__(self, current_time: datetime, store_ids, hours_index=None):
+        if current_time.tzinfo is None:
+            current_time = pytz.UTC.localize(current_time)
+        self.current_time = current_time
+        self.store_ids = list(store_ids)
+        self.hours_index = hours_index
+
+    def compute(self) -> pd.DataFrame:
+        now = naive_utc(self.current_time)
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        if latest is not None and latest > now:
+            return ReportEngine(self.current_time, self.store_ids, self.hours_index).compute()
+
+        if self.hours_index is None:
+            self.hours_index = report_window_index(self.current_time, self.store_ids)
+        schedules = StoreSchedules(self.store_ids, self.hours_index)
+        valid = schedules.valid_mask()
+        n, now_ns = len(self.store_ids), to_ns(now)
+
+        last_idx, last_ns, last_active = self._last_polls()
+        tail = schedules.business_ns(last_idx, last_ns, np.full(len(last_ns), now_ns, dtype=np.int64))
+        last_seen = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+        last_seen[last_idx] = last_ns
+
+        columns = {}
+        for name, window in REPORT_WINDOWS:
+            since = now - window
+            first_hour = hour_floor(since) if since == hour_floor(since) else hour_floor(since) + HOUR
+            uptime, downtime = self._stored(first_hour)
+            edge_up, edge_down = self._window_start(schedules, since, first_hour)
+            uptime += edge_up
+            downtime += edge_down
+
+            counted = last_ns >= to_ns(since)
+            uptime += np.bincount(last_idx[counted & last_active], weights=tail[counted & last_active], minlength=n)
+            downtime += np.bincount(last_idx[counted & ~last_active], weights=tail[counted & ~last_active], minlength=n)
+
+            empty = np.flatnonzero((last_seen < to_ns(since - POLL_BUFFER)) & valid)
+            uptime[empty] = schedules.business_ns(
+                empty,
+                np.full(len(empty), to_ns(since), dtype=np.int64),
+                np.full(len(empty), now_ns, dtype=np.int64),
+            )
+            downtime[empty] = 0.0
+
+            columns[f"uptime_{name}"] = uptime / NS_PER_HOUR
+            columns[f"downtime_{name}"] = downtime / NS_PER_HOUR
+
+        result = pd.DataFrame(columns, index=pd.Index(self.store_ids, name="store_id"))
+        return result[valid]
+
+    def report_rows(self) -> list[dict]:
+        return format_report_rows(self.compute())
+
+    def _scoped(self, query):
+        return query.filter(StoreStatus.store_id.in_(self.store_ids)) if len(self.store_ids) <= 500 else query
+
+    def _positions(self, polls: pd.DataFrame):
+        position = {store_id: idx for idx, store_id in enumerate(self.store_ids)}
+        polls = polls[polls["store_id"].isin(position)].sort_values(
+            ["store_id", "timestamp_utc", "id"], kind="stable", ignore_index=True)
+        return (
+            polls["store_id"].map(position).to_numpy(dtype=np.int64),
+            pd.to_datetime(polls["timestamp_utc"]).to_numpy(dtype="datetime64[ns]").astype(np.int64),
+            (polls["status"] == "active").to_numpy(),
+        )
+
+    def _stored(self, first_hour: datetime) -> tuple[np.ndarray, np.ndarray]:
+        """Bucket sums per store from ``first_hour`` on, in nanoseconds."""
+        query = db.session.query(
+            StoreHourlyUptime.store_id,
+            func.sum(StoreHourlyUptime.uptime_seconds),
+            func.sum(StoreHourlyUptime.downtime_seconds)
+        ).filter(StoreHourlyUptime.hour_start >= first_hour)
+        if len(self.store_ids) <= 500:
+            query = query.filter(StoreHourlyUptime.store_id.in_(self.store_ids))
+        sums = pd.DataFrame(query.group_by(StoreHourlyUptime.store_id).all(),
+                            columns=["store_id", "uptime", "downtime"])
+        sums = sums.set_index("store_id").reindex(self.store_ids, fill_value=0.0)
+        return (sums["uptime"].to_numpy(dtype=np.float64) * NS_PER_SECOND,
+                sums["downtime"].to_numpy(dtype=np.float64) * NS_PER_SECOND)
+
+    def _window_start(self, schedules, since: datetime, first_hour: datetime) -> tuple[np.ndarray, np.ndarray]:
+        """Corrections in ``[since, first_hour)`` and for the interval running across ``since``, in nanoseconds."""
+        scope = self.store_ids if len(self.store_ids) <= 500 else None
+        store_idx, ts_ns, active = self._positions(load_polls_around(since, first_hour, scope))
+        paired = store_idx[1:] == store_idx[:-1]
+        stores, starts, ends = store_idx[:-1][paired], ts_ns[:-1][paired], ts_ns[1:][paired]
+        statuses = active[:-1][paired]
+        since_ns, hour_ns = to_ns(since), to_ns(first_hour)
+
+        inside = starts >= since_ns
+        added = schedules.business_ns(stores, starts, ends, starts, np.minimum(ends, hour_ns))
+        across = schedules.business_ns(stores, starts, ends, np.maximum(starts, hour_ns), ends)
+        correction = np.where(inside, added, -across)
+
+        n = len(self.store_ids)
+        return (np.bincount(stores[statuses], weights=correction[statuses], minlength=n),
+                np.bincount(stores[~statuses], weights=correction[~statuses], minlength=n))
+
+    def _last_polls(self):
+        """Each store's last poll (the latest by id among polls at the same time)."""
+        latest = self._scoped(db.session.query(
+            StoreStatus.store_id, func.max(StoreStatus.timestamp_utc).label("timestamp_utc")
+        )).group_by(StoreStatus.store_id).subquery()
+        rows = db.session.query(*(getattr(StoreStatus, column) for column in POLL_COLUMNS)).join(latest, and_(
+            StoreStatus.store_id == latest.c.store_id,
+            StoreStatus.timestamp_utc == latest.c.timestamp_utc
+        )).all()
+        store_idx, ts_ns, active = self._positions(pd.DataFrame(rows, columns=POLL_COLUMNS))
+        last = np.ones(len(store_idx), dtype=bool)
+        last[:-1] = store_idx[:-1] != store_idx[1:]
+        return store_idx[last], ts_ns[last], active[last]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the store_hourly_uptime aggregate table")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--since", help="rebuild from this UTC time, e.g. '2023-01-18 00:00:00' "
+                                        "(default: the configured horizon)")
+    parser.add_argument("--as-of", help="check the report as of this UTC time (default: the latest poll)")
+    args = parser.parse_args()
+
+    from app import create_app
+    with create_app().app_context():
+        aggregates = HourlyAggregates()
+        if args.command == "rebuild":
+            aggregates.rebuild(datetime.fromisoformat(args.since) if args.since else None)
+            db.session.commit()
+        else:
+            outcome = aggregates.check_consistency(datetime.fromisoformat(args.as_of) if args.as_of else None)
+            print(json.dumps(outcome, indent=2, default=str))
+            raise SystemExit(0 if outcome["consistent"] else 1)
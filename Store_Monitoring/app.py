@@ -1,51 +1,64 @@
 from flask import Flask
-from models import db, StoreStatus, StoreTimezone, BusinessHours
-from services import StoreMonitoringService
-from routes import health_routes, ingest_routes, report_routes, data_routes
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from models import db
+from routes import health_routes, ingest_routes, report_routes, data_routes, metrics_routes, store_routes, trend_routes
 from utils.errors import register_error_handlers
-from config import DB_URI, logger
-from flask_admin import Admin
-from flask_admin.contrib.sqla import ModelView
+from config import (ADMIN_ENABLED, BOOTSTRAP_CSV_DIR, BOOTSTRAP_MODE, CONSUMER_ENABLED, CONSUMER_PATH, DB_URI,
+                    INGEST_BUFFER_ENABLED, RETENTION_ENABLED, ROLLUPS_ENABLED)
+from admin import LazyAdmin
+from bootstrap import Bootstrap
+from database import configure_database
+from jobs import ReportQueue
+from migrations import upgrade_schema
 
-import os
 
-def create_app():
+def create_app(db_uri: str = DB_URI, bootstrap: str = BOOTSTRAP_MODE, csv_folder: str = BOOTSTRAP_CSV_DIR):
     app = Flask(__name__)
-    app.config["SQLALCHEMY_DATABASE_URI"] = DB_URI
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SECRET_KEY"] = "supersecretkey"  # Required by Flask-Admin
 
-
-    db.init_app(app)
+    configure_database(app, db_uri)
 
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+
+    app.extensions["bootstrap"] = Bootstrap(app, csv_folder, bootstrap)
 
-        if StoreStatus.query.count() == 0 and StoreTimezone.query.count() == 0:
-            csv_folder = "data"
-            if os.path.exists(csv_folder) and any(f.endswith(".csv") for f in os.listdir(csv_folder)):
-                try:
-                    logger.info("Loading initial data from CSV files...")
-                    StoreMonitoringService().load_data_from_csvs(csv_folder)
-                except Exception as e:
-                    logger.warning(f"Could not load CSV data on startup: {e}")
-            else:
-                logger.info("No CSV files found, skipping bootstrap load")
-        else:
-            logger.info("Database already has data, skipping CSV bootstrap load")
-
-    admin = Admin(app, name="Store Monitoring Admin", template_mode="bootstrap3")
-    admin.add_view(ModelView(StoreStatus, db.session))
-    admin.add_view(ModelView(StoreTimezone, db.session))
-    admin.add_view(ModelView(BusinessHours,db.session))
+    if ADMIN_ENABLED:
+        admin = LazyAdmin(db_uri, app.config["SECRET_KEY"])
+        app.extensions["admin_app"] = admin
+        app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/admin": admin})
 
     app.register_blueprint(health_routes.bp)
     app.register_blueprint(ingest_routes.bp)
     app.register_blueprint(report_routes.bp)
     app.register_blueprint(data_routes.bp)
+    app.register_blueprint(metrics_routes.bp)
+    app.register_blueprint(store_routes.bp)
+    app.register_blueprint(trend_routes.bp)
 
     register_error_handlers(app)
 
+    app.extensions["report_queue"] = ReportQueue(app)
+    app.extensions["report_queue"].resume()
+
+    if INGEST_BUFFER_ENABLED:
+        from ingest import IngestBuffer
+        app.extensions["ingest_buffer"] = IngestBuffer(app)
+
+    if RETENTION_ENABLED:
+        from retention import RetentionScheduler
+        app.extensions["retention"] = RetentionScheduler(app)
+
+    if ROLLUPS_ENABLED:
+        from rollups import RollupScheduler
+        app.extensions["rollups"] = RollupScheduler(app)
+
+    if CONSUMER_ENABLED:
+        from consumer import FileTailSource, PollConsumer
+        app.extensions["poll_consumer"] = PollConsumer(app, FileTailSource(CONSUMER_PATH))
+        app.extensions["poll_consumer"].start()
+
     return app
 
 if __name__ == "__main__":
@@ -58,4 +71,3 @@ if __name__ == "__main__":
 
         print(" Flask app failed to start!")
         traceback.print_exc()
-
@@ -0,0 +1,116 @@
+"""
+Load-generate the asyncio ingest gateway: many small concurrent POSTs, with latency, 429s and drain time.
+
+    python benchmarks/bench_gateway.py --requests 5000 --concurrency 200
+    python benchmarks/bench_gateway.py --url http://127.0.0.1:8001 --requests 5000   # a running gateway
+
+Without --url the gateway runs in-process against a throwaway SQLite database,
+so the numbers exclude HTTP parsing but include queueing and batched writes.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ingest import make_polls  # noqa: E402
+
+
+async def post_in_process(gateway, body: bytes) -> int:
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    scope = {"type": "http", "method": "POST", "path": "/ingest",
+             "headers": [(b"content-type", b"application/json")]}
+    await gateway(scope, receive, send)
+    return status[0]
+
+
+async def post_http(url: str, body: bytes) -> int:
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    writer.write(
+        f"POST /ingest HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+async def load(post, polls, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    pending = iter(polls)
+
+    async def client():
+        for poll in pending:
+            started = time.perf_counter()
+            status = await post(json.dumps(poll).encode())
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            await asyncio.sleep(0)  # let the writer task run between requests, as socket I/O would
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def run_in_process(args, db_uri: str) -> dict:
+    from gateway import create_gateway
+
+    gateway = create_gateway(db_uri)
+    gateway.queue_size = args.queue_size
+    result = await load(lambda body: post_in_process(gateway, body), make_polls(args.requests), args.concurrency)
+
+    started = time.perf_counter()
+    await gateway.stop()
+    result["drain_seconds"] = round(time.perf_counter() - started, 3)
+    result["written"] = gateway.stats["written"]
+    result["batches"] = gateway.stats["batches"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--queue-size", type=int, default=20000, help="in-process gateway queue size")
+    parser.add_argument("--url", help="base URL of a running gateway instead of an in-process one")
+    args = parser.parse_args()
+
+    if args.url:
+        result = asyncio.run(load(lambda body: post_http(args.url, body), make_polls(args.requests),
+                                  args.concurrency))
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            result = asyncio.run(run_in_process(args, f"sqlite:///{os.path.join(workdir, 'bench.db')}"))
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare single-row and batched /ingest throughput against a throwaway SQLite database.
+
+    python benchmarks/bench_ingest.py --polls 5000 --batch-size 500
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+
+
+def make_polls(count, stores=200, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 18, 0, 0, 0)
+    return [
+        {
+            "store_id": f"bench-{rng.randrange(stores):04d}",
+            "status": rng.choice(["active", "inactive"]),
+            "timestamp_utc": (start + timedelta(seconds=i, microseconds=rng.randrange(10 ** 6)))
+            .strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+        }
+        for i in range(count)
+    ]
+
+
+def run_single(client, polls):
+    started = time.perf_counter()
+    for poll in polls:
+        response = client.post("/ingest", json=poll)
+        assert response.status_code in (200, 202), response.get_data(as_text=True)
+    elapsed = time.perf_counter() - started
+    return {"requests": len(polls), "polls": len(polls), "seconds": round(elapsed, 3),
+            "requests_per_sec": round(len(polls) / elapsed, 1), "polls_per_sec": round(len(polls) / elapsed, 1)}
+
+
+def run_batched(client, polls, batch_size, ndjson=False):
+    started = time.perf_counter()
+    requests = 0
+    for offset in range(0, len(polls), batch_size):
+        batch = polls[offset:offset + batch_size]
+        if ndjson:
+            response = client.post("/ingest", data="\n".join(json.dumps(poll) for poll in batch),
+                                   content_type="application/x-ndjson")
+        else:
+            response = client.post("/ingest", json=batch)
+        assert response.status_code in (200, 202), response.get_data(as_text=True)
+        requests += 1
+    elapsed = time.perf_counter() - started
+    return {"requests": requests, "polls": len(polls), "seconds": round(elapsed, 3),
+            "requests_per_sec": round(requests / elapsed, 1), "polls_per_sec": round(len(polls) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {}
+    scenarios = [
+        ("single", lambda client, polls: run_single(client, polls)),
+        ("json_array", lambda client, polls: run_batched(client, polls, args.batch_size)),
+        ("ndjson", lambda client, polls: run_batched(client, polls, args.batch_size, ndjson=True)),
+    ]
+    for name, scenario in scenarios:
+        with tempfile.TemporaryDirectory() as workdir:
+            app = create_app(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+            results[name] = scenario(app.test_client(), make_polls(args.polls))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
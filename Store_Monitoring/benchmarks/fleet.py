@@ -0,0 +1,143 @@
+"""
+Synthetic fleet generator: store_status.csv, menu_hours.csv and timezones.csv in the layout of the real data.
+
+    python benchmarks/fleet.py data_bench --stores 1000 --polls-per-hour 1 --days 8
+"""
+
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+TIMEZONES = [
+    "America/Chicago", "America/New_York", "America/Denver", "America/Los_Angeles",
+    "America/Phoenix", "America/Anchorage", "Pacific/Honolulu", "America/Boise",
+]
+DEFAULT_END = datetime(2023, 1, 25, 18, 13, 22)
+STORES_PER_CHUNK = 500
+
+
+def store_ids(stores: int) -> list[str]:
+    return [f"{i:019d}" for i in range(1, stores + 1)]
+
+
+def generate_fleet(out_dir: str, stores: int = 1000, polls_per_hour: float = 1.0, days: int = 8,
+                   overnight_fraction: float = 0.1, missing_hours_fraction: float = 0.1,
+                   missing_timezone_fraction: float = 0.05, flip_probability: float = 0.1,
+                   end: datetime = DEFAULT_END, seed: int = 7) -> dict:
+    """Write the three CSVs to ``out_dir`` and return a summary of what was generated.
+
+    Each store polls ``polls_per_hour`` times an hour with jitter for ``days``
+    days before ``end``; its status flips with ``flip_probability`` per poll.
+    A fraction of stores gets overnight hours, no hours (24x7) or no timezone
+    (the America/Chicago default).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    ids = store_ids(stores)
+
+    polls = _write_store_status(os.path.join(out_dir, "store_status.csv"), ids, polls_per_hour, days,
+                                flip_probability, end, rng)
+    hours_rows, overnight = _write_menu_hours(os.path.join(out_dir, "menu_hours.csv"), ids,
+                                              overnight_fraction, missing_hours_fraction, rng)
+    with_timezone = _write_timezones(os.path.join(out_dir, "timezones.csv"), ids, missing_timezone_fraction, rng)
+
+    return {
+        "stores": stores,
+        "polls": polls,
+        "menu_hours_rows": hours_rows,
+        "overnight_stores": overnight,
+        "stores_with_timezone": with_timezone,
+        "end": end.isoformat(),
+    }
+
+
+def _write_store_status(path, ids, polls_per_hour, days, flip_probability, end, rng) -> int:
+    per_store = max(1, int(round(polls_per_hour * 24 * days)))
+    interval_us = int(days * 86400 * 10 ** 6 / per_store)
+    end_us = np.datetime64(end, "us")
+
+    written = 0
+    with open(path, "w", newline="") as f:
+        f.write("store_id,status,timestamp_utc\n")
+        for offset in range(0, len(ids), STORES_PER_CHUNK):
+            chunk_ids = ids[offset:offset + STORES_PER_CHUNK]
+            slots = np.arange(per_store, dtype=np.int64) * interval_us
+            jitter = rng.integers(0, interval_us, size=(len(chunk_ids), per_store))
+            timestamps = end_us - np.timedelta64(days * 86400 * 10 ** 6, "us") + (slots + jitter).astype("m8[us]")
+
+            flips = rng.random((len(chunk_ids), per_store)) < flip_probability
+            inactive = np.logical_xor.accumulate(flips, axis=1)
+
+            text = np.char.add(np.char.replace(np.datetime_as_string(timestamps.ravel(), unit="us"), "T", " "), " UTC")
+            frame = pd.DataFrame({
+                "store_id": np.repeat(chunk_ids, per_store),
+                "status": np.where(inactive.ravel(), "inactive", "active"),
+                "timestamp_utc": text,
+            })
+            frame.to_csv(f, index=False, header=False)
+            written += len(frame)
+    return written
+
+
+def _write_menu_hours(path, ids, overnight_fraction, missing_hours_fraction, rng) -> tuple[int, int]:
+    rows = overnight = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["store_id", "dayOfWeek", "start_time_local", "end_time_local"])
+        for store_id in ids:
+            draw = rng.random()
+            if draw < missing_hours_fraction:
+                continue
+            if draw < missing_hours_fraction + overnight_fraction:
+                overnight += 1
+                opening, closing = f"{rng.integers(18, 23):02d}:00:00", f"{rng.integers(1, 5):02d}:30:00"
+            else:
+                opening, closing = f"{rng.integers(6, 11):02d}:00:00", f"{rng.integers(17, 23):02d}:00:00"
+            for day in range(7):
+                if rng.random() < 0.1:
+                    continue  # closed that day
+                writer.writerow([store_id, day, opening, closing])
+                rows += 1
+    return rows, overnight
+
+
+def _write_timezones(path, ids, missing_timezone_fraction, rng) -> int:
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["store_id", "timezone_str"])
+        for store_id in ids:
+            if rng.random() < missing_timezone_fraction:
+                continue
+            writer.writerow([store_id, TIMEZONES[rng.integers(len(TIMEZONES))]])
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--stores", type=int, default=1000)
+    parser.add_argument("--polls-per-hour", type=float, default=1.0)
+    parser.add_argument("--days", type=int, default=8)
+    parser.add_argument("--overnight-fraction", type=float, default=0.1)
+    parser.add_argument("--missing-hours-fraction", type=float, default=0.1)
+    parser.add_argument("--missing-timezone-fraction", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    summary = generate_fleet(
+        args.out_dir, stores=args.stores, polls_per_hour=args.polls_per_hour, days=args.days,
+        overnight_fraction=args.overnight_fraction, missing_hours_fraction=args.missing_hours_fraction,
+        missing_timezone_fraction=args.missing_timezone_fraction, seed=args.seed,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
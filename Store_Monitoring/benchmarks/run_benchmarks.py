@@ -0,0 +1,226 @@
+"""
+Benchmark CSV load, /ingest, calculate_uptime_downtime and report generation on a synthetic fleet.
+
+    python benchmarks/run_benchmarks.py run --stores 2000 --output bench.json
+    python benchmarks/run_benchmarks.py run --stores 2000 --baseline baseline.json
+    python benchmarks/run_benchmarks.py compare bench.json baseline.json --tolerance 0.2
+
+Each phase records wall time, throughput, the process RSS high-water mark and,
+with --trace-memory, the peak Python allocation during the phase. ``compare``
+exits 1 when a phase is slower or larger than the baseline by more than the
+tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fleet import DEFAULT_END, generate_fleet, store_ids  # noqa: E402
+
+COMPARED_METRICS = ("seconds", "python_peak_mb")
+
+
+def peak_rss_mb() -> float:
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(phase, trace_memory: bool) -> dict:
+    """Run ``phase()`` (which returns its own counters) and add timing and memory figures."""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    counters = phase() or {}
+    elapsed = time.perf_counter() - started
+
+    result = {"seconds": round(elapsed, 3), **counters}
+    for name, value in counters.items():
+        if name in ("rows", "polls", "stores"):
+            result[f"{name}_per_sec"] = round(value / elapsed, 1) if elapsed > 0 else None
+    if trace_memory:
+        result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def ingest_batches(count: int, stores: list[str], batch_size: int, seed: int = 11):
+    rng = random.Random(seed)
+    for offset in range(0, count, batch_size):
+        yield [
+            {
+                "store_id": rng.choice(stores),
+                "status": rng.choice(["active", "inactive"]),
+                "timestamp_utc": (DEFAULT_END + timedelta(seconds=offset + i, microseconds=rng.randrange(10 ** 6)))
+                .strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+            }
+            for i in range(min(batch_size, count - offset))
+        ]
+
+
+def run(args) -> dict:
+    from app import create_app
+    from jobs import create_job, data_watermark
+    from models import db, COMPLETE
+    from services import StoreMonitoringService
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        fleet_dir = os.path.join(workdir, "fleet")
+        started = time.perf_counter()
+        fleet = generate_fleet(fleet_dir, stores=args.stores, polls_per_hour=args.polls_per_hour, days=args.days,
+                               overnight_fraction=args.overnight_fraction,
+                               missing_hours_fraction=args.missing_hours_fraction,
+                               missing_timezone_fraction=args.missing_timezone_fraction, seed=args.seed)
+        fleet["generate_seconds"] = round(time.perf_counter() - started, 3)
+
+        os.chdir(workdir)  # reports/ and any data/ bootstrap stay inside the throwaway directory
+        app = create_app(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        client = app.test_client()
+        ids = store_ids(args.stores)
+
+        with app.app_context():
+            service = StoreMonitoringService()
+
+            def load():
+                service.load_data_from_csvs(fleet_dir)
+                return {"rows": fleet["polls"] + fleet["menu_hours_rows"] + fleet["stores_with_timezone"]}
+
+            def ingest():
+                requests = 0
+                for batch in ingest_batches(args.ingest_polls, ids, args.ingest_batch):
+                    response = client.post("/ingest", json=batch)
+                    assert response.status_code in (200, 202), response.get_data(as_text=True)
+                    requests += 1
+                return {"polls": args.ingest_polls, "requests": requests}
+
+            def uptime():
+                sample = random.Random(args.seed).sample(ids, min(args.uptime_stores, len(ids)))
+                end = pytz.UTC.localize(DEFAULT_END)
+                for store_id in sample:
+                    service.calculate_uptime_downtime(store_id, end - timedelta(days=7), end)
+                return {"stores": len(sample)}
+
+            def report():
+                job = create_job(data_watermark())
+                service.generate_report_background(job.report_id, app)
+                db.session.refresh(job)  # written from the report's own app context
+                assert job.status == COMPLETE, job.error
+                return {"stores": job.stores_processed}
+
+            phases = [("csv_load", load), ("ingest", ingest), ("uptime", uptime), ("report", report)]
+            for name, phase in phases:
+                if args.phases and name not in args.phases:
+                    continue
+                results[name] = measure(phase, args.trace_memory)
+                print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": {
+                "stores": args.stores, "polls_per_hour": args.polls_per_hour, "days": args.days,
+                "ingest_polls": args.ingest_polls, "uptime_stores": args.uptime_stores,
+            },
+            "fleet": fleet,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> tuple[list[dict], bool]:
+    """Per phase and metric, ``current / baseline``; a ratio above ``1 + tolerance`` is a regression."""
+    rows, regressed = [], False
+    for phase, figures in current["results"].items():
+        base = baseline["results"].get(phase)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if figures.get(metric) is None or not base.get(metric):
+                continue
+            ratio = figures[metric] / base[metric]
+            worse = ratio > 1 + tolerance
+            regressed = regressed or worse
+            rows.append({"phase": phase, "metric": metric, "baseline": base[metric], "current": figures[metric],
+                         "ratio": round(ratio, 3), "regression": worse})
+    return rows, regressed
+
+
+def print_comparison(rows: list[dict], current: dict, baseline: dict):
+    if current["meta"].get("scale") != baseline["meta"].get("scale"):
+        print("warning: benchmark scale differs from the baseline", file=sys.stderr)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else "ok"
+        print(f"{row['phase']:>10} {row['metric']:>15} {row['baseline']:>10} -> {row['current']:>10}"
+              f"  x{row['ratio']:<6} {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate a fleet and benchmark every phase")
+    run_parser.add_argument("--stores", type=int, default=1000)
+    run_parser.add_argument("--polls-per-hour", type=float, default=1.0)
+    run_parser.add_argument("--days", type=int, default=8)
+    run_parser.add_argument("--overnight-fraction", type=float, default=0.1)
+    run_parser.add_argument("--missing-hours-fraction", type=float, default=0.1)
+    run_parser.add_argument("--missing-timezone-fraction", type=float, default=0.05)
+    run_parser.add_argument("--ingest-polls", type=int, default=5000)
+    run_parser.add_argument("--ingest-batch", type=int, default=500)
+    run_parser.add_argument("--uptime-stores", type=int, default=50)
+    run_parser.add_argument("--seed", type=int, default=7)
+    run_parser.add_argument("--phases", nargs="*", choices=["csv_load", "ingest", "uptime", "report"])
+    run_parser.add_argument("--trace-memory", action="store_true", help="record peak Python allocations (slower)")
+    run_parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    run_parser.add_argument("--baseline", help="compare against this results JSON afterwards")
+    run_parser.add_argument("--tolerance", type=float, default=0.2)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        args.output = os.path.abspath(args.output) if args.output else None
+        args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+        current = run(args)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(current, f, indent=2)
+        else:
+            print(json.dumps(current, indent=2))
+        if not args.baseline:
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.current) as f:
+            current = json.load(f)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    rows, regressed = compare(current, baseline, args.tolerance)
+    print_comparison(rows, current, baseline)
+    raise SystemExit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
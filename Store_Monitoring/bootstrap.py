@@ -0,0 +1,83 @@
+import os
+import threading
+import time as timer
+
+from models import db, StoreStatus, StoreTimezone
+from config import logger
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+def has_csvs(csv_folder: str) -> bool:
+    return os.path.isdir(csv_folder) and any(name.endswith(".csv") for name in os.listdir(csv_folder))
+
+
+def database_is_empty() -> bool:
+    return (db.session.query(StoreStatus.id).first() is None
+            and db.session.query(StoreTimezone.id).first() is None)
+
+
+class Bootstrap:
+    """Initial CSV load of an empty database, run inline or in a background thread.
+
+    ``mode`` is ``sync`` (load before create_app returns), ``background``
+    (create_app returns at once and /health reports readiness) or ``off``.
+    Without CSV files in ``csv_folder`` the app is ready straight away.
+    """
+
+    def __init__(self, app, csv_folder: str, mode: str):
+        if mode not in ("sync", "background", "off"):
+            raise ValueError(f"bootstrap mode must be sync, background or off, not {mode}")
+        self.app = app
+        self.csv_folder = csv_folder
+        self.mode = mode
+        self.state = PENDING
+        self.error = None
+        self.stats = None
+        self.seconds = None
+        self._thread = None
+
+        if mode == "off":
+            self.state = READY
+        elif not has_csvs(csv_folder):
+            logger.info("No CSV files found, skipping bootstrap load")
+            self.state = READY
+        elif mode == "sync":
+            self._run()
+        else:
+            self._thread = threading.Thread(target=self._run, name="csv-bootstrap", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return self.state in (READY, FAILED)
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def as_dict(self) -> dict:
+        return {"mode": self.mode, "state": self.state, "error": self.error, "seconds": self.seconds}
+
+    def _run(self):
+        started = timer.perf_counter()
+        with self.app.app_context():
+            try:
+                if not database_is_empty():
+                    logger.info("Database already has data, skipping CSV bootstrap load")
+                else:
+                    self.state = LOADING
+                    logger.info("Loading initial data from CSV files...")
+                    from services import StoreMonitoringService
+                    self.stats = StoreMonitoringService().load_data_from_csvs(self.csv_folder)
+                self.state = READY
+            except Exception as e:
+                self.state, self.error = FAILED, str(e)
+                logger.warning(f"Could not load CSV data on startup: {e}")
+            finally:
+                db.session.remove()
+                self.seconds = round(timer.perf_counter() - started, 3)
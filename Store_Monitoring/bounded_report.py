@@ -0,0 +1,116 @@
+"""
+Memory-bounded report computation for fleets too large to hold a week of polls at once.
+
+Stores are taken in store_id order, a page of at most ``max_stores`` at a
+time, and the page's polls are streamed (``yield_per``) as plain tuples until
+the group holds ``MemoryBudget.max_polls``; the group ends at that store
+boundary and the next one starts right after it. Every cursor is drained or
+closed before a group is handed out, so progress writes between groups never
+share a connection with an open read. Groups are contiguous store_id ranges
+in the database's own collation, so their hours, timezones and archived
+segments are read by range too.
+"""
+
+from sqlalchemy import distinct, func, select
+
+from models import db, StoreStatus
+from report_engine import POLL_BUFFER, REPORT_WINDOWS, ReportEngine
+from memory import MB, current_rss
+from metrics import registry
+from config import REPORT_STREAM_YIELD_PER, REPORT_WRITE_BATCH, logger
+
+# Transient memory per poll while its group is computed: the row tuple, the DataFrame and the
+# per-poll arrays of ReportEngine.compute
+POLL_BYTES = 1024
+MIN_GROUP_POLLS = 1000
+
+
+class MemoryBudget:
+    """How many polls one store group may hold to keep the process RSS under ``limit_bytes``."""
+
+    def __init__(self, limit_bytes: int, poll_bytes: int = POLL_BYTES):
+        self.limit_bytes = limit_bytes
+        self.throttles = 0
+        headroom = limit_bytes - current_rss()
+        if headroom < MIN_GROUP_POLLS * poll_bytes:
+            logger.warning(f"Process already uses {current_rss() / MB:.0f} MB of the {limit_bytes / MB:.0f} MB "
+                           f"report memory limit; computing the smallest store groups")
+        self.max_polls = max(headroom // poll_bytes, MIN_GROUP_POLLS)
+
+    def check(self) -> int:
+        """Current RSS after a group; halves the group size whenever it is over the limit."""
+        rss = current_rss()
+        if rss > self.limit_bytes and self.max_polls > MIN_GROUP_POLLS:
+            self.max_polls = max(self.max_polls // 2, MIN_GROUP_POLLS)
+            self.throttles += 1
+            registry.inc("report_memory_throttles_total")
+            logger.warning(f"Report RSS {rss / MB:.0f} MB is over the {self.limit_bytes / MB:.0f} MB limit; "
+                           f"store groups now hold up to {self.max_polls} polls")
+        return rss
+
+
+class BoundedReport:
+    """ReportEngine over store groups sized by a :class:`MemoryBudget`, read and released one at a time."""
+
+    def __init__(self, current_time, budget: MemoryBudget, yield_per: int = REPORT_STREAM_YIELD_PER,
+                 max_stores: int = REPORT_WRITE_BATCH):
+        self.current_time = current_time
+        self.budget = budget
+        self.yield_per = yield_per
+        self.max_stores = max_stores
+        self.window_start = current_time - max(window for _, window in REPORT_WINDOWS) - POLL_BUFFER
+
+    def store_count(self) -> int:
+        return db.session.execute(select(func.count(distinct(StoreStatus.store_id)))).scalar()
+
+    def store_groups(self):
+        """Yield ``(store_ids, polls)``: consecutive stores and their ``(store_id, timestamp_utc, status)`` polls."""
+        after = None
+        while True:
+            page = select(StoreStatus.store_id).distinct().order_by(StoreStatus.store_id).limit(self.max_stores)
+            if after is not None:
+                page = page.where(StoreStatus.store_id > after)
+            store_ids = db.session.execute(page).scalars().all()
+            if not store_ids:
+                return
+
+            group, polls = self._read_group(store_ids)
+            yield group, polls
+            del polls  # before the next group is read
+            after = group[-1]
+
+    def _read_group(self, store_ids: list) -> tuple[list, list]:
+        position = {store_id: idx for idx, store_id in enumerate(store_ids)}
+        query = select(StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.status).where(
+            StoreStatus.store_id.between(store_ids[0], store_ids[-1]),
+            StoreStatus.timestamp_utc >= self.window_start,
+            StoreStatus.timestamp_utc <= self.current_time,
+        ).order_by(StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.id)
+
+        result = db.session.execute(query.execution_options(yield_per=self.yield_per))
+        polls, current = [], None
+        try:
+            for store_id, timestamp_utc, status in result:
+                if store_id != current:
+                    if len(polls) >= self.budget.max_polls:
+                        # Full: end the group before this store (stores without polls in between included)
+                        return store_ids[:position[store_id]], polls
+                    current = store_id
+                polls.append((store_id, timestamp_utc, status))
+        finally:
+            result.close()
+        return store_ids, polls
+
+    def batches(self):
+        """Yield ``(stores_in_group, report_rows, groups_done, None)``; the group count is not known up front."""
+        done = 0  # counted by hand: enumerate would hold on to the previous group while the next is read
+        for store_ids, polls in self.store_groups():
+            done += 1
+            engine = ReportEngine(self.current_time, store_ids, polls=polls,
+                                  store_range=(store_ids[0], store_ids[-1]))
+            del polls
+            rows = engine.report_rows()
+            del engine
+            rss = self.budget.check()
+            logger.debug(f"Store group {done}: {len(store_ids)} stores, RSS {rss / MB:.0f} MB")
+            yield len(store_ids), rows, done, None
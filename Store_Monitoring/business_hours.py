@@ -0,0 +1,186 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from models import db, BusinessHours, StoreTimezone
+from tz_offsets import offset_table
+from config import DEFAULT_TIMEZONE
+
+US_PER_SECOND = 1_000_000
+US_PER_DAY = 86_400 * US_PER_SECOND
+
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+DEFAULT_BUSINESS_HOURS = [(i, time(0, 0, 0), time(23, 59, 59)) for i in range(7)]
+
+
+def _epoch_us(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    delta = dt - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * US_PER_SECOND + delta.microseconds
+
+
+def _time_us(t: time) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * US_PER_SECOND + t.microsecond
+
+
+class StoreHours:
+    """Compiled business-hour intervals of one store over a fixed range of local days.
+
+    Intervals are kept on the store's local wall-clock axis in microseconds since
+    the epoch, sorted by local day, so a UTC instant only needs the store's offset
+    added before a binary search. ``opens``/``closes`` hold the openings exactly
+    as get_business_hours_in_period walks them (overnight closes spill into the
+    next day); ``member_opens``/``member_closes`` hold the merged, inclusive
+    ranges that is_within_business_hours accepts. UTC offsets come from the
+    zone's OffsetTable rather than a pytz conversion per timestamp.
+    """
+
+    __slots__ = ("offsets", "first_day", "last_day", "days", "opens", "closes", "member_opens", "member_closes")
+
+    def __init__(self, offsets, business_hours: list[tuple], first_day: int, last_day: int):
+        self.offsets = offsets
+        self.first_day = first_day
+        self.last_day = last_day
+        self.days, self.opens, self.closes = [], [], []
+        members = []
+
+        by_weekday = {}
+        for day, start, end in business_hours:
+            by_weekday.setdefault(day, []).append((_time_us(start), _time_us(end), end < start))
+
+        for local_day in range(first_day, last_day + 1):
+            midnight = local_day * US_PER_DAY
+            for start, end, overnight in by_weekday.get((local_day + 3) % 7, ()):  # 1970-01-01 was a Thursday
+                self.days.append(local_day)
+                self.opens.append(midnight + start)
+                self.closes.append(midnight + end + (US_PER_DAY if overnight else 0))
+                if overnight:
+                    members.append((midnight, midnight + end))
+                    members.append((midnight + start, midnight + US_PER_DAY - 1))
+                else:
+                    members.append((midnight + start, midnight + end))
+
+        self.member_opens, self.member_closes = [], []
+        for start, end in sorted(members):
+            if self.member_closes and start <= self.member_closes[-1] + 1:
+                self.member_closes[-1] = max(self.member_closes[-1], end)
+            else:
+                self.member_opens.append(start)
+                self.member_closes.append(end)
+
+    def offset_us(self, dt: datetime) -> int:
+        return self.offsets.offset_us(_epoch_us(dt))
+
+    def local_us(self, dt: datetime) -> int:
+        utc_us = _epoch_us(dt)
+        return utc_us + self.offsets.offset_us(utc_us)
+
+    def covers(self, *local_days: int) -> bool:
+        return all(self.first_day <= day <= self.last_day for day in local_days)
+
+    def local_day(self, dt: datetime) -> int:
+        return self.local_us(dt) // US_PER_DAY
+
+    def contains(self, timestamp: datetime) -> bool:
+        local = self.local_us(timestamp)
+        i = bisect_right(self.member_opens, local) - 1
+        return i >= 0 and local <= self.member_closes[i]
+
+    def overlap_us(self, start: datetime, end: datetime):
+        """Business microseconds in ``[start, end]``, or None when it reaches outside the compiled days."""
+        start_us, end_us = _epoch_us(start), _epoch_us(end)
+        start_offset = self.offsets.offset_us(start_us)
+        local_start = start_us + start_offset
+        local_end = end_us + start_offset
+        first_day = local_start // US_PER_DAY
+        last_day = (end_us + self.offsets.offset_us(end_us)) // US_PER_DAY
+        if not self.covers(first_day, last_day):
+            return None
+
+        lo = bisect_left(self.days, first_day)
+        hi = bisect_right(self.days, last_day)
+
+        total = 0
+        for i in range(lo, hi):
+            period = min(self.closes[i], local_end) - max(self.opens[i], local_start)
+            if period > 0:
+                total += period
+        return total
+
+
+class BusinessHoursIndex:
+    """Timezones and business hours for every store, resolved once per report or data load.
+
+    The two tables are read up front; each store's intervals are compiled on
+    first use for the local days around ``[window_start, window_end]``.
+    """
+
+    def __init__(self, timezones: dict, hours: dict, window_start: datetime, window_end: datetime):
+        self.timezones = timezones
+        self.hours = hours
+        self.window_start = window_start
+        self.window_end = window_end
+        self._compiled = {}
+
+    @classmethod
+    def build(cls, window_start: datetime, window_end: datetime, store_ids=None, store_range=None):
+        """``store_range`` (first, last store_id) narrows the reads in SQL; ``store_ids`` filters what is kept."""
+        wanted = set(store_ids) if store_ids is not None else None
+
+        timezone_rows = db.session.query(StoreTimezone.store_id, StoreTimezone.timezone_str)
+        hour_rows = db.session.query(BusinessHours.store_id, BusinessHours.day_of_week,
+                                     BusinessHours.start_time_local, BusinessHours.end_time_local)
+        if store_range is not None:
+            timezone_rows = timezone_rows.filter(StoreTimezone.store_id.between(*store_range))
+            hour_rows = hour_rows.filter(BusinessHours.store_id.between(*store_range))
+
+        timezones = {}
+        for store_id, timezone_str in timezone_rows.order_by(StoreTimezone.id):
+            if (wanted is None or store_id in wanted) and store_id not in timezones:
+                timezones[store_id] = timezone_str
+
+        hours = {}
+        for store_id, day, start, end in hour_rows.order_by(BusinessHours.id):
+            if wanted is None or store_id in wanted:
+                hours.setdefault(store_id, []).append((day, start, end))
+
+        return cls(timezones, hours, window_start, window_end)
+
+    def get_timezone(self, store_id: str) -> str:
+        return self.timezones.get(store_id, DEFAULT_TIMEZONE)
+
+    def get_business_hours(self, store_id: str) -> list[tuple]:
+        return self.hours.get(store_id) or DEFAULT_BUSINESS_HOURS
+
+    def store(self, store_id: str) -> StoreHours:
+        compiled = self._compiled.get(store_id)
+        if compiled is None:
+            offsets = offset_table(self.get_timezone(store_id))
+            # Two spare days each side: local dates can differ from UTC dates by up to
+            # a day, and overnight openings reach into the following day.
+            first_day = _epoch_us(self.window_start) // US_PER_DAY - 2
+            last_day = _epoch_us(self.window_end) // US_PER_DAY + 2
+            compiled = StoreHours(offsets, self.get_business_hours(store_id), first_day, last_day)
+            self._compiled[store_id] = compiled
+        return compiled
+
+    def is_within_business_hours(self, timestamp: datetime, store_id: str):
+        """True/False, or None when the timestamp falls outside the compiled window."""
+        compiled = self.store(store_id)
+        if not compiled.covers(compiled.local_day(timestamp)):
+            return None
+        return compiled.contains(timestamp)
+
+    def business_hours_in_period(self, store_id: str, start_datetime: datetime, end_datetime: datetime):
+        """Business hours in the period, or None when it reaches outside the compiled window."""
+        overlap = self.store(store_id).overlap_us(start_datetime, end_datetime)
+        return None if overlap is None else overlap / (3600 * US_PER_SECOND)
+
+
+def report_window_index(current_time: datetime, store_ids=None, store_range=None) -> BusinessHoursIndex:
+    """Index covering the week a report looks at, plus the poll buffer before it."""
+    return BusinessHoursIndex.build(current_time - timedelta(weeks=1, hours=2), current_time, store_ids,
+                                    store_range)
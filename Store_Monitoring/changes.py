@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytz
+from sqlalchemy import event, func, inspect, insert
+from sqlalchemy.orm import Session
+
+from models import db, StoreStatus, BusinessHours, StoreTimezone, StoreChange
+
+# Inputs of a store's report rows; a change to any of them makes the store dirty
+TRACKED_MODELS = {BusinessHours: "business_hours", StoreTimezone: "store_timezones", StoreStatus: "store_status"}
+HOURS_SOURCES = ("business_hours", "store_timezones")
+
+
+def record_changes(store_ids, source: str, connection=None) -> int:
+    """Log ``store_ids`` as changed by ``source`` in the caller's transaction; returns the rows logged."""
+    store_ids = sorted(set(store_ids))
+    if store_ids:
+        connection = connection or db.session.connection()
+        now = datetime.utcnow()
+        connection.execute(insert(StoreChange.__table__),
+                           [{"store_id": store_id, "source": source, "changed_at": now} for store_id in store_ids])
+    return len(store_ids)
+
+
+def record_full_change(source: str, connection=None):
+    """Log a change to every store (a reset or reload), so nothing computed before it is reused."""
+    connection = connection or db.session.connection()
+    connection.execute(insert(StoreChange.__table__).values(store_id=None, source=source,
+                                                            changed_at=datetime.utcnow()))
+
+
+def latest_change_seq() -> int:
+    return db.session.query(func.max(StoreChange.id)).scalar() or 0
+
+
+def changed_stores(since_seq: int, sources=None):
+    """Store ids changed after ``since_seq``, or None when a change covered every store."""
+    query = db.session.query(StoreChange.store_id).filter(StoreChange.id > since_seq)
+    if sources:
+        query = query.filter(StoreChange.source.in_(sources))
+    store_ids = {store_id for (store_id,) in query.distinct()}
+    return None if None in store_ids else store_ids
+
+
+def prune_changes(up_to_seq: int) -> int:
+    """Drop log rows no report or aggregate refresh can still ask about."""
+    return StoreChange.query.filter(StoreChange.id <= up_to_seq).delete(synchronize_session=False)
+
+
+def backfilled_stores(polls, latest) -> set:
+    """Stores of ``(store_id, timestamp_utc)`` polls at or before ``latest``, the newest poll already stored.
+
+    Newer polls move the report's current time, so only back-filled ones
+    change results that could otherwise be reused.
+    """
+    if latest is None:
+        return set()
+    return {store_id for store_id, timestamp in polls if _naive(timestamp) <= latest}
+
+
+def _naive(timestamp: datetime) -> datetime:
+    return timestamp.astimezone(pytz.UTC).replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+
+def _previous_store_ids(obj) -> set:
+    history = inspect(obj).attrs.store_id.history
+    return {store_id for store_id in history.deleted if store_id is not None}
+
+
+@event.listens_for(Session, "before_flush")
+def _record_orm_changes(session, flush_context, instances):
+    # Catches Flask-Admin and other ORM edits; bulk writes call record_changes themselves
+    touched = {}
+    new_polls = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = TRACKED_MODELS.get(type(obj))
+        if source is None:
+            continue
+        if source == "store_status" and obj in session.new:
+            new_polls.append((obj.store_id, obj.timestamp_utc))
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        touched.setdefault(source, set()).update({obj.store_id} | _previous_store_ids(obj))
+
+    if new_polls:
+        latest = session.execute(db.select(func.max(StoreStatus.timestamp_utc))).scalar()
+        touched.setdefault("store_status", set()).update(backfilled_stores(new_polls, latest))
+
+    for source, store_ids in sorted(touched.items()):
+        record_changes(store_ids, source, session.connection())
@@ -1,6 +1,130 @@
 import logging
+import os
+from datetime import timedelta
 
-DB_URI = "sqlite:///store_monitoring.db"
+# Database: primary URI, an optional separate URI for report reads (e.g. a replica), pool settings
+# for server databases, and SQLite's busy timeout and WAL journaling (WAL lets reports read a
+# snapshot while /ingest writes)
+DB_URI = os.getenv("DATABASE_URL", "sqlite:///store_monitoring.db")
+REPORT_DB_URI = os.getenv("REPORT_DATABASE_URL", "")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+
+DEFAULT_TIMEZONE = "America/Chicago"
+
+CSV_CHUNK_SIZE = 100_000
+
+# Startup: how an empty database is filled from BOOTSTRAP_CSV_DIR (sync, background or off), and
+# whether /admin is mounted (Flask-Admin is imported on its first request)
+BOOTSTRAP_MODE = os.getenv("BOOTSTRAP_MODE", "background")
+BOOTSTRAP_CSV_DIR = os.getenv("BOOTSTRAP_CSV_DIR", "data")
+ADMIN_ENABLED = os.getenv("ADMIN_ENABLED", "true").lower() == "true"
+
+# Keep store_hourly_uptime up to date on ingest/CSV load and build reports from it
+HOURLY_AGGREGATES_ENABLED = os.getenv("HOURLY_AGGREGATES_ENABLED", "false").lower() == "true"
+AGGREGATE_HORIZON = timedelta(days=int(os.getenv("AGGREGATE_HORIZON_DAYS", "8")))
+
+# Uptime rollups (rollups.py): daily and weekly business uptime per store and for the fleet, served by /trends.
+# When enabled the app refreshes them every ROLLUP_INTERVAL_SECONDS; the first refresh fills
+# ROLLUP_BACKFILL_DAYS of history, `python rollups.py backfill --since ...` reaches further back
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "false").lower() == "true"
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("ROLLUP_INTERVAL_SECONDS", "300"))
+ROLLUP_BACKFILL_DAYS = int(os.getenv("ROLLUP_BACKFILL_DAYS", "90"))
+
+# /ingest: rows per multi-row INSERT, and the optional server-side buffer with its write attempts before
+# a batch is dropped
+INGEST_INSERT_CHUNK = 500
+INGEST_BUFFER_ENABLED = os.getenv("INGEST_BUFFER_ENABLED", "false").lower() == "true"
+INGEST_BUFFER_MAX_ROWS = int(os.getenv("INGEST_BUFFER_MAX_ROWS", "5000"))
+INGEST_BUFFER_MAX_DELAY = float(os.getenv("INGEST_BUFFER_MAX_DELAY", "1.0"))
+INGEST_BUFFER_RETRIES = int(os.getenv("INGEST_BUFFER_RETRIES", "5"))
+
+# Streaming consumer (consumer.py): tail an append-only NDJSON/CSV poll log at CONSUMER_PATH, records per
+# batch, and seconds to wait once caught up; the committed offset is stored under CONSUMER_NAME
+CONSUMER_ENABLED = os.getenv("CONSUMER_ENABLED", "false").lower() == "true"
+CONSUMER_PATH = os.getenv("CONSUMER_PATH", "data/polls.ndjson")
+CONSUMER_NAME = os.getenv("CONSUMER_NAME", "poll-log")
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", "1000"))
+CONSUMER_POLL_INTERVAL = float(os.getenv("CONSUMER_POLL_INTERVAL", "1.0"))
+
+# Asyncio ingest gateway (gateway.py): queued polls before 429, rows per batched write, seconds a
+# batch may wait to fill, largest accepted body, and write attempts before a batch is dropped
+GATEWAY_QUEUE_SIZE = int(os.getenv("GATEWAY_QUEUE_SIZE", "20000"))
+GATEWAY_BATCH_SIZE = int(os.getenv("GATEWAY_BATCH_SIZE", "1000"))
+GATEWAY_FLUSH_INTERVAL = float(os.getenv("GATEWAY_FLUSH_INTERVAL", "0.05"))
+GATEWAY_MAX_BODY_BYTES = int(os.getenv("GATEWAY_MAX_BODY_BYTES", str(4 * 1024 * 1024)))
+GATEWAY_WRITE_RETRIES = int(os.getenv("GATEWAY_WRITE_RETRIES", "3"))
+
+# Report generation: worker processes (1 = compute in the report thread) and shards per worker
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "1"))
+REPORT_SHARDS_PER_WORKER = int(os.getenv("REPORT_SHARDS_PER_WORKER", "4"))
+REPORT_MP_START_METHOD = os.getenv("REPORT_MP_START_METHOD", "spawn")
+
+# Memory-bounded reports: with a ceiling in MB (0 = off), raw-poll reports stream polls in store_id order,
+# REPORT_STREAM_YIELD_PER rows per fetch, and compute store groups sized to keep the process under it.
+# Runs in the report thread; takes precedence over REPORT_WORKERS and skips incremental reuse
+REPORT_MEMORY_LIMIT_MB = int(os.getenv("REPORT_MEMORY_LIMIT_MB", "0"))
+REPORT_STREAM_YIELD_PER = int(os.getenv("REPORT_STREAM_YIELD_PER", "5000"))
+
+# Distributed reports (distributed.py): the report thread splits stores into units of REPORT_UNIT_SIZE that
+# `python distributed.py worker` processes on any host sharing the database lease for
+# REPORT_UNIT_LEASE_SECONDS; a unit fails the report after REPORT_UNIT_MAX_ATTEMPTS claims. The report
+# thread also computes units unless REPORT_COORDINATOR_COMPUTES is false. Takes precedence over the
+# memory-bounded mode and REPORT_WORKERS
+REPORT_DISTRIBUTED = os.getenv("REPORT_DISTRIBUTED", "false").lower() == "true"
+REPORT_UNIT_SIZE = int(os.getenv("REPORT_UNIT_SIZE", "500"))
+REPORT_UNIT_LEASE_SECONDS = int(os.getenv("REPORT_UNIT_LEASE_SECONDS", "300"))
+REPORT_UNIT_MAX_ATTEMPTS = int(os.getenv("REPORT_UNIT_MAX_ATTEMPTS", "3"))
+REPORT_UNIT_POLL_INTERVAL = float(os.getenv("REPORT_UNIT_POLL_INTERVAL", "0.5"))
+REPORT_COORDINATOR_COMPUTES = os.getenv("REPORT_COORDINATOR_COMPUTES", "true").lower() == "true"
+
+# Report files: stores computed and appended per batch, optional gzip for CSV, the file format
+# (csv, parquet or arrow; the columnar ones need pyarrow), whether finished rows are also copied into
+# the report_rows table, and the default/largest page of rows /get_report returns as JSON
+REPORT_WRITE_BATCH = int(os.getenv("REPORT_WRITE_BATCH", "1000"))
+REPORT_GZIP = os.getenv("REPORT_GZIP", "false").lower() == "true"
+REPORT_FORMAT = os.getenv("REPORT_FORMAT", "csv")
+REPORT_DB_TABLE = os.getenv("REPORT_DB_TABLE", "false").lower() == "true"
+REPORT_PAGE_SIZE = int(os.getenv("REPORT_PAGE_SIZE", "1000"))
+REPORT_PAGE_MAX = int(os.getenv("REPORT_PAGE_MAX", "10000"))
+
+# Report job queue: concurrent report threads per process, max queued jobs, and how long a
+# Running job may go without a progress update before it is considered interrupted
+REPORT_CONCURRENCY = int(os.getenv("REPORT_CONCURRENCY", "1"))
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "8"))
+REPORT_JOB_STALE_SECONDS = int(os.getenv("REPORT_JOB_STALE_SECONDS", "3600"))
+
+# Finished reports are reused while the data watermark is unchanged; files past either limit are deleted
+REPORT_CACHE_MAX_REPORTS = int(os.getenv("REPORT_CACHE_MAX_REPORTS", "20"))
+REPORT_CACHE_MAX_AGE_HOURS = float(os.getenv("REPORT_CACHE_MAX_AGE_HOURS", "168"))
+
+# When only hours, timezones or back-filled polls changed since a finished report at the same latest
+# poll, copy its rows and recompute just the stores logged in store_changes
+REPORT_INCREMENTAL = os.getenv("REPORT_INCREMENTAL", "true").lower() == "true"
+
+# Per-store uptime API: stores kept in the in-process LRU, seconds an entry may be reused,
+# and how far back each entry holds polls
+STORE_CACHE_SIZE = int(os.getenv("STORE_CACHE_SIZE", "1024"))
+STORE_CACHE_TTL = float(os.getenv("STORE_CACHE_TTL", "300"))
+STORE_CACHE_HORIZON = timedelta(days=int(os.getenv("STORE_CACHE_HORIZON_DAYS", "8")))
+
+# Retention: days of raw polls kept in store_status (older days are archived to RETENTION_ARCHIVE_DIR
+# as csv or parquet and collapsed into status_segments), and how often the background job runs
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "false").lower() == "true"
+RETENTION_HOT_DAYS = int(os.getenv("RETENTION_HOT_DAYS", "14"))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+RETENTION_ARCHIVE_FORMAT = os.getenv("RETENTION_ARCHIVE_FORMAT", "csv")
+
+# Instrumentation: counters/timings served on /metrics, samples kept per timing for quantiles,
+# and a directory to write a cProfile dump per report_id into (unset = no profiling)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_RESERVOIR_SIZE = int(os.getenv("METRICS_RESERVOIR_SIZE", "1024"))
+REPORT_PROFILE_DIR = os.getenv("REPORT_PROFILE_DIR", "")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("store_monitoring")
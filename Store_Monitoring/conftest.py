@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from app import create_app
+from models import db, StoreStatus
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of the full app, with polls for stores "1" and "2"."""
+    monkeypatch.chdir(tmp_path)  # reports/ is written relative to the working directory
+    app = create_app(f"sqlite:///{tmp_path / 'jobs.db'}")
+    with app.app_context():
+        now = datetime(2023, 1, 25, 18, 0, 0)
+        for store_id in ("1", "2"):
+            for minutes in range(0, 600, 45):
+                db.session.add(StoreStatus(store_id=store_id, status="active",
+                                           timestamp_utc=now - timedelta(minutes=minutes)))
+        db.session.commit()
+        yield app.test_client()
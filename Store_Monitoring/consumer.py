@@ -0,0 +1,273 @@
+"""
+Streaming poll consumer: reads polls from a source and writes them to store_status in batches.
+
+Each batch is validated like /ingest, written with write_polls (so hourly
+aggregates, change tracking and the store cache follow along) and the
+source offset after it is stored in consumer_offsets in the same
+transaction. A crash before the commit means the batch is read again
+(at-least-once). A poll whose (store_id, timestamp_utc) is already stored is
+skipped, even with a different status, so replayed rows are no-ops.
+
+FileTailSource tails an append-only NDJSON or CSV file as a local stand-in
+for a Kafka or Pub/Sub topic; other sources implement ``read`` and
+``end_offset`` the same way.
+
+    python consumer.py --path data/polls.ndjson
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+import time as timer
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from models import db, ConsumerOffset, StoreStatus
+from ingest import validate_polls, write_polls
+from metrics import registry
+from config import (CONSUMER_BATCH_SIZE, CONSUMER_NAME, CONSUMER_PATH, CONSUMER_POLL_INTERVAL, DB_URI,
+                    logger)
+
+KEY_CHUNK = 500  # store ids per lookup of already stored polls
+
+
+class PollSource(ABC):
+    """A stream of poll payloads addressed by an integer offset."""
+
+    @abstractmethod
+    def read(self, offset: int, max_records: int) -> tuple[list, int]:
+        """Up to ``max_records`` payloads after ``offset``, and the offset just past the last one returned."""
+
+    @abstractmethod
+    def end_offset(self) -> int:
+        """Offset after the newest record, for lag."""
+
+    def describe(self) -> dict:
+        return {"type": type(self).__name__}
+
+
+class FileTailSource(PollSource):
+    """Append-only NDJSON or CSV poll log; offsets are byte positions just past each complete line.
+
+    A line without its newline is still being written and is left for the
+    next read. CSV files need the store_status.csv header on their first line.
+    """
+
+    def __init__(self, path: str, fmt: str = None):
+        self.path = path
+        self.format = fmt or ("csv" if path.endswith(".csv") else "ndjson")
+
+    def read(self, offset: int, max_records: int) -> tuple[list, int]:
+        if not os.path.exists(self.path):
+            return [], offset
+        if offset > os.path.getsize(self.path):
+            logger.warning(f"{self.path} is shorter than offset {offset}; it was replaced, reading from the start")
+            offset = 0
+
+        payloads = []
+        with open(self.path, "rb") as f:
+            fields = None
+            if self.format == "csv":
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return [], offset
+                fields = next(csv.reader([header.decode("utf-8")]))
+                offset = max(offset, len(header))
+
+            f.seek(offset)
+            while len(payloads) < max_records:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                text = line.decode("utf-8", errors="replace").strip()
+                if text:
+                    payloads.append(self._parse(text, fields))
+        return payloads, offset
+
+    def end_offset(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def describe(self) -> dict:
+        return {"type": "file", "path": self.path, "format": self.format}
+
+    def _parse(self, text: str, fields):
+        if fields is not None:
+            return dict(zip(fields, next(csv.reader([text]))))
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None  # counted as rejected by validate_polls
+
+
+def stored_poll_keys(records: list[dict]) -> set:
+    """``(store_id, timestamp_utc)`` keys of ``records`` that store_status already holds."""
+    store_ids = sorted({record["store_id"] for record in records})
+    timestamps = [record["timestamp_utc"] for record in records]
+    keys = set()
+    for offset in range(0, len(store_ids), KEY_CHUNK):
+        keys.update(db.session.query(StoreStatus.store_id, StoreStatus.timestamp_utc).filter(
+            StoreStatus.store_id.in_(store_ids[offset:offset + KEY_CHUNK]),
+            StoreStatus.timestamp_utc.between(min(timestamps), max(timestamps))
+        ).all())
+    return keys
+
+
+def committed_offset(name: str) -> int:
+    row = db.session.get(ConsumerOffset, name)
+    return row.position if row else 0
+
+
+def save_offset(name: str, position: int):
+    """Stage the consumer's offset in the current transaction."""
+    row = db.session.get(ConsumerOffset, name)
+    if row is None:
+        db.session.add(ConsumerOffset(name=name, position=position, updated_at=datetime.utcnow()))
+    else:
+        row.position, row.updated_at = position, datetime.utcnow()
+
+
+class PollConsumer:
+    """Moves polls from ``source`` into store_status, one batch per transaction.
+
+    Run it with :meth:`start` (a background thread) or call :meth:`run_once`
+    until it returns 0. Only one consumer should use a given ``name``.
+    """
+
+    def __init__(self, app, source: PollSource, name: str = CONSUMER_NAME, batch_size: int = CONSUMER_BATCH_SIZE,
+                 poll_interval: float = CONSUMER_POLL_INTERVAL):
+        self.app = app
+        self.source = source
+        self.name = name
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stats = {"batches": 0, "consumed": 0, "written": 0, "rejected": 0, "duplicates": 0, "errors": 0}
+        self.last_error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> int:
+        """Consume one batch; returns the payloads read (0 when caught up)."""
+        started = timer.perf_counter()
+        with self.app.app_context():
+            try:
+                offset = committed_offset(self.name)
+                payloads, next_offset = self.source.read(offset, self.batch_size)
+                if next_offset == offset:
+                    return 0
+
+                records, errors = validate_polls(payloads)
+                unique = list({(r["store_id"], r["timestamp_utc"]): r for r in reversed(records)}.values())[::-1]
+                stored = stored_poll_keys(unique) if unique else set()  # earlier batches, any status
+                unique = [r for r in unique if (r["store_id"], r["timestamp_utc"]) not in stored]
+                written = 0
+                if unique:
+                    written = write_polls(unique, in_transaction=lambda: save_offset(self.name, next_offset))
+                else:
+                    save_offset(self.name, next_offset)
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+        for error in errors[:5]:
+            logger.warning(f"Consumer {self.name} rejected a poll before offset {next_offset}: {error['error']}")
+        self._count("consumed", len(payloads))
+        self._count("written", written)
+        self._count("rejected", len(errors))
+        self._count("duplicates", len(records) - written)
+        self.stats["batches"] += 1
+        registry.inc("consumer_bytes_total", next_offset - offset, consumer=self.name)
+        registry.observe("consumer_batch_seconds", timer.perf_counter() - started, consumer=self.name)
+        return len(payloads)
+
+    def drain(self) -> int:
+        """Consume until caught up; returns the payloads read."""
+        total = 0
+        while True:
+            consumed = self.run_once()
+            if not consumed:
+                return total
+            total += consumed
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"consumer-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> dict:
+        with self.app.app_context():
+            try:
+                offset = committed_offset(self.name)
+            finally:
+                db.session.remove()
+        end = self.source.end_offset()
+        return {
+            "name": self.name,
+            "source": self.source.describe(),
+            "running": self._thread is not None,
+            "committed_offset": offset,
+            "end_offset": end,
+            "lag": max(end - offset, 0),
+            "last_error": self.last_error,
+            **self.stats,
+        }
+
+    def _count(self, result: str, amount: int):
+        self.stats[result] += amount
+        if amount and result != "consumed":
+            registry.inc("consumer_polls_total", amount, consumer=self.name, result=result)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                consumed = self.run_once()
+                self.last_error = None
+            except Exception as e:
+                consumed = 0
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+                logger.error(f"Consumer {self.name} batch failed, retrying from its committed offset: {e}")
+            if consumed < self.batch_size:
+                self._stopped.wait(self.poll_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tail a NDJSON/CSV poll log into store_status")
+    parser.add_argument("--path", default=CONSUMER_PATH)
+    parser.add_argument("--name", default=CONSUMER_NAME)
+    parser.add_argument("--format", choices=["ndjson", "csv"])
+    parser.add_argument("--once", action="store_true", help="exit once caught up instead of following the file")
+    parser.add_argument("--db-uri", help="SQLAlchemy URI (default: config.DB_URI)")
+    args = parser.parse_args()
+
+    from parallel_report import make_worker_app
+    from migrations import upgrade_schema
+
+    worker_app = make_worker_app(args.db_uri or DB_URI)
+    with worker_app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+    consumer = PollConsumer(worker_app, FileTailSource(args.path, args.format), args.name)
+    if args.once:
+        consumed = consumer.drain()
+        print(json.dumps({**consumer.status(), "consumed_now": consumed}, indent=2))
+    else:
+        consumer.start()
+        try:
+            while True:
+                timer.sleep(60)
+                logger.info(f"Consumer status: {consumer.status()}")
+        except KeyboardInterrupt:
+            consumer.stop()
@@ -0,0 +1,176 @@
+import csv
+import io
+import time as timer
+
+import pandas as pd
+from sqlalchemy import Column, DateTime, MetaData, String, Table, and_, exists, func, insert, select
+
+from models import db, StoreStatus, BusinessHours, StoreTimezone
+from changes import backfilled_stores, record_changes
+from report_cache import bump_version
+from config import CSV_CHUNK_SIZE, logger
+from metrics import registry
+
+staging_metadata = MetaData()
+
+# Per-connection scratch table: each chunk of polls lands here first and is then
+# copied into store_status with a single INSERT ... SELECT that skips duplicates.
+status_staging = Table(
+    "store_status_staging",
+    staging_metadata,
+    Column("store_id", String(50), nullable=False),
+    Column("timestamp_utc", DateTime, nullable=False),
+    Column("status", String(20), nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+class CsvBulkLoader:
+    """Set-based loader for the store_status, menu_hours and timezones CSVs.
+
+    Files are read in chunks of ``chunk_size`` rows and written with
+    executemany (or COPY on PostgreSQL); nothing is committed here, the caller
+    owns the transaction. Stores whose existing report rows the load changes
+    are logged in store_changes, and inserted hours or timezones bump their
+    table's version so cached reports are not reused.
+    """
+
+    def __init__(self, chunk_size: int = CSV_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.stats = {}
+        self.poll_ranges = {}  # store_id -> (first, last) timestamp read from store_status.csv
+
+    @registry.timed("csv_load_seconds", table="store_status")
+    def load_store_status(self, path: str) -> int:
+        started = timer.perf_counter()
+        connection = db.session.connection()
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        status_staging.create(bind=connection, checkfirst=True)
+
+        rows = inserted = 0
+        try:
+            for chunk in pd.read_csv(path, chunksize=self.chunk_size, dtype={'store_id': str, 'status': str}):
+                timestamps = pd.to_datetime(
+                    chunk['timestamp_utc'].str.removesuffix(' UTC'), format='ISO8601', utc=True
+                ).dt.tz_convert(None)
+                chunk = pd.DataFrame({
+                    'store_id': chunk['store_id'],
+                    'timestamp_utc': timestamps,
+                    'status': chunk['status'],
+                })
+                rows += len(chunk)
+                self._track_ranges(chunk)
+
+                self._stage(connection, chunk)
+                inserted += self._merge_staged(connection)
+                connection.execute(status_staging.delete())
+        finally:
+            status_staging.drop(bind=connection, checkfirst=True)
+
+        if inserted:
+            firsts = [(store_id, first) for store_id, (first, _) in self.poll_ranges.items()]
+            record_changes(backfilled_stores(firsts, latest), "store_status", connection)
+        self._record('store_status', rows, inserted, started)
+        return inserted
+
+    @registry.timed("csv_load_seconds", table="business_hours")
+    def load_business_hours(self, path: str) -> int:
+        started = timer.perf_counter()
+        seen = set(db.session.query(
+            BusinessHours.store_id, BusinessHours.day_of_week,
+            BusinessHours.start_time_local, BusinessHours.end_time_local
+        ))
+
+        rows = inserted = 0
+        for chunk in pd.read_csv(path, chunksize=self.chunk_size, dtype={'store_id': str}):
+            rows += len(chunk)
+            starts = pd.to_datetime(chunk['start_time_local'], format='%H:%M:%S').dt.time
+            ends = pd.to_datetime(chunk['end_time_local'], format='%H:%M:%S').dt.time
+
+            records = []
+            for key in zip(chunk['store_id'], chunk['dayOfWeek'].astype(int), starts, ends):
+                if key not in seen:
+                    seen.add(key)
+                    records.append({
+                        'store_id': key[0],
+                        'day_of_week': int(key[1]),
+                        'start_time_local': key[2],
+                        'end_time_local': key[3]
+                    })
+            if records:
+                db.session.execute(insert(BusinessHours), records)
+                record_changes((record['store_id'] for record in records), "business_hours")
+                inserted += len(records)
+
+        if inserted:
+            bump_version("business_hours")
+        self._record('business_hours', rows, inserted, started)
+        return inserted
+
+    @registry.timed("csv_load_seconds", table="timezones")
+    def load_timezones(self, path: str) -> int:
+        started = timer.perf_counter()
+        seen = {store_id for (store_id,) in db.session.query(StoreTimezone.store_id)}
+
+        rows = inserted = 0
+        for chunk in pd.read_csv(path, chunksize=self.chunk_size, dtype={'store_id': str}):
+            rows += len(chunk)
+            records = []
+            for store_id, timezone_str in zip(chunk['store_id'], chunk['timezone_str']):
+                if store_id not in seen:
+                    seen.add(store_id)
+                    records.append({'store_id': store_id, 'timezone_str': timezone_str})
+            if records:
+                db.session.execute(insert(StoreTimezone), records)
+                record_changes((record['store_id'] for record in records), "store_timezones")
+                inserted += len(records)
+
+        if inserted:
+            bump_version("store_timezones")
+        self._record('timezones', rows, inserted, started)
+        return inserted
+
+    def _track_ranges(self, chunk: pd.DataFrame):
+        bounds = chunk.groupby('store_id')['timestamp_utc'].agg(['min', 'max'])
+        for store_id, first, last in bounds.itertuples():
+            if store_id in self.poll_ranges:
+                known_first, known_last = self.poll_ranges[store_id]
+                first, last = min(first, known_first), max(last, known_last)
+            self.poll_ranges[store_id] = (first, last)
+
+    def _stage(self, connection, chunk: pd.DataFrame):
+        if connection.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+            buffer.seek(0)
+            with connection.connection.cursor() as cursor:
+                cursor.copy_expert(
+                    "COPY store_status_staging (store_id, timestamp_utc, status) FROM STDIN WITH CSV", buffer)
+        else:
+            connection.execute(insert(status_staging), chunk.to_dict('records'))
+
+    def _merge_staged(self, connection) -> int:
+        staged = status_staging.c
+        target = StoreStatus.__table__.c
+        duplicate = exists().where(and_(
+            target.store_id == staged.store_id,
+            target.timestamp_utc == staged.timestamp_utc,
+            target.status == staged.status,
+        ))
+        new_rows = select(staged.store_id, staged.timestamp_utc, staged.status).where(~duplicate).distinct()
+        result = connection.execute(
+            insert(StoreStatus.__table__).from_select(['store_id', 'timestamp_utc', 'status'], new_rows))
+        return result.rowcount
+
+    def _record(self, name: str, rows: int, inserted: int, started: float):
+        elapsed = timer.perf_counter() - started
+        rows_per_sec = rows / elapsed if elapsed > 0 else 0.0
+        self.stats[name] = {
+            "rows_read": rows,
+            "inserted": inserted,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows_per_sec, 1)
+        }
+        registry.inc("csv_rows_read_total", rows, table=name)
+        registry.inc("csv_rows_inserted_total", inserted, table=name)
+        logger.info(f"Inserted {inserted} new {name} records from {rows} rows ({rows_per_sec:.0f} rows/sec)")
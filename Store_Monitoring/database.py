@@ -0,0 +1,123 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from flask import Flask, current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from models import db
+from config import (DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, REPORT_DB_URI,
+                    SQLITE_BUSY_TIMEOUT_MS, SQLITE_WAL)
+
+REPORT_ENGINE = "report_engine"  # app.extensions key
+
+_snapshot = threading.local()
+
+
+def engine_options(db_uri: str, read_only: bool = False) -> dict:
+    url = make_url(db_uri)
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if read_only and url.get_backend_name() == "postgresql":
+        options["isolation_level"] = "REPEATABLE READ"
+        options["connect_args"] = {"options": "-c default_transaction_read_only=on"}
+    return options
+
+
+def report_db_uri(db_uri: str):
+    """URI report reads go through: REPORT_DB_URI, a read-only open of a WAL SQLite file, or the primary.
+
+    None when reports cannot get a snapshot apart from writers (in-memory SQLite, or SQLite without WAL).
+    """
+    if REPORT_DB_URI:
+        return REPORT_DB_URI
+    url = make_url(db_uri)
+    if url.get_backend_name() != "sqlite":
+        return db_uri
+    if not SQLITE_WAL or url.database in (None, "", ":memory:") or url.query.get("uri"):
+        return None
+    return f"sqlite:///file:{url.database}?mode=ro&uri=true"
+
+
+def configure_database(app: Flask, db_uri: str):
+    """Point ``app`` at ``db_uri`` with pool/pragma settings from config, plus a read-only report engine."""
+    app.config["SQLALCHEMY_DATABASE_URI"] = db_uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(db_uri)
+    db.init_app(app)
+
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", _sqlite_connect)
+            # Same file as the primary engine, which Flask-SQLAlchemy may have moved under instance/
+            db_uri = db.engine.url.render_as_string(hide_password=False)
+
+    reports_uri = report_db_uri(db_uri)
+    if reports_uri:
+        engine = create_engine(reports_uri, **engine_options(reports_uri, read_only=True))
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", partial(_sqlite_connect, read_only=True))
+            event.listen(engine, "begin", _sqlite_begin)
+        app.extensions[REPORT_ENGINE] = engine
+
+
+def _sqlite_connect(dbapi_connection, connection_record, read_only=False):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    if read_only:
+        # pysqlite only opens transactions for writes; BEGIN is sent in _sqlite_begin instead,
+        # so every read in a report transaction sees the same WAL snapshot
+        dbapi_connection.isolation_level = None
+    elif SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
+
+
+def _sqlite_begin(connection):
+    connection.exec_driver_sql("BEGIN")
+
+
+@contextmanager
+def read_snapshot():
+    """Run the block with db.session on one read-only transaction of the app's report engine.
+
+    Every query in the block sees the data as of its first read, and the
+    reads hold no locks that would stall /ingest. Writes that must happen
+    meanwhile go through :func:`write_session`. Without a report engine the
+    block runs on the ordinary session.
+    """
+    engine = current_app.extensions.get(REPORT_ENGINE)
+    if engine is None or getattr(_snapshot, "previous", None) is not None:
+        yield db.session
+        return
+
+    registry = db.session.registry
+    previous = registry()
+    with engine.connect() as connection:
+        connection.begin()
+        session = Session(bind=connection)
+        _snapshot.previous = previous
+        registry.set(session)
+        try:
+            yield session
+        finally:
+            session.close()
+            registry.set(previous)
+            _snapshot.previous = None
+
+
+def write_session():
+    """The writable session: db.session, or the one set aside by an enclosing :func:`read_snapshot`."""
+    previous = getattr(_snapshot, "previous", None)
+    return previous if previous is not None else db.session()
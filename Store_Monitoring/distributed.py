@@ -0,0 +1,285 @@
+"""
+Distributed report execution: report_units leased to worker processes on any host sharing the database.
+
+With REPORT_DISTRIBUTED set, the report thread acts as the coordinator. It
+splits the report's stores into units, then hands their rows to the report
+writer in unit order as they finish. Workers claim units with a conditional
+UPDATE, like claim_job, so a unit has one leaseholder at a time. A unit whose
+lease ran out (its worker crashed or hung) is claimed again, and a unit that
+used up REPORT_UNIT_MAX_ATTEMPTS claims fails the report. A worker's rows go
+into report_rows in the same transaction that marks its unit done, and only
+while it still holds the lease token, so a worker whose unit was leased again
+writes nothing. Workers only claim units of Running jobs, and planning a
+report first drops units left by an earlier coordinator of the same job.
+
+    python distributed.py worker --db-uri postgresql://...
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time as timer
+import uuid
+from datetime import timedelta
+
+import pytz
+from flask import current_app
+from sqlalchemy import and_, case, func, insert, or_, select
+
+from models import db, ReportJob, ReportRow, ReportUnit, RUNNING, UNIT_DONE, UNIT_FAILED, UNIT_LEASED, UNIT_PENDING
+from database import write_session
+from jobs import utcnow
+from metrics import registry
+from report_writer import REPORT_COLUMNS
+from config import (DB_URI, REPORT_COORDINATOR_COMPUTES, REPORT_UNIT_LEASE_SECONDS, REPORT_UNIT_MAX_ATTEMPTS,
+                    REPORT_UNIT_POLL_INTERVAL, REPORT_UNIT_SIZE, logger)
+
+
+def plan_units(report_id: str, current_time, store_ids, unit_size: int = REPORT_UNIT_SIZE) -> int:
+    """Record ``store_ids`` as pending units of up to ``unit_size`` stores; returns the unit count."""
+    as_of = current_time.astimezone(pytz.UTC).replace(tzinfo=None) if current_time.tzinfo else current_time
+    now = utcnow()
+    chunks = [store_ids[start:start + unit_size] for start in range(0, len(store_ids), unit_size)]
+    units = [
+        {"report_id": report_id, "seq": seq, "as_of": as_of, "store_ids": json.dumps(chunk),
+         "store_count": len(chunk), "status": UNIT_PENDING, "attempts": 0, "updated_at": now}
+        for seq, chunk in enumerate(chunks)
+    ]
+    session = write_session()
+    _delete_units(session, report_id)  # left over when a coordinator died and the job was requeued
+    if units:
+        session.execute(insert(ReportUnit), units)
+    session.commit()
+    return len(units)
+
+
+def claim_unit(worker: str, report_id: str = None, lease_seconds: int = REPORT_UNIT_LEASE_SECONDS,
+               max_attempts: int = REPORT_UNIT_MAX_ATTEMPTS):
+    """Lease the oldest claimable unit (of ``report_id``, or of any report) to ``worker``; None when there is none.
+
+    Only units of Running jobs are claimable, so units a dead coordinator left
+    behind are not computed. A unit whose lease expired ``max_attempts`` times
+    is marked failed instead.
+    """
+    session = write_session()
+    running = select(ReportJob.report_id).where(ReportJob.status == RUNNING)
+    for _ in range(10):  # other workers may take the candidate first
+        now = utcnow()
+        claimable = and_(
+            or_(ReportUnit.status == UNIT_PENDING,
+                and_(ReportUnit.status == UNIT_LEASED, ReportUnit.lease_expires_at < now)),
+            ReportUnit.report_id.in_(running),
+        )
+        query = session.query(ReportUnit.id, ReportUnit.attempts).filter(claimable)
+        if report_id is not None:
+            query = query.filter(ReportUnit.report_id == report_id)
+        candidate = query.order_by(ReportUnit.id).first()
+        if candidate is None:
+            session.commit()
+            return None
+
+        target = session.query(ReportUnit).filter(ReportUnit.id == candidate.id, claimable)
+        if candidate.attempts >= max_attempts:
+            target.update({"status": UNIT_FAILED, "updated_at": now, "error": func.coalesce(
+                ReportUnit.error, f"lease expired on all {candidate.attempts} attempts")}, synchronize_session=False)
+            session.commit()
+            continue
+
+        token = str(uuid.uuid4())
+        claimed = target.update({
+            "status": UNIT_LEASED,
+            "worker": worker,
+            "lease_token": token,
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "attempts": ReportUnit.attempts + 1,
+            "updated_at": now,
+        }, synchronize_session=False)
+        session.commit()
+        if claimed == 1:
+            return session.get(ReportUnit, candidate.id)
+    return None
+
+
+def complete_unit(unit_id: int, token: str, report_id: str, rows: list[dict]) -> bool:
+    """Store a unit's rows and mark it done; False (nothing written) if the lease went to another worker."""
+    session = write_session()
+    try:
+        done = session.query(ReportUnit).filter_by(id=unit_id, lease_token=token, status=UNIT_LEASED).update(
+            {"status": UNIT_DONE, "error": None, "updated_at": utcnow()}, synchronize_session=False)
+        if done != 1:
+            session.rollback()
+            return False
+        if rows:
+            session.execute(insert(ReportRow), [{"report_id": report_id, **row} for row in rows])
+        session.commit()
+        return True
+    except Exception:
+        session.rollback()
+        raise
+
+
+def release_unit(unit_id: int, token: str, error: str, max_attempts: int = REPORT_UNIT_MAX_ATTEMPTS):
+    """Give a unit back after its computation failed: pending for a retry, or failed once out of attempts."""
+    session = write_session()
+    session.query(ReportUnit).filter_by(id=unit_id, lease_token=token, status=UNIT_LEASED).update({
+        "status": case((ReportUnit.attempts >= max_attempts, UNIT_FAILED), else_=UNIT_PENDING),
+        "lease_expires_at": None,
+        "error": error,
+        "updated_at": utcnow(),
+    }, synchronize_session=False)
+    session.commit()
+
+
+def unit_rows(report_id: str, store_ids: list) -> list[dict]:
+    """A done unit's rows from report_rows, in the unit's store order."""
+    session = write_session()
+    columns = [getattr(ReportRow, column) for column in REPORT_COLUMNS]
+    found = session.query(*columns).filter(ReportRow.report_id == report_id, ReportRow.store_id.in_(store_ids))
+    by_store = {row.store_id: dict(zip(REPORT_COLUMNS, row)) for row in found}
+    session.commit()
+    return [by_store[store_id] for store_id in store_ids if store_id in by_store]
+
+
+def drop_units(report_id: str):
+    """Delete a report's units and the partial rows its workers wrote."""
+    session = write_session()
+    _delete_units(session, report_id)
+    session.commit()
+
+
+def _delete_units(session, report_id: str):
+    session.query(ReportUnit).filter_by(report_id=report_id).delete(synchronize_session=False)
+    session.query(ReportRow).filter_by(report_id=report_id).delete(synchronize_session=False)
+
+
+class ReportWorker:
+    """Claims report units and computes them with ``compute(current_time, store_ids) -> report rows``."""
+
+    def __init__(self, app, compute, worker_id: str = None, poll_interval: float = REPORT_UNIT_POLL_INTERVAL):
+        self.app = app
+        self.compute = compute
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self.units_done = 0
+        self._stopped = threading.Event()
+
+    def run_once(self, report_id: str = None) -> bool:
+        """Claim and compute one unit in the current app context; False when none was claimable."""
+        unit = claim_unit(self.worker_id, report_id)
+        if unit is None:
+            return False
+        unit_id, token, unit_report, attempt = unit.id, unit.lease_token, unit.report_id, unit.attempts
+        as_of, store_ids = pytz.UTC.localize(unit.as_of), json.loads(unit.store_ids)
+
+        try:
+            with registry.timer("report_unit_seconds"):
+                rows = self.compute(as_of, store_ids)
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id} failed unit {unit_id} of report {unit_report} "
+                         f"(attempt {attempt}): {e}")
+            db.session.rollback()
+            release_unit(unit_id, token, str(e))
+            registry.inc("report_units_total", result="error")
+            return True
+
+        if complete_unit(unit_id, token, unit_report, rows):
+            self.units_done += 1
+            registry.inc("report_units_total", result="done")
+        else:
+            logger.warning(f"Worker {self.worker_id} lost the lease on unit {unit_id} of report {unit_report}; "
+                           f"its rows were discarded")
+            registry.inc("report_units_total", result="lease_lost")
+        return True
+
+    def run(self, exit_when_idle: bool = False):
+        """Work units until :meth:`stop`, or until none is claimable with ``exit_when_idle``."""
+        while not self._stopped.is_set():
+            with self.app.app_context():
+                try:
+                    worked = self.run_once()
+                except Exception as e:
+                    worked = False
+                    logger.error(f"Worker {self.worker_id} could not claim a unit: {e}")
+                finally:
+                    db.session.remove()
+            if not worked:
+                if exit_when_idle:
+                    return
+                self._stopped.wait(self.poll_interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class ReportCoordinator:
+    """Splits one report's stores into units and collects the finished units' rows in order."""
+
+    def __init__(self, report_id: str, current_time, compute, unit_size: int = REPORT_UNIT_SIZE,
+                 computes: bool = REPORT_COORDINATOR_COMPUTES, poll_interval: float = REPORT_UNIT_POLL_INTERVAL):
+        self.report_id = report_id
+        self.current_time = current_time
+        self.unit_size = unit_size
+        self.poll_interval = poll_interval
+        self.unit_count = 0
+        # The coordinator works its own report's units too, so a fleet without workers still finishes
+        self.worker = ReportWorker(current_app._get_current_object(), compute,
+                                   f"coordinator:{report_id}") if computes else None
+
+    def plan(self, store_ids) -> int:
+        self.unit_count = plan_units(self.report_id, self.current_time, list(store_ids), self.unit_size)
+        logger.info(f"Report {self.report_id} split into {self.unit_count} units of up to {self.unit_size} stores")
+        return self.unit_count
+
+    def batches(self):
+        """Yield ``(stores_in_unit, report_rows, units_done, unit_count)`` in unit order as units finish.
+
+        Units and partial rows are deleted once the last unit is collected, or
+        when the report fails.
+        """
+        session = write_session()
+        try:
+            for seq in range(self.unit_count):
+                while True:
+                    status, attempts, error, store_ids = session.query(
+                        ReportUnit.status, ReportUnit.attempts, ReportUnit.error, ReportUnit.store_ids
+                    ).filter_by(report_id=self.report_id, seq=seq).one()
+                    session.commit()
+                    if status == UNIT_DONE:
+                        break
+                    if status == UNIT_FAILED:
+                        raise Exception(f"Unit {seq} of report {self.report_id} failed after {attempts} attempts: "
+                                        f"{error}")
+                    if self.worker is None or not self.worker.run_once(self.report_id):
+                        timer.sleep(self.poll_interval)
+
+                store_ids = json.loads(store_ids)
+                yield len(store_ids), unit_rows(self.report_id, store_ids), seq + 1, self.unit_count
+        finally:
+            drop_units(self.report_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute distributed report units from the shared database")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--db-uri", help="SQLAlchemy URI (default: config.DB_URI)")
+    parser.add_argument("--exit-when-idle", action="store_true", help="exit once no unit is claimable")
+    args = parser.parse_args()
+
+    from parallel_report import make_worker_app
+    from migrations import upgrade_schema
+    from services import StoreMonitoringService
+
+    worker_app = make_worker_app(args.db_uri or DB_URI)
+    with worker_app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+    report_worker = ReportWorker(worker_app, StoreMonitoringService().compute_report_rows)
+    logger.info(f"Report worker {report_worker.worker_id} started")
+    try:
+        report_worker.run(exit_when_idle=args.exit_when_idle)
+    except KeyboardInterrupt:
+        report_worker.stop()
+    logger.info(f"Report worker {report_worker.worker_id} stopped after {report_worker.units_done} units")
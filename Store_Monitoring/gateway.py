@@ -0,0 +1,211 @@
+"""
+Optional asyncio (ASGI) server for /ingest and health checks.
+
+Polls are validated with the same rules as the Flask route, queued in a
+bounded asyncio queue and written in batches by a single writer task, so a
+burst of small POSTs costs one INSERT per batch instead of one per request.
+A request whose polls do not fit in the queue right now gets 429 with
+Retry-After; one with more polls than the whole queue holds gets 413.
+
+    uvicorn gateway:create_gateway --factory --port 8001
+"""
+
+import asyncio
+import json
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db
+from ingest import PollValidationError, parse_body, parse_poll, validate_polls, write_polls
+from metrics import registry
+from config import (DB_URI, GATEWAY_BATCH_SIZE, GATEWAY_FLUSH_INTERVAL, GATEWAY_MAX_BODY_BYTES,
+                    GATEWAY_QUEUE_SIZE, GATEWAY_WRITE_RETRIES, logger)
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+
+
+class IngestGateway:
+    """ASGI application: POST /ingest, GET /health and GET /ingest/status.
+
+    Accepted polls are lost if the process dies before the writer drains
+    them, the same trade-off as the Flask ingest buffer.
+    """
+
+    def __init__(self, flask_app, queue_size: int = GATEWAY_QUEUE_SIZE, batch_size: int = GATEWAY_BATCH_SIZE,
+                 flush_interval: float = GATEWAY_FLUSH_INTERVAL, max_body_bytes: int = GATEWAY_MAX_BODY_BYTES):
+        self.flask_app = flask_app
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_body_bytes = max_body_bytes
+        self.queue = None
+        self.stats = {"accepted": 0, "rejected": 0, "throttled": 0, "written": 0, "dropped": 0, "batches": 0}
+        self._writer = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gateway-writer")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        await self.start()
+        method, path = scope["method"], scope["path"].rstrip("/") or "/"
+        try:
+            if path == "/ingest" and method == "POST":
+                status, body, headers = await self._ingest(scope, receive)
+            elif path in ("/health", "/ingest/status") and method == "GET":
+                status, body, headers = 200, self.status(), []
+            else:
+                status, body, headers = 404, {"error": "Endpoint not found"}, []
+        except Exception as e:
+            status, body, headers = 500, {"error": str(e)}, []
+        await _respond(send, status, body, headers)
+
+    async def start(self):
+        if self._writer is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self._writer = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        """Write everything still queued, then stop the writer task."""
+        if self._writer is None:
+            return
+        await self.queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+    def status(self) -> dict:
+        return {
+            "status": "healthy",
+            "queued": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue_size,
+            **self.stats,
+        }
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _ingest(self, scope, receive):
+        body = await _read_body(receive, self.max_body_bytes)
+        if body is None:
+            return 413, {"error": f"body larger than {self.max_body_bytes} bytes"}, []
+
+        content_type = dict(scope.get("headers", [])).get(b"content-type", b"").decode("latin-1")
+        try:
+            payloads, is_batch = parse_body(body, content_type)
+            if is_batch:
+                records, errors = validate_polls(payloads)
+            else:
+                records, errors = [parse_poll(payloads[0])], []
+        except PollValidationError as e:
+            self._count("rejected")
+            return 400, {"error": str(e)}, []
+
+        self._count("rejected", len(errors))
+        if not records:
+            return 400, {"error": "No valid polls in batch", "accepted": 0, "rejected": len(errors),
+                         "errors": errors}, []
+
+        if len(records) > self.queue_size:
+            self._count("rejected", len(records))
+            return 413, {"error": f"Batch of {len(records)} polls is larger than the {self.queue_size}-poll queue; "
+                                  f"split it up", "accepted": 0, "rejected": len(records) + len(errors)}, []
+
+        if self.queue_size - self.queue.qsize() < len(records):
+            self._count("throttled", len(records))
+            retry_after = max(1, round(self.queue.qsize() / max(self.batch_size, 1) * self.flush_interval))
+            return 429, {"error": "Ingest queue is full; retry later", "queued": self.queue.qsize()}, \
+                [(b"retry-after", str(retry_after).encode())]
+
+        for record in records:
+            self.queue.put_nowait(record)
+        self._count("accepted", len(records))
+        return 202, {"message": f"Queued {len(records)} polls", "accepted": len(records),
+                     "rejected": len(errors), "errors": errors}, []
+
+    def _count(self, result: str, amount: int = 1):
+        if amount:
+            self.stats[result] += amount
+            registry.inc("gateway_polls_total", amount, result=result)
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await loop.run_in_executor(self._executor, self._write, batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch: list[dict]):
+        for attempt in range(1, GATEWAY_WRITE_RETRIES + 1):
+            started = timer.perf_counter()
+            try:
+                with self.flask_app.app_context():
+                    try:
+                        written = write_polls(batch)
+                    finally:
+                        db.session.remove()
+                registry.observe("gateway_batch_seconds", timer.perf_counter() - started)
+                self.stats["written"] += written
+                self.stats["batches"] += 1
+                return
+            except Exception as e:
+                logger.warning(f"Gateway write of {len(batch)} polls failed (attempt {attempt}): {e}")
+                timer.sleep(0.1 * attempt)
+        self._count("dropped", len(batch))
+        logger.error(f"Gateway dropped {len(batch)} polls after {GATEWAY_WRITE_RETRIES} attempts")
+
+
+async def _read_body(receive, limit: int):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _respond(send, status: int, body: dict, headers: list):
+    payload = json.dumps(body).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": JSON_HEADERS + headers + [(b"content-length", str(len(payload)).encode())]})
+    await send({"type": "http.response.body", "body": payload})
+
+
+def create_gateway(db_uri: str = DB_URI) -> IngestGateway:
+    from parallel_report import make_worker_app
+    from migrations import upgrade_schema
+
+    flask_app = make_worker_app(db_uri)
+    with flask_app.app_context():
+        db.create_all()
+        upgrade_schema()
+    return IngestGateway(flask_app)
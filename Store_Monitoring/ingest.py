@@ -0,0 +1,225 @@
+import atexit
+import datetime
+import json
+import threading
+import time as timer
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, StoreStatus
+from changes import backfilled_stores, record_changes
+from metrics import registry
+from config import (HOURLY_AGGREGATES_ENABLED, INGEST_BUFFER_MAX_DELAY, INGEST_BUFFER_MAX_ROWS,
+                    INGEST_BUFFER_RETRIES, INGEST_INSERT_CHUNK, logger)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f UTC"
+VALID_STATUSES = ("active", "inactive")
+POLL_KEY = ("store_id", "timestamp_utc", "status")  # uq_store_status_poll
+
+
+class PollValidationError(ValueError):
+    pass
+
+
+def parse_poll(data) -> dict:
+    """Validate one poll payload and return the StoreStatus column values."""
+    if not isinstance(data, dict):
+        raise PollValidationError("poll must be a JSON object")
+
+    missing = [field for field in ("store_id", "status", "timestamp_utc") if data.get(field) in (None, "")]
+    if missing:
+        raise PollValidationError(f"missing field(s): {', '.join(missing)}")
+    if data["status"] not in VALID_STATUSES:
+        raise PollValidationError(f"status must be one of {', '.join(VALID_STATUSES)}")
+
+    try:
+        ts = datetime.datetime.strptime(data["timestamp_utc"], TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        raise PollValidationError("timestamp_utc must look like '2023-01-24 09:06:42.605777 UTC'")
+
+    return {"store_id": str(data["store_id"]), "status": data["status"], "timestamp_utc": ts}
+
+
+def parse_body(body: bytes, content_type: str = ""):
+    """Decode an /ingest body: a single JSON object, a JSON array, or NDJSON (one poll per line).
+
+    Returns ``(payloads, is_batch)``; a line of NDJSON that is not valid JSON is
+    kept as ``None`` so its index still lines up in the error report.
+    """
+    text = body.decode("utf-8").strip()
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [_json_or_none(line) for line in text.splitlines() if line.strip()], True
+
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if len(lines) > 1:
+            return [_json_or_none(line) for line in lines], True
+        raise PollValidationError("body must be JSON, a JSON array or NDJSON")
+
+    if isinstance(payload, list):
+        return payload, True
+    return [payload], False
+
+
+def validate_polls(payloads: list) -> tuple[list[dict], list[dict]]:
+    records, errors = [], []
+    for index, payload in enumerate(payloads):
+        try:
+            records.append(parse_poll(payload))
+        except PollValidationError as e:
+            errors.append({"index": index, "error": str(e)})
+    return records, errors
+
+
+def write_polls(records: list[dict], in_transaction=None) -> int:
+    """Insert validated polls with one multi-row INSERT per chunk and commit; returns the rows inserted.
+
+    Polls already stored are skipped and not counted. ``in_transaction()``
+    runs just before the commit, so whatever it writes (e.g. a consumer
+    offset) commits or rolls back with the polls.
+    """
+    if not records:
+        return 0
+
+    try:
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        statement = poll_insert(db.session.connection().dialect.name)
+        inserted = 0
+        for start in range(0, len(records), INGEST_INSERT_CHUNK):
+            inserted += db.session.execute(statement.values(records[start:start + INGEST_INSERT_CHUNK])).rowcount
+        record_changes(backfilled_stores(((r["store_id"], r["timestamp_utc"]) for r in records), latest),
+                       "store_status")
+
+        if HOURLY_AGGREGATES_ENABLED:
+            from aggregates import HourlyAggregates
+            ranges = {}
+            for record in records:
+                first, last = ranges.get(record["store_id"], (record["timestamp_utc"], record["timestamp_utc"]))
+                ranges[record["store_id"]] = (min(first, record["timestamp_utc"]), max(last, record["timestamp_utc"]))
+            HourlyAggregates().apply_new_polls(ranges)
+
+        if in_transaction is not None:
+            in_transaction()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    registry.inc("polls_written_total", inserted)
+    from store_uptime import store_uptime_cache
+    store_uptime_cache.append_polls(records)
+    return inserted
+
+
+def poll_insert(dialect_name: str):
+    """INSERT into store_status that skips polls already stored, where the dialect supports it."""
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    if dialect_name in dialects:
+        return dialects[dialect_name].insert(StoreStatus.__table__).on_conflict_do_nothing(index_elements=POLL_KEY)
+    return insert(StoreStatus.__table__)
+
+
+def _json_or_none(line: str):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+class IngestBuffer:
+    """Server-side buffer of validated polls, flushed when it reaches ``max_rows`` or ``max_delay`` seconds.
+
+    Trades durability for throughput: polls accepted into the buffer are lost
+    if the process dies before the next flush. A failed write (say, "database
+    is locked") puts the batch back in front of newer polls and is retried
+    with exponential backoff; after ``retries`` failed attempts in a row the
+    batch is dropped and counted in ingest_buffer_polls_total.
+    """
+
+    def __init__(self, app, max_rows: int = INGEST_BUFFER_MAX_ROWS, max_delay: float = INGEST_BUFFER_MAX_DELAY,
+                 retries: int = INGEST_BUFFER_RETRIES):
+        self.app = app
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.retries = retries
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._oldest = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._stopped = threading.Event()
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+
+        self._thread = threading.Thread(target=self._run, name="ingest-buffer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, records: list[dict]):
+        with self._lock:
+            if not self._pending:
+                self._oldest = timer.monotonic()
+            self._pending.extend(records)
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self, force: bool = False) -> int:
+        """Write the pending polls; while a failed write backs off this is a no-op unless ``force``."""
+        with self._flush_lock:
+            with self._lock:
+                if not force and timer.monotonic() < self._retry_at:
+                    return 0
+                batch, oldest = self._pending, self._oldest
+                self._pending, self._oldest = [], None
+            if not batch:
+                return 0
+            try:
+                with self.app.app_context():
+                    written = write_polls(batch)
+            except Exception as e:
+                self._failed(batch, oldest, e)
+                return 0
+            self._failures, self._retry_at = 0, 0.0
+            self.flushed_rows += written
+            registry.inc("ingest_buffer_polls_total", written, result="written")
+            return written
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        self._stopped.set()
+        while self.pending():
+            if not self.flush(force=True) and self._failures:
+                timer.sleep(max(self._retry_at - timer.monotonic(), 0))
+
+    def _failed(self, batch: list[dict], oldest: float, error: Exception):
+        self._failures += 1
+        if self._failures >= self.retries:
+            self._failures, self._retry_at = 0, 0.0
+            self.dropped_rows += len(batch)
+            registry.inc("ingest_buffer_polls_total", len(batch), result="dropped")
+            logger.error(f"Ingest buffer dropped {len(batch)} polls after {self.retries} failed writes: {error}")
+            return
+
+        delay = min(0.1 * 2 ** (self._failures - 1), 5.0)
+        logger.warning(f"Ingest buffer flush of {len(batch)} polls failed (attempt {self._failures}), "
+                       f"retrying in {delay:.1f}s: {error}")
+        with self._lock:
+            self._pending = batch + self._pending
+            self._oldest = oldest
+            self._retry_at = timer.monotonic() + delay
+
+    def _run(self):
+        while not self._stopped.wait(min(self.max_delay, 0.1)):
+            with self._lock:
+                now = timer.monotonic()
+                due = (self._oldest is not None and now - self._oldest >= self.max_delay) or \
+                    (self._pending and self._failures and now >= self._retry_at)
+            if due:
+                self.flush()
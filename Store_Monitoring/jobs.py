@@ -0,0 +1,217 @@
+import queue
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ReportJob, QUEUED, RUNNING
+from config import REPORT_CONCURRENCY, REPORT_JOB_STALE_SECONDS, REPORT_QUEUE_SIZE, logger
+from report_cache import cache_stats, find_cached_report, report_cache_key
+from database import write_session
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class ReportQueueFull(Exception):
+    pass
+
+
+def utcnow() -> datetime:
+    return datetime.now(pytz.UTC).replace(tzinfo=None)
+
+
+def data_watermark() -> str:
+    """Identifies the data a report would be computed from; equal watermarks give equal reports."""
+    return report_cache_key()
+
+
+def get_job(report_id: str):
+    return ReportJob.query.filter_by(report_id=report_id).first()
+
+
+def find_active_job(watermark: str):
+    return ReportJob.query.filter(
+        ReportJob.watermark == watermark,
+        ReportJob.status.in_(ACTIVE_STATES)
+    ).order_by(ReportJob.created_at).first()
+
+
+def create_job(watermark: str, status: str = QUEUED) -> ReportJob:
+    job = ReportJob(report_id=str(uuid.uuid4()), status=status, watermark=watermark, created_at=utcnow())
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def update_job(report_id: str, **fields):
+    fields["updated_at"] = utcnow()
+    session = write_session()  # stays writable while a report reads from a snapshot
+    session.query(ReportJob).filter_by(report_id=report_id).update(fields)
+    session.commit()
+
+
+def claim_job(report_id: str) -> bool:
+    """Move a job from Queued to Running; False if another worker got there first."""
+    now = utcnow()
+    claimed = ReportJob.query.filter_by(report_id=report_id, status=QUEUED).update(
+        {"status": RUNNING, "started_at": now, "updated_at": now})
+    db.session.commit()
+    return claimed == 1
+
+
+def list_jobs(limit: int = 100, offset: int = 0, status: str = None) -> list[ReportJob]:
+    query = ReportJob.query
+    if status:
+        query = query.filter_by(status=status)
+    return query.order_by(ReportJob.created_at.desc(), ReportJob.id.desc()).offset(offset).limit(limit).all()
+
+
+def _iso(value):
+    return value.replace(tzinfo=pytz.UTC).isoformat() if value else None
+
+
+def job_as_dict(job: ReportJob) -> dict:
+    info = {
+        "status": job.status,
+        "watermark": job.watermark,
+        "created_at": _iso(job.created_at),
+        "started_at": _iso(job.started_at),
+        "completed_at": _iso(job.completed_at),
+        "progress": {"stores_processed": job.stores_processed, "total_stores": job.total_stores},
+    }
+    if job.computed_watermark:
+        info["computed_watermark"] = job.computed_watermark
+    if job.file_path:
+        info["file_path"] = job.file_path
+    if job.error:
+        info["error"] = job.error
+    if job.peak_rss_bytes:
+        info["peak_rss_bytes"] = job.peak_rss_bytes
+    return info
+
+
+class ReportQueue:
+    """Bounded queue of report jobs drained by ``concurrency`` worker threads.
+
+    Job state lives in report_jobs, so it survives restarts and is shared by
+    every process on the database. A trigger for data that an active job is
+    already computing attaches to that job instead of queueing another one
+    (a partial unique index keeps that true across processes), and one for
+    data an earlier report already covers returns that report.
+    Worker threads start on the first submit, or at app start when jobs a
+    restart interrupted are waiting.
+    """
+
+    def __init__(self, app, concurrency: int = REPORT_CONCURRENCY, max_queued: int = REPORT_QUEUE_SIZE):
+        self.app = app
+        self.concurrency = concurrency
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def submit(self) -> tuple[str, bool]:
+        """Queue a report; returns ``(report_id, attached)``."""
+        with self._lock:
+            self._start_workers()
+            watermark = data_watermark()
+            cached = find_cached_report(watermark)
+            if cached:
+                cache_stats.record("hits")
+                logger.info(f"Report trigger served from cached report {cached.report_id}")
+                return cached.report_id, True
+
+            existing = find_active_job(watermark)
+            if existing:
+                return self._attach(existing)
+
+            if self._queue.full():
+                raise ReportQueueFull(f"{self._queue.maxsize} reports are already queued")
+
+            try:
+                job = create_job(watermark)
+            except IntegrityError:
+                # Another process queued a job for this watermark since find_active_job
+                db.session.rollback()
+                existing = find_active_job(watermark)
+                if existing is None:
+                    raise
+                return self._attach(existing)
+
+            cache_stats.record("misses")
+            self._queue.put_nowait(job.report_id)
+            return job.report_id, False
+
+    def _attach(self, job: ReportJob) -> tuple[str, bool]:
+        cache_stats.record("attached")
+        logger.info(f"Report trigger attached to {job.status.lower()} job {job.report_id}")
+        return job.report_id, True
+
+    def resume(self):
+        """Requeue jobs a restart interrupted and start the workers if there are any; runs at app start.
+
+        Running jobs that have not gone stale yet may belong to a live process,
+        so they are looked at again once they would be stale.
+        """
+        with self.app.app_context():
+            with self._lock:
+                if self._workers:
+                    return
+                if self.requeue_interrupted():
+                    self._start_threads()
+                    return
+            last_progress = db.session.query(
+                func.min(func.coalesce(ReportJob.updated_at, ReportJob.created_at))
+            ).filter(ReportJob.status == RUNNING).scalar()
+
+        if last_progress is not None:
+            delay = (last_progress - utcnow()).total_seconds() + REPORT_JOB_STALE_SECONDS + 1
+            recheck = threading.Timer(max(delay, 1.0), self.resume)
+            recheck.daemon = True
+            recheck.start()
+
+    def requeue_interrupted(self) -> int:
+        """Pick up Queued jobs and Running jobs whose worker stopped reporting progress; returns the jobs queued."""
+        stale_before = utcnow() - timedelta(seconds=REPORT_JOB_STALE_SECONDS)
+        ReportJob.query.filter(
+            ReportJob.status == RUNNING,
+            func.coalesce(ReportJob.updated_at, ReportJob.created_at) < stale_before
+        ).update({"status": QUEUED}, synchronize_session=False)
+        db.session.commit()
+
+        queued = 0
+        for job in ReportJob.query.filter_by(status=QUEUED).order_by(ReportJob.created_at):
+            try:
+                self._queue.put_nowait(job.report_id)
+            except queue.Full:
+                break
+            queued += 1
+        return queued
+
+    def _start_workers(self):
+        if self._workers:
+            return
+        self.requeue_interrupted()
+        self._start_threads()
+
+    def _start_threads(self):
+        for i in range(self.concurrency):
+            worker = threading.Thread(target=self._work, name=f"report-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        from services import StoreMonitoringService
+
+        while True:
+            report_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    if claim_job(report_id):
+                        StoreMonitoringService().generate_report_background(report_id, self.app)
+            except Exception as e:
+                logger.error(f"Report worker failed on {report_id}: {e}")
+            finally:
+                self._queue.task_done()
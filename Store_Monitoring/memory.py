@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MB = 1024 * 1024
+
+
+def peak_rss() -> int:
+    """Highest resident set size of this process so far, in bytes (0 when unknown)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes, Linux KiB
+
+
+def current_rss() -> int:
+    """Resident set size of this process now, in bytes; the peak so far where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+class PeakRss:
+    """Samples the process RSS every ``interval`` seconds while the block runs; ``peak`` is the highest reading.
+
+    ru_maxrss only ever grows over the process lifetime, so it cannot tell one
+    report run from the next. Worker processes of REPORT_WORKERS are not
+    included, and concurrent runs in one process see each other's memory.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self) -> int:
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        return rss
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="peak-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+        self.sample()
+        return False
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
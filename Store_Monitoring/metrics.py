@@ -0,0 +1,202 @@
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import METRICS_ENABLED, METRICS_RESERVOIR_SIZE, REPORT_PROFILE_DIR, logger
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Summary:
+    """Count, sum and a fixed-size random reservoir of observations for quantiles."""
+
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = []
+
+    def observe(self, value: float, reservoir_size: int):
+        self.count += 1
+        self.total += value
+        if len(self.samples) < reservoir_size:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < reservoir_size:
+                self.samples[slot] = value
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """Process-wide counters and timing summaries, rendered in the Prometheus text format.
+
+    Every recording call returns immediately while the registry is disabled,
+    and SQL timing hooks are only attached to SQLAlchemy while it is enabled.
+    """
+
+    def __init__(self, enabled: bool = False, reservoir_size: int = METRICS_RESERVOIR_SIZE):
+        self.enabled = False
+        self.reservoir_size = reservoir_size
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        if not self.enabled:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+            self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary()
+            summary.observe(seconds, self.reservoir_size)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator recording each call's duration under ``name``."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorate
+
+    def quantile(self, name: str, q: float, **labels) -> float:
+        with self._lock:
+            summary = self._summaries.get((name, tuple(sorted(labels.items()))))
+            return summary.quantile(q) if summary else 0.0
+
+    def count(self, name: str, **labels) -> float:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            summary = self._summaries.get(key)
+            return summary.count if summary else 0
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items(), key=lambda item: item[0])
+
+            for name in sorted({name for (name, _), _ in counters}):
+                lines.append(f"# TYPE store_monitoring_{name} counter")
+                for (metric, labels), value in counters:
+                    if metric == name:
+                        lines.append(f"store_monitoring_{name}{_labels(labels)} {value}")
+
+            for name in sorted({name for (name, _), _ in summaries}):
+                lines.append(f"# TYPE store_monitoring_{name} summary")
+                for (metric, labels), summary in summaries:
+                    if metric != name:
+                        continue
+                    for q in QUANTILES:
+                        lines.append(f"store_monitoring_{name}{_labels(labels + (('quantile', str(q)),))} "
+                                     f"{summary.quantile(q):.6f}")
+                    lines.append(f"store_monitoring_{name}_sum{_labels(labels)} {summary.total:.6f}")
+                    lines.append(f"store_monitoring_{name}_count{_labels(labels)} {summary.count}")
+
+        lines.append(f"store_monitoring_metrics_enabled {int(self.enabled)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "metrics_started", None)
+    if started is None:
+        return
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    registry.observe("sql_query_seconds", time.perf_counter() - started, statement=verb)
+
+
+registry = MetricsRegistry(enabled=METRICS_ENABLED)
+
+
+@contextmanager
+def report_profile(report_id: str, profile_dir: str = REPORT_PROFILE_DIR):
+    """cProfile the block into ``<profile_dir>/report_<id>.prof`` when a profile directory is configured."""
+    if not profile_dir:
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"report_{report_id}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Report {report_id} profile written to {path}")
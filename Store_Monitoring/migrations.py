@@ -0,0 +1,98 @@
+import argparse
+
+from sqlalchemy import func, inspect, select
+
+from models import db, StoreStatus, ReportJob, QUEUED, RUNNING, COMPLETE, FAILED
+from config import logger
+
+# Indexes replaced by the composite store_status indexes
+LEGACY_STORE_STATUS_INDEXES = ("ix_store_status_store_id",)
+
+
+def remove_duplicate_polls(connection) -> int:
+    """Delete repeated (store_id, timestamp_utc, status) rows, keeping the lowest id."""
+    table = StoreStatus.__table__
+    keep = select(func.min(table.c.id)).group_by(table.c.store_id, table.c.timestamp_utc, table.c.status)
+    return connection.execute(table.delete().where(table.c.id.not_in(keep))).rowcount
+
+
+def upgrade_store_status_indexes(connection) -> list[str]:
+    """Bring store_status indexes of a database created before they existed up to the model.
+
+    Safe to run repeatedly; returns the names of the indexes it created.
+    """
+    existing = {index["name"] for index in inspect(connection).get_indexes("store_status")}
+    missing = [index for index in StoreStatus.__table__.indexes if index.name not in existing]
+
+    if any(index.unique for index in missing):
+        removed = remove_duplicate_polls(connection)
+        if removed:
+            logger.info(f"Removed {removed} duplicate store_status rows before adding the unique index")
+
+    for index in missing:
+        logger.info(f"Creating index {index.name} on store_status")
+        index.create(bind=connection)
+
+    for name in LEGACY_STORE_STATUS_INDEXES:
+        if name in existing:
+            logger.info(f"Dropping superseded index {name}")
+            connection.exec_driver_sql(f"DROP INDEX {name}")
+
+    return [index.name for index in missing]
+
+
+def upgrade_report_job_indexes(connection) -> list[str]:
+    """Add report_jobs indexes an older database lacks, such as the one allowing one active job per watermark.
+
+    Active jobs that would break it (all but the oldest per watermark) are
+    marked Failed first; returns the names of the indexes created.
+    """
+    existing = {index["name"] for index in inspect(connection).get_indexes("report_jobs")}
+    missing = [index for index in ReportJob.__table__.indexes if index.name not in existing]
+
+    if any(index.unique for index in missing):
+        table = ReportJob.__table__
+        active = table.c.status.in_((QUEUED, RUNNING))
+        keep = select(func.min(table.c.id)).where(active).group_by(table.c.watermark)
+        failed = connection.execute(table.update().where(active, table.c.id.not_in(keep)).values(
+            status=FAILED, error="Duplicate of an earlier job for the same data")).rowcount
+        if failed:
+            logger.info(f"Marked {failed} duplicate active report jobs Failed before adding the unique index")
+
+    for index in missing:
+        logger.info(f"Creating index {index.name} on report_jobs")
+        index.create(bind=connection)
+    return [index.name for index in missing]
+
+
+def add_missing_columns(connection, table) -> list[str]:
+    """Add nullable columns of ``table`` that an older database lacks; returns their names."""
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing and column.nullable]
+    for column in missing:
+        logger.info(f"Adding column {column.name} to {table.name}")
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}")
+    return [column.name for column in missing]
+
+
+def upgrade_schema():
+    with db.engine.begin() as connection:
+        upgrade_store_status_indexes(connection)
+        if "computed_watermark" in add_missing_columns(connection, ReportJob.__table__):
+            # Finished jobs used to keep the computed watermark in ``watermark``
+            table = ReportJob.__table__
+            connection.execute(table.update().where(table.c.status == COMPLETE).values(
+                computed_watermark=table.c.watermark))
+        upgrade_report_job_indexes(connection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade an existing database to the current indexes")
+    parser.add_argument("--db-uri", help="SQLAlchemy URI (default: config.DB_URI)")
+    args = parser.parse_args()
+
+    from config import DB_URI
+    from parallel_report import make_worker_app
+    with make_worker_app(args.db_uri or DB_URI).app_context():
+        upgrade_schema()
@@ -5,10 +5,16 @@ db = SQLAlchemy()
 class StoreStatus(db.Model):
     __tablename__ = "store_status"
     id = db.Column(db.Integer, primary_key=True)
-    store_id = db.Column(db.String(50), index=True, nullable=False)
-    timestamp_utc = db.Column(db.DateTime, nullable=False)
+    store_id = db.Column(db.String(50), nullable=False)
+    timestamp_utc = db.Column(db.DateTime, index=True, nullable=False)  # index serves max(timestamp_utc)
     status = db.Column(db.String(20), nullable=False)
 
+    __table_args__ = (
+        # Per-store window scans; the implicit id/rowid suffix also covers ORDER BY timestamp_utc, id
+        db.Index("ix_store_status_store_ts", "store_id", "timestamp_utc"),
+        db.Index("uq_store_status_poll", "store_id", "timestamp_utc", "status", unique=True),
+    )
+
 class BusinessHours(db.Model):
     __tablename__ = "business_hours"
     id = db.Column(db.Integer, primary_key=True)
@@ -22,3 +28,144 @@ class StoreTimezone(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     store_id = db.Column(db.String(50), index=True, nullable=False)
     timezone_str = db.Column(db.String(50), nullable=False)
+
+class StoreHourlyUptime(db.Model):
+    __tablename__ = "store_hourly_uptime"
+    id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.String(50), nullable=False)
+    hour_start = db.Column(db.DateTime, index=True, nullable=False)  # UTC
+    uptime_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    downtime_seconds = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (db.UniqueConstraint("store_id", "hour_start", name="uq_store_hourly_uptime"),)
+
+class UptimeRollup(db.Model):
+    """Business uptime/downtime of one store over one UTC day or week (weeks start on Monday)."""
+    __tablename__ = "uptime_rollups"
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # day or week
+    store_id = db.Column(db.String(50), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False)  # UTC
+    uptime_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    downtime_seconds = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        # Per-store series; fleet series come from fleet_uptime_rollups
+        db.Index("uq_uptime_rollup", "granularity", "store_id", "period_start", unique=True),
+        db.Index("ix_uptime_rollup_period", "granularity", "period_start"),
+    )
+
+class FleetUptimeRollup(db.Model):
+    """uptime_rollups summed over every store for one day or week."""
+    __tablename__ = "fleet_uptime_rollups"
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False)  # UTC
+    uptime_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    downtime_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    stores = db.Column(db.Integer, nullable=False, default=0)  # stores rolled up into the period
+
+    __table_args__ = (db.UniqueConstraint("granularity", "period_start", name="uq_fleet_uptime_rollup"),)
+
+QUEUED, RUNNING, COMPLETE, FAILED, EXPIRED = "Queued", "Running", "Complete", "Failed", "Expired"
+
+class ReportJob(db.Model):
+    __tablename__ = "report_jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.String(36), unique=True, nullable=False)
+    status = db.Column(db.String(20), index=True, nullable=False)  # Queued, Running, Complete, Failed, Expired
+    watermark = db.Column(db.String(200), index=True, nullable=False)  # data at submit; one active job each
+    computed_watermark = db.Column(db.String(200), index=True)  # data the report was computed from
+    file_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    stores_processed = db.Column(db.Integer, nullable=False, default=0)
+    total_stores = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False)  # UTC
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    change_seq = db.Column(db.Integer)  # newest store_changes id the report saw
+    peak_rss_bytes = db.Column(db.BigInteger)  # highest RSS of the process while the report ran
+
+    # At most one Queued/Running job per watermark, however many processes trigger reports
+    __table_args__ = (
+        db.Index("uq_report_jobs_active_watermark", "watermark", unique=True,
+                 sqlite_where=status.in_((QUEUED, RUNNING)), postgresql_where=status.in_((QUEUED, RUNNING))),
+    )
+
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class StatusSegment(db.Model):
+    """A run of consecutive same-status polls of one store, kept after the polls are archived."""
+    __tablename__ = "status_segments"
+    id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.String(50), nullable=False)
+    start_utc = db.Column(db.DateTime, nullable=False)  # first poll of the run
+    end_utc = db.Column(db.DateTime, nullable=False)  # last poll of the run
+    status = db.Column(db.String(20), nullable=False)
+    polls = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index("ix_status_segments_store_start", "store_id", "start_utc"),)
+
+class ArchivePartition(db.Model):
+    """One UTC day of polls moved from store_status to the cold store."""
+    __tablename__ = "archive_partitions"
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, index=True, nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)
+    polls = db.Column(db.Integer, nullable=False)
+    segments = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+class StoreChange(db.Model):
+    """A store whose report inputs changed; ``id`` orders the log and a NULL store_id means every store."""
+    __tablename__ = "store_changes"
+    id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.String(50), index=True)
+    source = db.Column(db.String(50), nullable=False)  # business_hours, store_timezones or store_status
+    changed_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+    __table_args__ = {"sqlite_autoincrement": True}  # ids must not be reused once the log is pruned
+
+UNIT_PENDING, UNIT_LEASED, UNIT_DONE, UNIT_FAILED = "pending", "leased", "done", "failed"
+
+class ReportUnit(db.Model):
+    """A slice of a distributed report's stores, leased to one worker at a time."""
+    __tablename__ = "report_units"
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.String(36), index=True, nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # position of the unit's rows in the report
+    as_of = db.Column(db.DateTime, nullable=False)  # the report's latest poll (UTC); every unit is computed at it
+    store_ids = db.Column(db.Text, nullable=False)  # JSON list
+    store_count = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), index=True, nullable=False)  # pending, leased, done, failed
+    worker = db.Column(db.String(100))
+    lease_token = db.Column(db.String(36))
+    lease_expires_at = db.Column(db.DateTime)  # UTC
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+    __table_args__ = (db.UniqueConstraint("report_id", "seq", name="uq_report_unit_seq"),)
+
+class ReportRow(db.Model):
+    """One store's row of a finished report, for consumers that query reports in SQL."""
+    __tablename__ = "report_rows"
+    report_id = db.Column(db.String(36), primary_key=True)
+    store_id = db.Column(db.String(50), primary_key=True)
+    uptime_last_hour = db.Column(db.Float, nullable=False)  # minutes
+    uptime_last_day = db.Column(db.Float, nullable=False)  # hours
+    uptime_last_week = db.Column(db.Float, nullable=False)
+    downtime_last_hour = db.Column(db.Float, nullable=False)  # minutes
+    downtime_last_day = db.Column(db.Float, nullable=False)  # hours
+    downtime_last_week = db.Column(db.Float, nullable=False)
+
+class ConsumerOffset(db.Model):
+    """Position up to which a poll-stream consumer has written everything it read."""
+    __tablename__ = "consumer_offsets"
+    name = db.Column(db.String(100), primary_key=True)
+    position = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC
@@ -0,0 +1,90 @@
+import multiprocessing
+
+import pandas as pd
+from flask import Flask
+
+from models import db
+from database import configure_database
+from report_engine import ReportEngine
+from config import REPORT_MP_START_METHOD, REPORT_SHARDS_PER_WORKER, logger
+
+_worker_app = None
+
+
+def make_worker_app(db_uri: str) -> Flask:
+    """Bare application holding only the database extension, for processes that never serve HTTP."""
+    app = Flask(__name__)
+    configure_database(app, db_uri)
+    return app
+
+
+_shared_apps = {}
+
+
+def shared_worker_app(db_uri: str) -> Flask:
+    """One worker application per database URI for the whole process, created on first use."""
+    if db_uri not in _shared_apps:
+        _shared_apps[db_uri] = make_worker_app(db_uri)
+    return _shared_apps[db_uri]
+
+
+def shard_store_ids(store_ids, shard_count: int) -> list[list]:
+    """Split store_ids into up to ``shard_count`` contiguous, sorted ranges of similar size."""
+    ordered = sorted(store_ids)
+    shard_count = max(1, min(shard_count, len(ordered)))
+    size, extra = divmod(len(ordered), shard_count)
+    shards, start = [], 0
+    for i in range(shard_count):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(ordered[start:end])
+        start = end
+    return [shard for shard in shards if shard]
+
+
+def _init_worker(db_uri: str):
+    global _worker_app
+    _worker_app = make_worker_app(db_uri)
+
+
+def _compute_shard(args):
+    current_time, store_ids = args
+    with _worker_app.app_context():
+        try:
+            return len(store_ids), ReportEngine(current_time, store_ids).compute()
+        finally:
+            db.session.remove()
+
+
+def iter_report_shards(current_time, store_ids, workers: int, db_uri: str):
+    """Run ReportEngine over store_id shards in a pool of ``workers`` processes.
+
+    Every worker opens its own connection to ``db_uri``. Yields
+    ``(shard_size, frame, shard_count)`` in the parent as shards finish, in no
+    particular order.
+    """
+    shards = shard_store_ids(store_ids, workers * REPORT_SHARDS_PER_WORKER)
+    logger.info(f"Computing report over {len(shards)} shards with {workers} worker processes")
+
+    context = multiprocessing.get_context(REPORT_MP_START_METHOD)
+    with context.Pool(processes=workers, initializer=_init_worker, initargs=(db_uri,)) as pool:
+        tasks = [(current_time, shard) for shard in shards]
+        for shard_size, frame in pool.imap_unordered(_compute_shard, tasks):
+            yield shard_size, frame, len(shards)
+
+
+def compute_report_parallel(current_time, store_ids, workers: int, db_uri: str, on_progress=None) -> pd.DataFrame:
+    """Merge the frames of :func:`iter_report_shards` back into ``store_ids`` order.
+
+    ``on_progress`` is called as ``on_progress(stores_done, total, shards_done, shard_count)``
+    each time a shard finishes.
+    """
+    frames, stores_done = [], 0
+    shards = iter_report_shards(current_time, store_ids, workers, db_uri)
+    for shards_done, (shard_size, frame, shard_count) in enumerate(shards, 1):
+        frames.append(frame)
+        stores_done += shard_size
+        if on_progress:
+            on_progress(stores_done, len(store_ids), shards_done, shard_count)
+
+    merged = pd.concat(frames) if frames else pd.DataFrame()
+    return merged.reindex([store_id for store_id in store_ids if store_id in merged.index])
@@ -0,0 +1,125 @@
+import argparse
+import json
+import re
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db
+
+# name, SQL, whether reading a whole index (never the table) is acceptable, and the code it mirrors
+HotQuery = namedtuple("HotQuery", "name sql index_scan_ok source")
+
+HOT_QUERIES = [
+    HotQuery(
+        "uptime_window",
+        "SELECT id, store_id, timestamp_utc, status FROM store_status "
+        "WHERE store_id = :store_id AND timestamp_utc >= :start AND timestamp_utc <= :end "
+        "ORDER BY timestamp_utc, id",
+        False, "services.StoreMonitoringService.calculate_uptime_downtime"),
+    HotQuery(
+        "latest_poll",
+        "SELECT max(timestamp_utc) FROM store_status",
+        False, "services.StoreMonitoringService.generate_report_background"),
+    HotQuery(
+        "report_store_ids",
+        "SELECT DISTINCT store_id FROM store_status",
+        True, "services.StoreMonitoringService.generate_report_background"),
+    HotQuery(
+        "csv_dedup",
+        "SELECT 1 FROM store_status "
+        "WHERE store_id = :store_id AND timestamp_utc = :start AND status = :status",
+        False, "csv_loader.CsvBulkLoader._merge_staged"),
+    HotQuery(
+        "report_window",
+        "SELECT store_id, timestamp_utc, status FROM store_status "
+        "WHERE timestamp_utc >= :start AND timestamp_utc <= :end AND store_id IN (:store_id, :first, :last) "
+        "ORDER BY store_id, timestamp_utc, id",
+        False, "report_engine.ReportEngine.load_polls"),
+    HotQuery(
+        "bounded_report_window",
+        "SELECT store_id, timestamp_utc, status FROM store_status "
+        "WHERE store_id BETWEEN :first AND :last AND timestamp_utc >= :start AND timestamp_utc <= :end "
+        "ORDER BY store_id, timestamp_utc, id",
+        False, "bounded_report.BoundedReport._read_group"),
+    HotQuery(
+        "previous_poll",
+        "SELECT max(timestamp_utc) FROM store_status WHERE store_id = :store_id AND timestamp_utc < :start",
+        False, "aggregates.HourlyAggregates.apply_new_polls"),
+]
+
+SAMPLE_PARAMS = {
+    "store_id": "1", "first": "0", "last": "9", "status": "active",
+    "start": datetime(2023, 1, 18), "end": datetime(2023, 1, 25),
+}
+
+SQLITE_TABLE_SCAN = re.compile(r"^SCAN (\w+)$")
+SQLITE_INDEX_SCAN = re.compile(r"^SCAN (\w+) USING (COVERING )?INDEX")
+
+
+def sqlite_plan(connection, sql: str) -> list[str]:
+    return [row[3] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), SAMPLE_PARAMS)]
+
+
+def sqlite_full_scans(plan: list[str], index_scan_ok: bool) -> list[str]:
+    return [line for line in plan
+            if SQLITE_TABLE_SCAN.match(line) or (not index_scan_ok and SQLITE_INDEX_SCAN.match(line))]
+
+
+def postgres_plan(connection, sql: str) -> list[dict]:
+    # With sequential scans priced out, a Seq Scan in the plan means no index can serve the query
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), SAMPLE_PARAMS).scalar()
+    nodes, pending = [], [plan[0]["Plan"]]
+    while pending:
+        node = pending.pop()
+        nodes.append(node)
+        pending.extend(node.get("Plans", []))
+    return nodes
+
+
+def postgres_full_scans(nodes: list[dict], index_scan_ok: bool) -> list[str]:
+    scans = []
+    for node in nodes:
+        kind = node["Node Type"]
+        if kind == "Seq Scan":
+            scans.append(f"Seq Scan on {node.get('Relation Name')}")
+        elif kind in ("Index Scan", "Index Only Scan") and "Index Cond" not in node and not index_scan_ok:
+            scans.append(f"{kind} on {node.get('Relation Name')} without an index condition")
+    return scans
+
+
+def audit(connection) -> list[dict]:
+    """EXPLAIN every hot query; each result lists the full scans found in its plan."""
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        raise ValueError(f"Query audit supports sqlite and postgresql, not {dialect}")
+
+    results = []
+    for query in HOT_QUERIES:
+        if dialect == "sqlite":
+            plan = sqlite_plan(connection, query.sql)
+            full_scans = sqlite_full_scans(plan, query.index_scan_ok)
+        else:
+            nodes = postgres_plan(connection, query.sql)
+            plan = [f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name') or ''}".strip()
+                    for node in nodes]
+            full_scans = postgres_full_scans(nodes, query.index_scan_ok)
+        results.append({"query": query.name, "source": query.source, "plan": plan, "full_scans": full_scans})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN the store_status hot queries and fail on full scans")
+    parser.add_argument("--db-uri", help="SQLAlchemy URI (default: config.DB_URI)")
+    args = parser.parse_args()
+
+    from config import DB_URI
+    from parallel_report import make_worker_app
+    with make_worker_app(args.db_uri or DB_URI).app_context():
+        with db.engine.connect() as connection:  # rolled back on close, undoing SET LOCAL
+            results = audit(connection)
+
+    print(json.dumps(results, indent=2))
+    raise SystemExit(1 if any(result["full_scans"] for result in results) else 0)
@@ -0,0 +1,184 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import event, func, insert, update
+from sqlalchemy.orm import Session
+
+from models import (db, StoreStatus, BusinessHours, StoreTimezone, DataVersion, ReportJob, ReportRow, COMPLETE,
+                    EXPIRED)
+from config import REPORT_CACHE_MAX_AGE_HOURS, REPORT_CACHE_MAX_REPORTS, logger
+from changes import latest_change_seq, prune_changes
+
+# data_versions row holding the newest store_changes id the hourly aggregates reflect
+AGGREGATES_CHANGE_SEQ = "store_hourly_uptime_changes"
+ROLLUPS_CHANGE_SEQ = "uptime_rollups_changes"
+
+# Tables whose edits change report results without touching store_status
+VERSIONED_MODELS = {BusinessHours: "business_hours", StoreTimezone: "store_timezones"}
+# store_status edits keep its row count and latest poll, so they are versioned too
+POLLS_VERSION = "store_status"
+
+
+def bump_version(name: str, connection=None):
+    """Increment a table's version; runs on ``connection`` (or the session's) inside the caller's transaction."""
+    connection = connection or db.session.connection()
+    table = DataVersion.__table__
+    bumped = connection.execute(update(table).where(table.c.name == name).values(version=table.c.version + 1))
+    if bumped.rowcount == 0:
+        connection.execute(insert(table).values(name=name, version=1))
+
+
+def set_version(name: str, version: int, connection=None):
+    connection = connection or db.session.connection()
+    table = DataVersion.__table__
+    updated = connection.execute(update(table).where(table.c.name == name).values(version=version))
+    if updated.rowcount == 0:
+        connection.execute(insert(table).values(name=name, version=version))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions_on_edit(session, flush_context):
+    # Catches Flask-Admin and other ORM edits; bulk writes call bump_version themselves
+    touched = {
+        VERSIONED_MODELS[type(obj)]
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if type(obj) in VERSIONED_MODELS
+    }
+    if any(isinstance(obj, StoreStatus) for obj in session.deleted) or \
+            any(isinstance(obj, StoreStatus) and session.is_modified(obj) for obj in session.dirty):
+        touched.add(POLLS_VERSION)
+    for name in sorted(touched):
+        bump_version(name, session.connection())
+
+
+def table_versions() -> dict:
+    return dict(db.session.query(DataVersion.name, DataVersion.version).all())
+
+
+def report_cache_key() -> str:
+    """Identifies everything a report depends on: poll watermark and row count, plus poll/hours/timezone versions."""
+    latest, polls = db.session.query(func.max(StoreStatus.timestamp_utc), func.count(StoreStatus.id)).one()
+    versions = table_versions()
+    parts = [latest.isoformat() if latest else "empty", str(polls)]
+    for model, name in VERSIONED_MODELS.items():
+        parts.append(f"{name}:{db.session.query(func.count(model.id)).scalar()}:{versions.get(name, 0)}")
+    parts.append(f"{POLLS_VERSION}:{versions.get(POLLS_VERSION, 0)}")
+    return "|".join(parts)
+
+
+def find_cached_report(cache_key: str):
+    """Newest Complete job for ``cache_key`` whose file is still on disk and no store has changed since.
+
+    The key misses edits that keep every count and version (say a bulk UPDATE
+    of store_status), so a report older than the newest store_changes entry is
+    not reused.
+    """
+    for job in ReportJob.query.filter(
+            ReportJob.computed_watermark == cache_key,
+            ReportJob.status == COMPLETE,
+            ReportJob.change_seq >= latest_change_seq()
+    ).order_by(ReportJob.completed_at.desc()):
+        if job.file_path and os.path.exists(job.file_path):
+            return job
+    return None
+
+
+def find_base_report(cache_key: str):
+    """Newest Complete report, still on disk, computed at the same latest poll as ``cache_key``.
+
+    Its rows hold for every store not logged in store_changes after the job's
+    ``change_seq``.
+    """
+    latest = cache_key.split("|", 1)[0]
+    for job in ReportJob.query.filter(
+            ReportJob.status == COMPLETE,
+            ReportJob.change_seq.isnot(None),
+            ReportJob.computed_watermark.startswith(latest + "|", autoescape=True)
+    ).order_by(ReportJob.change_seq.desc(), ReportJob.completed_at.desc()):
+        if job.file_path and os.path.exists(job.file_path):
+            return job
+    return None
+
+
+def prune_store_changes() -> int:
+    """Drop store_changes rows older than every kept report and the last aggregate and rollup refreshes.
+
+    Aggregates and rollups count once they have been built at all, however
+    they are maintained (the app's schedulers or ``python rollups.py refresh``).
+    """
+    floor = min((job.change_seq for job in ReportJob.query.filter(
+        ReportJob.status == COMPLETE, ReportJob.change_seq.isnot(None))), default=latest_change_seq())
+    versions = table_versions()
+    for name in (AGGREGATES_CHANGE_SEQ, ROLLUPS_CHANGE_SEQ):
+        if name in versions:
+            floor = min(floor, versions[name])
+    return prune_changes(floor)
+
+
+def evict_reports(max_reports: int = REPORT_CACHE_MAX_REPORTS, max_age_hours: float = REPORT_CACHE_MAX_AGE_HOURS) -> list[str]:
+    """Delete report files beyond the newest ``max_reports`` or older than ``max_age_hours``.
+
+    The jobs are kept as Expired so /get_report can say why the file is gone;
+    their report_rows go with the files.
+    """
+    cutoff = datetime.now(pytz.UTC).replace(tzinfo=None) - timedelta(hours=max_age_hours)
+    complete = ReportJob.query.filter_by(status=COMPLETE).order_by(ReportJob.completed_at.desc()).all()
+
+    kept_files, evicted = set(), []
+    for rank, job in enumerate(complete):
+        if rank < max_reports and (job.completed_at is None or job.completed_at >= cutoff):
+            kept_files.add(job.file_path)
+            continue
+        job.status = EXPIRED
+        evicted.append(job)
+
+    for job in evicted:
+        if job.file_path and job.file_path not in kept_files and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+    if evicted:
+        ReportRow.query.filter(ReportRow.report_id.in_([job.report_id for job in evicted])).delete(
+            synchronize_session=False)
+    prune_store_changes()
+    db.session.commit()
+
+    if evicted:
+        logger.info(f"Evicted {len(evicted)} cached reports")
+    return [job.report_id for job in evicted]
+
+
+class ReportCacheStats:
+    """Hit/miss counters for report triggers in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.attached = 0
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.attached
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "attached": self.attached,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+cache_stats = ReportCacheStats()
+
+
+def cache_summary() -> dict:
+    files = {job.file_path for job in ReportJob.query.filter_by(status=COMPLETE)
+             if job.file_path and os.path.exists(job.file_path)}
+    return {
+        **cache_stats.snapshot(),
+        "cached_reports": len(files),
+        "cached_bytes": sum(os.path.getsize(path) for path in files),
+        "policy": {"max_reports": REPORT_CACHE_MAX_REPORTS, "max_age_hours": REPORT_CACHE_MAX_AGE_HOURS},
+    }
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+import pytz
+from datetime import timedelta, time
+
+from models import db, StoreStatus
+from business_hours import report_window_index
+from retention import STORE_ID_CHUNK, archived_polls
+from tz_offsets import offset_table
+from config import logger
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_HOUR = 3600 * NS_PER_SECOND
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+REPORT_WINDOWS = (
+    ("hour", timedelta(hours=1)),
+    ("day", timedelta(days=1)),
+    ("week", timedelta(weeks=1)),
+)
+
+# Polls this far before a window start count as "data present" for the window,
+# mirroring the buffer used by calculate_uptime_downtime.
+POLL_BUFFER = timedelta(hours=2)
+
+
+def to_ns(dt) -> int:
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    return pd.Timestamp(dt).value
+
+
+def _time_to_ns(t: time) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * NS_PER_SECOND + t.microsecond * 1000
+
+
+class StoreSchedules:
+    """Weekly business hours and timezones for a set of stores, packed into arrays.
+
+    Each store owns seven weekday slots; ``ptr[store * 7 + weekday]`` indexes the
+    first entry of that slot in ``open_ns``/``close_ns`` (offsets from local
+    midnight, overnight closes already pushed past 24h).
+    """
+
+    def __init__(self, store_ids, hours_index):
+        self.store_ids = list(store_ids)
+        self.timezones = [hours_index.get_timezone(store_id) for store_id in self.store_ids]
+
+        counts = np.zeros(len(self.store_ids) * 7, dtype=np.int64)
+        slots = [[] for _ in range(len(counts))]
+        for idx, store_id in enumerate(self.store_ids):
+            for day, start, end in hours_index.get_business_hours(store_id):
+                open_ns = _time_to_ns(start)
+                close_ns = _time_to_ns(end)
+                if end < start:
+                    close_ns += NS_PER_DAY
+                slots[idx * 7 + day].append((open_ns, close_ns))
+
+        for key, entries in enumerate(slots):
+            counts[key] = len(entries)
+        self.ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.ptr[1:])
+        flat = [entry for entries in slots for entry in entries]
+        self.open_ns = np.array([entry[0] for entry in flat], dtype=np.int64)
+        self.close_ns = np.array([entry[1] for entry in flat], dtype=np.int64)
+
+    def valid_mask(self) -> np.ndarray:
+        """False for stores whose timezone pytz cannot resolve; those stores are logged and skipped."""
+        invalid = {}
+        for tz_name in set(self.timezones):
+            try:
+                pytz.timezone(tz_name)
+            except Exception as e:
+                invalid[tz_name] = e
+
+        valid = np.ones(len(self.store_ids), dtype=bool)
+        for idx, tz_name in enumerate(self.timezones):
+            if tz_name in invalid:
+                logger.error(f"Error processing store {self.store_ids[idx]}: {invalid[tz_name]}")
+                valid[idx] = False
+        return valid
+
+    def utc_offsets(self, store_idx: np.ndarray, ts_ns: np.ndarray) -> np.ndarray:
+        offsets = np.zeros(len(ts_ns), dtype=np.int64)
+        tz_per_row = np.asarray(self.timezones, dtype=object)[store_idx]
+        for tz_name in pd.unique(tz_per_row):
+            mask = tz_per_row == tz_name
+            offsets[mask] = offset_table(tz_name).offsets_at(ts_ns[mask] // 1000) * 1000
+        return offsets
+
+    def business_ns(self, store_idx: np.ndarray, start_ns: np.ndarray, end_ns: np.ndarray,
+                    clip_start: np.ndarray = None, clip_end: np.ndarray = None) -> np.ndarray:
+        """Business-hours overlap of each [start, end] interval, in nanoseconds.
+
+        Follows get_business_hours_in_period exactly: local days are walked from
+        the start's local date to the end's local date, and every opening of
+        those days is placed using the UTC offset in force at the start. With
+        ``clip_start``/``clip_end`` only the part of each interval inside the
+        clip is measured, against the openings placed for the whole interval, so
+        the pieces of an interval add up to the interval.
+        """
+        if clip_start is None:
+            clip_start, clip_end = start_ns, end_ns
+        result = np.zeros(len(start_ns), dtype=np.float64)
+        live = np.flatnonzero((end_ns > start_ns) & (clip_end > clip_start))
+        if len(live) == 0:
+            return result
+
+        stores = store_idx[live]
+        starts = start_ns[live]
+        ends = end_ns[live]
+        clip_starts = clip_start[live]
+        clip_ends = clip_end[live]
+        start_offsets = self.utc_offsets(stores, starts)
+        first_day = (starts + start_offsets) // NS_PER_DAY
+        last_day = (ends + self.utc_offsets(stores, ends)) // NS_PER_DAY
+
+        day_counts = np.maximum(last_day - first_day + 1, 0)
+        query = np.repeat(np.arange(len(live)), day_counts)
+        day = first_day[query] + (np.arange(len(query)) - np.repeat(np.cumsum(day_counts) - day_counts, day_counts))
+        slot = stores[query] * 7 + (day + 3) % 7  # 1970-01-01 was a Thursday
+
+        entry_counts = self.ptr[slot + 1] - self.ptr[slot]
+        row = np.repeat(np.arange(len(query)), entry_counts)
+        entry = self.ptr[slot[row]] + (np.arange(len(row)) - np.repeat(np.cumsum(entry_counts) - entry_counts, entry_counts))
+
+        q = query[row]
+        midnight = day[row] * NS_PER_DAY - start_offsets[q]
+        opens = midnight + self.open_ns[entry]
+        closes = midnight + self.close_ns[entry]
+        overlap = np.minimum(closes, clip_ends[q]) - np.maximum(opens, clip_starts[q])
+        np.maximum(overlap, 0, out=overlap)
+
+        result[live] = np.bincount(q, weights=overlap, minlength=len(live))
+        return result
+
+
+class ReportEngine:
+    """Computes hour/day/week uptime and downtime for a whole fleet in one pass.
+
+    The week's polls are fetched with a single query and every store is
+    evaluated together with array arithmetic; results match
+    StoreMonitoringService.calculate_uptime_downtime store for store.
+    """
+
+    def __init__(self, current_time, store_ids, hours_index=None, polls=None, store_range=None):
+        if current_time.tzinfo is None:
+            current_time = pytz.UTC.localize(current_time)
+        self.current_time = current_time
+        self.store_ids = list(store_ids)
+        self.hours_index = hours_index
+        # (store_id, timestamp_utc, status) rows of the window already read by the caller, in store order
+        self.polls = polls
+        # (first, last) store_id in the database's own order, as bounded_report takes them from an ORDER BY;
+        # without it polls are read by IN lists, since Python's string order need not match the collation
+        self.store_range = store_range
+
+    def load_polls(self):
+        week_start = self.current_time - max(window for _, window in REPORT_WINDOWS)
+        rows = self.polls
+        if rows is None:
+            query = db.session.query(
+                StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.status
+            ).filter(
+                StoreStatus.timestamp_utc >= week_start - POLL_BUFFER,
+                StoreStatus.timestamp_utc <= self.current_time
+            ).order_by(StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.id)
+            if self.store_range:
+                rows = query.filter(StoreStatus.store_id.between(*self.store_range)).all()
+            else:
+                rows = []
+                for start in range(0, len(self.store_ids), STORE_ID_CHUNK):
+                    rows += query.filter(StoreStatus.store_id.in_(self.store_ids[start:start + STORE_ID_CHUNK])).all()
+
+        polls = pd.DataFrame(rows, columns=["store_id", "timestamp_utc", "status"])
+        archived = archived_polls(week_start - POLL_BUFFER, self.current_time, store_range=self.store_range,
+                                  store_ids=None if self.store_range else self.store_ids)
+        if len(archived):
+            polls = pd.concat([polls, archived], ignore_index=True).sort_values(
+                ["store_id", "timestamp_utc"], kind="stable", ignore_index=True)
+        position = {store_id: idx for idx, store_id in enumerate(self.store_ids)}
+        polls["store_idx"] = polls["store_id"].map(position)
+        polls = polls[polls["store_idx"].notna()]
+        return (
+            polls["store_idx"].to_numpy(dtype=np.int64),
+            pd.to_datetime(polls["timestamp_utc"]).to_numpy(dtype="datetime64[ns]").astype(np.int64),
+            (polls["status"] == "active").to_numpy(),
+        )
+
+    def compute(self) -> pd.DataFrame:
+        """Raw uptime/downtime hours per store, indexed by store_id."""
+        if self.hours_index is None:
+            self.hours_index = report_window_index(self.current_time, self.store_ids, self.store_range)
+        schedules = StoreSchedules(self.store_ids, self.hours_index)
+        valid = schedules.valid_mask()
+
+        store_idx, ts_ns, active = self.load_polls()
+        keep = valid[store_idx]
+        store_idx, ts_ns, active = store_idx[keep], ts_ns[keep], active[keep]
+
+        # Runs of one store's polls with the same status, UTC offset and local day, as StatusTimeline
+        # measures them: business_ns places a run's openings by its first poll, like each poll's own
+        now_ns = to_ns(self.current_time)
+        offsets = schedules.utc_offsets(store_idx, ts_ns)
+        local_day = (ts_ns + offsets) // NS_PER_DAY
+        first = np.ones(len(ts_ns), dtype=bool)
+        first[1:] = ((store_idx[1:] != store_idx[:-1]) | (active[1:] != active[:-1])
+                     | (offsets[1:] != offsets[:-1]) | (local_day[1:] != local_day[:-1]))
+        run_id = np.cumsum(first) - 1
+        run_store, run_start, run_active = store_idx[first], ts_ns[first], active[first]
+        run_end = np.full(len(run_start), now_ns, dtype=np.int64)
+        same_store = run_store[1:] == run_store[:-1]
+        run_end[:-1][same_store] = run_start[1:][same_store]
+        run_ns = schedules.business_ns(run_store, run_start, run_end)
+
+        n = len(self.store_ids)
+        columns = {}
+        for name, window in REPORT_WINDOWS:
+            start_ns = to_ns(self.current_time - window)
+            counted = run_start >= start_ns
+            # A window opening mid-run counts that run from its first poll inside the window
+            entry = np.zeros(len(ts_ns), dtype=bool)
+            entry[1:] = ~first[1:] & (ts_ns[1:] >= start_ns) & (ts_ns[:-1] < start_ns)
+            entry_ns = schedules.business_ns(store_idx[entry], ts_ns[entry], run_end[run_id[entry]])
+            entry_active = active[entry]
+
+            uptime = np.zeros(n)
+            uptime += np.bincount(run_store[counted & run_active], weights=run_ns[counted & run_active], minlength=n)
+            uptime += np.bincount(store_idx[entry][entry_active], weights=entry_ns[entry_active], minlength=n)
+            downtime = np.zeros(n)
+            downtime += np.bincount(run_store[counted & ~run_active], weights=run_ns[counted & ~run_active], minlength=n)
+            downtime += np.bincount(store_idx[entry][~entry_active], weights=entry_ns[~entry_active], minlength=n)
+
+            buffered = ts_ns >= to_ns(self.current_time - window - POLL_BUFFER)
+            no_data = np.bincount(store_idx[buffered], minlength=n) == 0
+            empty = np.flatnonzero(no_data & valid)
+            uptime[empty] = schedules.business_ns(
+                empty,
+                np.full(len(empty), start_ns, dtype=np.int64),
+                np.full(len(empty), now_ns, dtype=np.int64),
+            )
+
+            columns[f"uptime_{name}"] = uptime / NS_PER_HOUR
+            columns[f"downtime_{name}"] = downtime / NS_PER_HOUR
+
+        result = pd.DataFrame(columns, index=pd.Index(self.store_ids, name="store_id"))
+        return result[valid]
+
+    def report_rows(self) -> list[dict]:
+        return format_report_rows(self.compute())
+
+
+def format_report_rows(frame: pd.DataFrame) -> list[dict]:
+    """Report CSV rows from raw hours per store: last hour in minutes, the rest in hours."""
+    return [
+        {
+            'store_id': store_id,
+            'uptime_last_hour': round(row.uptime_hour * 60, 2),  # minutes
+            'uptime_last_day': round(row.uptime_day, 2),
+            'uptime_last_week': round(row.uptime_week, 2),
+            'downtime_last_hour': round(row.downtime_hour * 60, 2),
+            'downtime_last_day': round(row.downtime_day, 2),
+            'downtime_last_week': round(row.downtime_week, 2)
+        }
+        for store_id, row in zip(frame.index, frame.itertuples(index=False))
+    ]
@@ -0,0 +1,222 @@
+"""
+Report files in CSV, Parquet or Arrow IPC, and the optional report_rows table.
+
+Columnar reports are read through memory maps: Parquet skips row groups
+using store_id statistics and unread columns, Arrow IPC record batches are
+used in place. Both need pyarrow, imported only when such a file is written
+or read.
+"""
+
+import csv
+import io
+import os
+
+from sqlalchemy import insert
+
+from models import ReportRow
+from report_writer import PARTIAL_SUFFIX, REPORT_COLUMNS, ReportWriter, iter_report_lines, report_path
+from database import write_session
+from config import REPORT_FORMAT, REPORT_GZIP, REPORT_WRITE_BATCH
+
+REPORT_FORMATS = ("csv", "parquet", "arrow")
+VALUE_COLUMNS = REPORT_COLUMNS[1:]
+MIME_TYPES = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.file"}
+
+
+def report_format(path: str) -> str:
+    if path.endswith(PARTIAL_SUFFIX):
+        path = path[:-len(PARTIAL_SUFFIX)]
+    extension = path.rsplit(".", 1)[-1]
+    return extension if extension in MIME_TYPES else "csv"
+
+
+def open_report_writer(report_dir: str, report_id: str, fmt: str = REPORT_FORMAT, compress: bool = REPORT_GZIP):
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"report format must be one of {', '.join(REPORT_FORMATS)}, not {fmt}")
+    path = report_path(report_dir, report_id, compress, fmt)
+    return ReportWriter(path) if fmt == "csv" else ColumnarReportWriter(path, fmt)
+
+
+def report_schema():
+    import pyarrow as pa  # needs pyarrow
+    return pa.schema([("store_id", pa.string())] + [(column, pa.float64()) for column in VALUE_COLUMNS])
+
+
+class ColumnarReportWriter:
+    """ReportWriter for Parquet (a row group per batch) or Arrow IPC files (a record batch per batch).
+
+    Both formats are only readable once commit writes their footer, so a
+    running columnar report has no partial rows to serve.
+    """
+
+    def __init__(self, path: str, fmt: str):
+        import pyarrow as pa  # needs pyarrow
+
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.format = fmt
+        self.schema = report_schema()
+        self.rows = 0
+        self._sink = None
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.partial_path, self.schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(self.partial_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._closed = False
+
+    def write_rows(self, rows: list[dict]):
+        if not rows:
+            return
+        import pyarrow as pa
+
+        batch = pa.RecordBatch.from_pylist(rows, schema=self.schema)
+        if self.format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self.rows += len(rows)
+
+    def copy_rows(self, path: str, store_ids, batch_size: int = 1000) -> set:
+        """Append the rows for ``store_ids`` from the report at ``path``; returns the stores copied."""
+        copied, batch = set(), []
+        for row in iter_report_rows(path, store_ids):
+            copied.add(row["store_id"])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self.write_rows(batch)
+                batch = []
+        self.write_rows(batch)
+        return copied
+
+    def commit(self) -> str:
+        self.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+
+
+def _columnar_tables(path: str, store_ids=None, columns=REPORT_COLUMNS):
+    """pyarrow Tables of a finished columnar report, filtered to ``store_ids`` and projected to ``columns``."""
+    import pyarrow as pa  # needs pyarrow
+    import pyarrow.compute as pc
+
+    read = list(columns) if store_ids is None or "store_id" in columns else ["store_id", *columns]
+    wanted = pa.array(sorted(store_ids), pa.string()) if store_ids is not None else None
+
+    if report_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        if wanted is not None:
+            # Row groups whose store_id range misses every wanted store are skipped unread
+            table = pq.read_table(path, columns=read, filters=[("store_id", "in", wanted.to_pylist())],
+                                  memory_map=True)
+            yield table.select(list(columns))
+            return
+        report = pq.ParquetFile(path, memory_map=True)
+        for group in range(report.num_row_groups):
+            yield report.read_row_group(group, columns=read)
+        return
+
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            table = pa.Table.from_batches([reader.get_batch(index)]).select(read)
+            if wanted is not None:
+                table = table.filter(pc.is_in(table["store_id"], value_set=wanted)).select(list(columns))
+            yield table
+
+
+def iter_report_rows(path: str, store_ids=None, columns=REPORT_COLUMNS):
+    """Rows of a finished report as dicts, in file order; values other than store_id are floats."""
+    if report_format(path) != "csv":
+        for table in _columnar_tables(path, store_ids, columns):
+            yield from table.to_pylist()
+        return
+
+    for row in csv.DictReader(iter_report_lines(path, store_ids)):
+        yield {column: row[column] if column == "store_id" else float(row[column]) for column in columns}
+
+
+def query_report(path: str, store_ids=None, columns=REPORT_COLUMNS, offset: int = 0, limit: int = None):
+    """``(matching_rows, page)``: the rows for ``store_ids`` (all when None), projected to ``columns``.
+
+    The page is ``limit`` rows from ``offset`` in file order. Unfiltered
+    Parquet pages only decode the row groups they overlap.
+    """
+    end = None if limit is None else offset + limit
+    fmt = report_format(path)
+    if fmt == "parquet" and store_ids is None:
+        return _parquet_page(path, columns, offset, end)
+
+    total, page = 0, []
+    if fmt == "csv":
+        for row in iter_report_rows(path, store_ids, columns):
+            if total >= offset and (end is None or total < end):
+                page.append(row)
+            total += 1
+        return total, page
+
+    for table in _columnar_tables(path, store_ids, columns):
+        lo, hi = max(offset - total, 0), table.num_rows if end is None else min(end - total, table.num_rows)
+        if lo < hi:
+            page.extend(table.slice(lo, hi - lo).to_pylist())
+        total += table.num_rows
+    return total, page
+
+
+def _parquet_page(path: str, columns, offset: int, end):
+    import pyarrow.parquet as pq  # needs pyarrow
+
+    report = pq.ParquetFile(path, memory_map=True)
+    total, page, first = report.metadata.num_rows, [], 0
+    for group in range(report.num_row_groups):
+        rows = report.metadata.row_group(group).num_rows
+        lo, hi = max(offset - first, 0), rows if end is None else min(end - first, rows)
+        if lo < hi:
+            page.extend(report.read_row_group(group, columns=list(columns)).slice(lo, hi - lo).to_pylist())
+        first += rows
+    return total, page
+
+
+def iter_report_csv(path: str, store_ids=None):
+    """CSV lines (header first) of any report; CSV files are streamed as written, even while running."""
+    if report_format(path) == "csv":
+        yield from iter_report_lines(path, store_ids)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=REPORT_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for table in _columnar_tables(path, store_ids):
+        writer.writerows(table.to_pylist())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def store_report_rows(report_id: str, path: str, batch_size: int = REPORT_WRITE_BATCH) -> int:
+    """Copy a finished report's rows into report_rows under ``report_id``, in one transaction."""
+    session = write_session()
+    rows, batch = 0, []
+    try:
+        for row in iter_report_rows(path):
+            batch.append({"report_id": report_id, **row})
+            if len(batch) >= batch_size:
+                session.execute(insert(ReportRow), batch)
+                rows, batch = rows + len(batch), []
+        if batch:
+            session.execute(insert(ReportRow), batch)
+            rows += len(batch)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return rows
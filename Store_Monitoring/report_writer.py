@@ -0,0 +1,113 @@
+import codecs
+import csv
+import gzip
+import io
+import os
+import zlib
+
+REPORT_COLUMNS = [
+    'store_id',
+    'uptime_last_hour',
+    'uptime_last_day',
+    'uptime_last_week',
+    'downtime_last_hour',
+    'downtime_last_day',
+    'downtime_last_week',
+]
+PARTIAL_SUFFIX = ".part"
+READ_CHUNK = 64 * 1024
+
+
+def report_path(report_dir: str, report_id: str, compress: bool = False, fmt: str = "csv") -> str:
+    if fmt != "csv":
+        return os.path.join(report_dir, f"report_{report_id}.{fmt}")
+    return os.path.join(report_dir, f"report_{report_id}.csv{'.gz' if compress else ''}")
+
+
+class ReportWriter:
+    """Appends report rows to ``<path>.part`` batch by batch and renames it to ``path`` on commit.
+
+    Every batch is flushed (a sync flush for gzip), so readers of the partial
+    file always see whole rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.compressed = path.endswith(".gz")
+        self.rows = 0
+
+        if self.compressed:
+            self._file = gzip.open(self.partial_path, "wt", newline="")
+        else:
+            self._file = open(self.partial_path, "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=REPORT_COLUMNS, lineterminator="\n")
+        self._writer.writeheader()
+        self._file.flush()
+
+    def write_rows(self, rows: list[dict]):
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows += len(rows)
+
+    def copy_rows(self, path: str, store_ids, batch_size: int = 1000) -> set:
+        """Append the rows for ``store_ids`` from the report at ``path``; returns the stores copied."""
+        copied, batch = set(), []
+        lines = iter_report_lines(path, store_ids)
+        next(lines, None)  # header
+        for line in lines:
+            copied.add(_store_id(line))
+            batch.append(line)
+            if len(batch) >= batch_size:
+                self._write_lines(batch)
+                batch = []
+        self._write_lines(batch)
+        return copied
+
+    def _write_lines(self, lines: list[str]):
+        self._file.writelines(lines)
+        self._file.flush()
+        self.rows += len(lines)
+
+    def commit(self) -> str:
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def close(self):
+        """Stop writing and leave whatever was written in the partial file."""
+        if not self._file.closed:
+            self._file.close()
+
+
+def iter_report_lines(path: str, store_ids=None):
+    """Yield the header and then complete CSV lines of a report, plain or gzip, finished or still being written.
+
+    With ``store_ids`` only rows for those stores follow the header.
+    """
+    if not os.path.exists(path) and path.endswith(PARTIAL_SUFFIX):
+        path = path[:-len(PARTIAL_SUFFIX)]  # finished while we were looking
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if ".gz" in os.path.basename(path) else None
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending, header_sent = "", False
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            pending += decoder.decode(chunk)
+
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if not header_sent:
+                    header_sent = True
+                    yield line + "\n"
+                elif store_ids is None or _store_id(line) in store_ids:
+                    yield line + "\n"
+
+
+def _store_id(line: str) -> str:
+    return next(csv.reader(io.StringIO(line)))[0]
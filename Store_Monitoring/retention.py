@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+from sqlalchemy import func, insert
+
+from models import db, StoreStatus, StoreTimezone, StatusSegment, ArchivePartition
+from changes import record_changes
+from metrics import registry
+from tz_offsets import offset_table
+from config import (DEFAULT_TIMEZONE, RETENTION_ARCHIVE_DIR, RETENTION_ARCHIVE_FORMAT, RETENTION_HOT_DAYS,
+                    RETENTION_INTERVAL_SECONDS, logger)
+
+DAY = timedelta(days=1)
+NS_PER_HOUR = 3600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+DELETE_CHUNK = 500
+# store_ids per IN list when polls are read for a given set of stores
+STORE_ID_CHUNK = 500
+SEGMENT_COLUMNS = ["store_id", "timestamp_utc", "status"]
+
+
+def naive_utc(dt: datetime) -> datetime:
+    return dt.astimezone(pytz.UTC).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def archive_cutoff():
+    """Start of the first UTC day still held in full in store_status, or None if nothing is archived."""
+    last_day = db.session.query(func.max(ArchivePartition.day)).scalar()
+    return datetime.combine(last_day, datetime.min.time()) + DAY if last_day else None
+
+
+def local_days(polls: pd.DataFrame, timezones: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Local day number and UTC offset (ns) of each poll in its store's timezone."""
+    ts_ns = pd.to_datetime(polls["timestamp_utc"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    tz_names = polls["store_id"].map(timezones).fillna(DEFAULT_TIMEZONE).to_numpy()
+    offsets = np.zeros(len(polls), dtype=np.int64)
+    for tz_name in set(tz_names):
+        try:
+            table = offset_table(tz_name)
+        except pytz.UnknownTimeZoneError:
+            continue  # the report skips these stores anyway
+        mask = tz_names == tz_name
+        offsets[mask] = table.offsets_at(ts_ns[mask] // 1000) * 1000
+    return (ts_ns + offsets) // NS_PER_DAY, offsets
+
+
+def run_segments(polls: pd.DataFrame, timezones: dict = None) -> pd.DataFrame:
+    """Collapse polls sorted by (store_id, timestamp_utc) into runs of the same store and status.
+
+    With ``timezones`` (store_id -> tz name) runs are also cut where the local
+    day or UTC offset changes. The per-poll walk places business hours by each
+    interval's local start day, so only within such a run can stand-in polls
+    split an interval without changing its hours.
+    """
+    if polls.empty:
+        return pd.DataFrame(columns=["store_id", "start_utc", "end_utc", "status", "polls"])
+    changed = (polls["store_id"] != polls["store_id"].shift()) | (polls["status"] != polls["status"].shift())
+    if timezones is not None:
+        day, offset = local_days(polls, timezones)
+        changed |= np.concatenate([[True], (day[1:] != day[:-1]) | (offset[1:] != offset[:-1])])
+    runs = polls.groupby(changed.cumsum(), sort=False)
+    return pd.DataFrame({
+        "store_id": runs["store_id"].first(),
+        "start_utc": runs["timestamp_utc"].min(),
+        "end_utc": runs["timestamp_utc"].max(),
+        "status": runs["status"].first(),
+        "polls": runs.size(),
+    }).reset_index(drop=True)
+
+
+def expand_segments(segments: pd.DataFrame, start: datetime, end: datetime) -> pd.DataFrame:
+    """Stand-in polls for segments within ``[start, end]``.
+
+    Each run becomes a poll at its first and last poll time plus one at every
+    whole UTC hour in between. Runs cut by local day keep business hours exact,
+    so uptime read from segments is off by at most the hour before the first
+    stand-in of a window, about the polling rate of the source data.
+    """
+    if segments.empty:
+        return pd.DataFrame(columns=SEGMENT_COLUMNS)
+
+    start_ns, end_ns = pd.Timestamp(start).value, pd.Timestamp(end).value
+    seg_start = pd.to_datetime(segments["start_utc"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    seg_end = pd.to_datetime(segments["end_utc"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+    low = np.maximum(seg_start, start_ns)
+    high = np.minimum(seg_end, end_ns)
+    first_hour = -(-low // NS_PER_HOUR) * NS_PER_HOUR
+    counts = np.where(high >= first_hour, (high - first_hour) // NS_PER_HOUR + 1, 0)
+
+    owner = np.repeat(np.arange(len(segments)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    hourly = first_hour[owner] + offsets * NS_PER_HOUR
+
+    edges = np.concatenate([np.arange(len(segments)), np.arange(len(segments))])
+    edge_ts = np.concatenate([seg_start, seg_end])
+    inside = (edge_ts >= start_ns) & (edge_ts <= end_ns)
+
+    rows = np.concatenate([owner, edges[inside]])
+    ts = np.concatenate([hourly, edge_ts[inside]])
+    expanded = pd.DataFrame({
+        "store_id": segments["store_id"].to_numpy()[rows],
+        "timestamp_utc": pd.to_datetime(ts),
+        "status": segments["status"].to_numpy()[rows],
+    })
+    return expanded.drop_duplicates(["store_id", "timestamp_utc"]).sort_values(
+        ["store_id", "timestamp_utc"], kind="stable", ignore_index=True)
+
+
+def archived_polls(start: datetime, end: datetime, store_id: str = None, store_range: tuple = None,
+                   cutoff: datetime = None, store_ids: list = None) -> pd.DataFrame:
+    """Stand-in polls from status_segments for the archived part of ``[start, end]``.
+
+    Limited to ``store_id``, ``store_range`` or ``store_ids`` when given. Pass
+    ``cutoff`` when :func:`archive_cutoff` was already read; otherwise it is looked up.
+    """
+    if cutoff is None:
+        cutoff = archive_cutoff()
+    start, end = naive_utc(start), naive_utc(end)
+    if cutoff is None or start >= cutoff:
+        return pd.DataFrame(columns=SEGMENT_COLUMNS)
+    end = min(end, cutoff)
+
+    query = db.session.query(
+        StatusSegment.store_id, StatusSegment.start_utc, StatusSegment.end_utc, StatusSegment.status
+    ).filter(StatusSegment.start_utc <= end, StatusSegment.end_utc >= start)
+    if store_id is not None:
+        query = query.filter(StatusSegment.store_id == store_id)
+    elif store_range:
+        query = query.filter(StatusSegment.store_id.between(*store_range))
+    if store_ids is not None:
+        rows = []
+        for offset in range(0, len(store_ids), STORE_ID_CHUNK):
+            rows += query.filter(StatusSegment.store_id.in_(store_ids[offset:offset + STORE_ID_CHUNK])).all()
+    else:
+        rows = query.all()
+    segments = pd.DataFrame(rows, columns=["store_id", "start_utc", "end_utc", "status"])
+    return expand_segments(segments, start, end)
+
+
+def with_archived_polls(store_id: str, polls: list[tuple], start: datetime, end: datetime,
+                        cutoff: datetime = None) -> list[tuple]:
+    """``(timestamp_utc, status)`` polls of one store with stand-ins for archived time merged in by time."""
+    archived = archived_polls(start, end, store_id=store_id, cutoff=cutoff)
+    if archived.empty:
+        return polls
+    extra = [(ts.to_pydatetime(), status) for ts, status in zip(archived["timestamp_utc"], archived["status"])]
+    return sorted(list(polls) + extra, key=lambda poll: poll[0])
+
+
+class RetentionManager:
+    """Moves whole UTC days older than ``hot_days`` before the latest poll out of store_status.
+
+    Each day's polls are written to ``<archive_dir>/store_status/<day>.<n>.csv.gz``
+    (or ``.parquet``), collapsed into status_segments and deleted from the hot
+    table in one transaction per day.
+    """
+
+    def __init__(self, hot_days: int = RETENTION_HOT_DAYS, archive_dir: str = RETENTION_ARCHIVE_DIR,
+                 archive_format: str = RETENTION_ARCHIVE_FORMAT):
+        if archive_format not in ("csv", "parquet"):
+            raise ValueError(f"archive format must be csv or parquet, not {archive_format}")
+        self.hot_days = hot_days
+        self.archive_dir = archive_dir
+        self.archive_format = archive_format
+
+    def hot_cutoff(self):
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        if latest is None:
+            return None
+        return datetime.combine(latest.date(), datetime.min.time()) - timedelta(days=self.hot_days)
+
+    def compact(self) -> list[dict]:
+        cutoff = self.hot_cutoff()
+        archived = []
+        while cutoff is not None:
+            oldest = db.session.query(func.min(StoreStatus.timestamp_utc)).filter(
+                StoreStatus.timestamp_utc < cutoff).scalar()
+            if oldest is None:
+                break
+            archived.append(self.archive_day(oldest.date()))
+        if archived:
+            logger.info(f"Archived {sum(day['polls'] for day in archived)} polls from {len(archived)} days")
+        return archived
+
+    def archive_day(self, day) -> dict:
+        day_start = datetime.combine(day, datetime.min.time())
+        rows = db.session.query(
+            StoreStatus.id, StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.status
+        ).filter(
+            StoreStatus.timestamp_utc >= day_start,
+            StoreStatus.timestamp_utc < day_start + DAY
+        ).order_by(StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.id).all()
+        polls = pd.DataFrame(rows, columns=["id"] + SEGMENT_COLUMNS)
+        segments = run_segments(polls, dict(db.session.query(StoreTimezone.store_id, StoreTimezone.timezone_str)))
+
+        path = self._write_archive(day, polls[SEGMENT_COLUMNS])
+        try:
+            if len(segments):
+                db.session.execute(insert(StatusSegment.__table__), segments.to_dict("records"))
+            ids = polls["id"].tolist()
+            for offset in range(0, len(ids), DELETE_CHUNK):
+                StoreStatus.query.filter(StoreStatus.id.in_(ids[offset:offset + DELETE_CHUNK])).delete(
+                    synchronize_session=False)
+            record_changes(polls["store_id"], "store_status")  # their polls are now stand-ins
+            db.session.add(ArchivePartition(day=day, file_path=path, polls=len(polls), segments=len(segments),
+                                            archived_at=datetime.utcnow()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            os.remove(path)
+            raise
+
+        registry.inc("retention_polls_archived_total", len(polls))
+        logger.info(f"Archived {day}: {len(polls)} polls -> {len(segments)} segments ({path})")
+        return {"day": day.isoformat(), "polls": len(polls), "segments": len(segments), "file_path": path}
+
+    def _write_archive(self, day, polls: pd.DataFrame) -> str:
+        directory = os.path.join(self.archive_dir, "store_status")
+        os.makedirs(directory, exist_ok=True)
+        suffix = "parquet" if self.archive_format == "parquet" else "csv.gz"
+        part = 0
+        while os.path.exists(os.path.join(directory, f"{day.isoformat()}.{part}.{suffix}")):
+            part += 1  # late polls for an already archived day
+        path = os.path.join(directory, f"{day.isoformat()}.{part}.{suffix}")
+
+        if self.archive_format == "parquet":
+            polls.to_parquet(path, index=False)  # needs pyarrow or fastparquet
+        else:
+            polls.to_csv(path, index=False, compression="gzip")
+        return path
+
+
+def read_archive(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={"store_id": str}, parse_dates=["timestamp_utc"])
+
+
+class RetentionScheduler:
+    """Runs RetentionManager.compact every ``interval`` seconds in a daemon thread."""
+
+    def __init__(self, app, interval: float = RETENTION_INTERVAL_SECONDS):
+        self.app = app
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    RetentionManager().compact()
+            except Exception as e:
+                logger.error(f"Retention compaction failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old store_status days into segments and cold files")
+    parser.add_argument("command", choices=["compact", "status"])
+    parser.add_argument("--db-uri", help="SQLAlchemy URI (default: config.DB_URI)")
+    args = parser.parse_args()
+
+    from config import DB_URI
+    from parallel_report import make_worker_app
+    with make_worker_app(args.db_uri or DB_URI).app_context():
+        if args.command == "compact":
+            print(json.dumps(RetentionManager().compact(), indent=2))
+        else:
+            partitions = ArchivePartition.query.order_by(ArchivePartition.day).all()
+            print(json.dumps({
+                "archive_cutoff": str(archive_cutoff()),
+                "partitions": [{"day": p.day.isoformat(), "polls": p.polls, "segments": p.segments,
+                                "file_path": p.file_path} for p in partitions],
+            }, indent=2))
@@ -0,0 +1,282 @@
+"""
+Daily and weekly uptime rollups per store and for the whole fleet, for trend dashboards.
+
+Rollups hold business-hours uptime/downtime seconds per UTC day and per UTC
+week (Monday to Sunday), computed from store_status a week at a time with the
+same interval rules as store_hourly_uptime: a poll's status holds until the
+store's next poll. Percentages are derived when queried, so fleet figures are
+weighted by business time. A refresh recomputes the newest rolled week
+onwards, plus every rolled week of stores logged in store_changes (hours or
+timezone edits, backfilled polls); days already archived by retention keep
+the figures they had.
+
+    python rollups.py backfill --since 2023-01-01
+"""
+
+import argparse
+import calendar
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import func, insert
+
+from models import db, StoreStatus, UptimeRollup, FleetUptimeRollup
+from aggregates import hourly_buckets, load_polls_around, naive_utc
+from business_hours import BusinessHoursIndex
+from changes import changed_stores, latest_change_seq
+from report_cache import ROLLUPS_CHANGE_SEQ, set_version, table_versions
+from retention import archive_cutoff
+from config import ROLLUP_BACKFILL_DAYS, ROLLUP_INTERVAL_SECONDS, logger
+
+DAY = timedelta(days=1)
+WEEK = timedelta(weeks=1)
+GRANULARITIES = ("day", "week")
+SCOPE_LIMIT = 500  # store ids per IN list when only some stores are recomputed or queried
+
+
+def day_floor(dt: datetime) -> datetime:
+    return naive_utc(dt).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def week_floor(dt: datetime) -> datetime:
+    day = day_floor(dt)
+    return day - timedelta(days=day.weekday())
+
+
+class UptimeRollups:
+    """Maintains uptime_rollups and fleet_uptime_rollups; each week is committed as it is written."""
+
+    def backfill(self, since: datetime = None) -> int:
+        """Recompute every week from ``since`` (default: ROLLUP_BACKFILL_DAYS back) to the latest poll."""
+        seq = latest_change_seq()
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        if latest is None:
+            return 0
+        weeks = self._recompute_weeks(since or latest - timedelta(days=ROLLUP_BACKFILL_DAYS), latest)
+        set_version(ROLLUPS_CHANGE_SEQ, seq)
+        db.session.commit()
+        return weeks
+
+    def refresh(self) -> int:
+        """Roll up new polls and changed stores since the last refresh; returns the weeks recomputed."""
+        seq = latest_change_seq()
+        done = table_versions().get(ROLLUPS_CHANGE_SEQ)
+        first_rolled, last_rolled = db.session.query(
+            func.min(UptimeRollup.period_start), func.max(UptimeRollup.period_start)
+        ).filter(UptimeRollup.granularity == "week").one()
+        if done is None or first_rolled is None:
+            return self.backfill()
+
+        changed = changed_stores(done) if seq > done else set()
+        if changed is None:
+            return self.backfill(first_rolled)
+
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+        weeks = self._recompute_weeks(last_rolled, latest)
+        if changed:
+            weeks += self._recompute_weeks(first_rolled, last_rolled - DAY, sorted(changed))
+            logger.info(f"Recomputed uptime rollups of {len(changed)} changed stores")
+        set_version(ROLLUPS_CHANGE_SEQ, seq)
+        db.session.commit()
+        return weeks
+
+    def _recompute_weeks(self, start: datetime, end: datetime, store_ids=None) -> int:
+        """Recompute the weeks from the one holding ``start`` to the one holding ``end``; archived days are kept."""
+        if end is None:
+            return 0
+        week, last = week_floor(start), week_floor(end)
+        cutoff = archive_cutoff()
+        if cutoff is not None:
+            # The first week held in full in store_status; the cutoff is always a midnight
+            week = max(week, week_floor(cutoff + WEEK - DAY))
+
+        weeks = 0
+        while week <= last:
+            self._recompute_week(week, store_ids)
+            db.session.commit()
+            week, weeks = week + WEEK, weeks + 1
+        return weeks
+
+    def _recompute_week(self, week: datetime, store_ids=None):
+        end = week + WEEK
+        scopes = [None] if store_ids is None else [store_ids[i:i + SCOPE_LIMIT]
+                                                   for i in range(0, len(store_ids), SCOPE_LIMIT)]
+        for scope in scopes:
+            polls = load_polls_around(week, end, scope)
+            ranges = {store_id: (week, end) for store_id in polls["store_id"].unique()}
+            rollups = []
+            if ranges:
+                hours_index = BusinessHoursIndex.build(week, end, list(ranges) if scope else None)
+                rollups = self._periods(hourly_buckets(polls, hours_index, ranges))
+
+            stale = db.session.query(UptimeRollup).filter(UptimeRollup.period_start >= week,
+                                                           UptimeRollup.period_start < end)
+            if scope is not None:
+                stale = stale.filter(UptimeRollup.store_id.in_(scope))
+            stale.delete(synchronize_session=False)
+            if rollups:
+                db.session.execute(insert(UptimeRollup), rollups)
+        self._refresh_fleet(week, end)
+
+    @staticmethod
+    def _periods(buckets: pd.DataFrame) -> list[dict]:
+        if buckets.empty:
+            return []
+        day = pd.to_datetime(buckets["hour_start"]).dt.floor("D")
+        periods = {"day": day, "week": day - pd.to_timedelta(day.dt.weekday, unit="D")}
+        rows = []
+        for granularity, period_start in periods.items():
+            sums = buckets.assign(period_start=period_start).groupby(
+                ["store_id", "period_start"], as_index=False)[["uptime_seconds", "downtime_seconds"]].sum()
+            sums.insert(0, "granularity", granularity)
+            rows += sums.to_dict("records")
+        return rows
+
+    def _refresh_fleet(self, start: datetime, end: datetime):
+        db.session.query(FleetUptimeRollup).filter(FleetUptimeRollup.period_start >= start,
+                                                   FleetUptimeRollup.period_start < end).delete(
+            synchronize_session=False)
+        totals = db.session.query(
+            UptimeRollup.granularity, UptimeRollup.period_start, func.sum(UptimeRollup.uptime_seconds),
+            func.sum(UptimeRollup.downtime_seconds), func.count(UptimeRollup.id)
+        ).filter(UptimeRollup.period_start >= start, UptimeRollup.period_start < end).group_by(
+            UptimeRollup.granularity, UptimeRollup.period_start).all()
+        if totals:
+            db.session.execute(insert(FleetUptimeRollup), [
+                {"granularity": granularity, "period_start": period_start, "uptime_seconds": uptime,
+                 "downtime_seconds": downtime, "stores": stores}
+                for granularity, period_start, uptime, downtime, stores in totals
+            ])
+
+
+class TrendQueryError(ValueError):
+    pass
+
+
+def parse_utc(value: str, name: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace(" UTC", "").replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        raise TrendQueryError(f"{name} must be an ISO 8601 timestamp")
+    return naive_utc(parsed)
+
+
+def parse_target(target: str) -> tuple:
+    """``fleet:<granularity>`` or ``store:<store_id>:<granularity>`` as ``(store_id or None, granularity)``."""
+    name, _, granularity = str(target).rpartition(":")
+    if granularity not in GRANULARITIES or not (name == "fleet" or (name.startswith("store:") and name[6:])):
+        raise TrendQueryError(f"unknown target {target!r}; use fleet:day, fleet:week or store:<store_id>:day|week")
+    return (None if name == "fleet" else name[6:]), granularity
+
+
+def _percent(uptime: float, downtime: float):
+    total = uptime + downtime
+    return round(100 * uptime / total, 3) if total > 0 else None
+
+
+def _epoch_ms(dt: datetime) -> int:
+    return calendar.timegm(dt.timetuple()) * 1000
+
+
+def query_targets(targets: list, start: datetime, end: datetime) -> list[dict]:
+    """Grafana time series of uptime percent, one per target, over the periods starting in ``[start, end)``.
+
+    Each is ``{"target": target, "datapoints": [[percent, epoch_ms], ...]}`` in
+    time order; periods without business time are left out. Store series
+    are read with one indexed query per granularity and 500 stores.
+    """
+    if end <= start:
+        raise TrendQueryError("end must be after start")
+    keys = [parse_target(target) for target in targets]
+    points = {key: [] for key in keys}
+
+    for granularity in {granularity for store_id, granularity in keys if store_id is None}:
+        rows = db.session.query(
+            FleetUptimeRollup.period_start, FleetUptimeRollup.uptime_seconds, FleetUptimeRollup.downtime_seconds
+        ).filter(FleetUptimeRollup.granularity == granularity, FleetUptimeRollup.period_start >= start,
+                 FleetUptimeRollup.period_start < end).order_by(FleetUptimeRollup.period_start)
+        series = points[(None, granularity)]
+        for period, uptime, downtime in rows:
+            percent = _percent(uptime, downtime)
+            if percent is not None:
+                series.append([percent, _epoch_ms(period)])
+
+    for granularity in GRANULARITIES:
+        store_ids = sorted({store_id for store_id, wanted in keys if store_id is not None and wanted == granularity})
+        for i in range(0, len(store_ids), SCOPE_LIMIT):
+            rows = db.session.query(
+                UptimeRollup.store_id, UptimeRollup.period_start, UptimeRollup.uptime_seconds,
+                UptimeRollup.downtime_seconds
+            ).filter(UptimeRollup.granularity == granularity, UptimeRollup.store_id.in_(store_ids[i:i + SCOPE_LIMIT]),
+                     UptimeRollup.period_start >= start, UptimeRollup.period_start < end).order_by(
+                UptimeRollup.store_id, UptimeRollup.period_start)
+            for store_id, period, uptime, downtime in rows:
+                percent = _percent(uptime, downtime)
+                if percent is not None:
+                    points[(store_id, granularity)].append([percent, _epoch_ms(period)])
+
+    return [{"target": target, "datapoints": points[key]} for target, key in zip(targets, keys)]
+
+
+def search_targets(text: str = "", limit: int = 100) -> list[str]:
+    """Targets for a dashboard's metric picker: the fleet series, then stores whose id starts with ``text``."""
+    prefix = text[6:] if text.startswith("store:") else text
+    found = [f"fleet:{granularity}" for granularity in GRANULARITIES if f"fleet:{granularity}".startswith(text)]
+    store_ids = db.session.query(UptimeRollup.store_id).filter(
+        UptimeRollup.granularity == "week", UptimeRollup.store_id.startswith(prefix, autoescape=True)
+    ).distinct().order_by(UptimeRollup.store_id).limit(limit)
+    found += [f"store:{store_id}:{granularity}" for (store_id,) in store_ids for granularity in GRANULARITIES]
+    return found
+
+
+def rolled_range() -> tuple:
+    """First and last period_start of the weekly fleet rollups, or (None, None)."""
+    return db.session.query(func.min(FleetUptimeRollup.period_start), func.max(FleetUptimeRollup.period_start)).filter(
+        FleetUptimeRollup.granularity == "week").one()
+
+
+class RollupScheduler:
+    """Runs UptimeRollups.refresh on start and then every ``interval`` seconds in a daemon thread."""
+
+    def __init__(self, app, interval: float = ROLLUP_INTERVAL_SECONDS):
+        self.app = app
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rollups", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while True:  # refresh at start, then every interval
+            try:
+                with self.app.app_context():
+                    UptimeRollups().refresh()
+            except Exception as e:
+                logger.error(f"Uptime rollup refresh failed: {e}")
+            if self._stopped.wait(self.interval):
+                return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily/weekly uptime rollup tables")
+    parser.add_argument("command", choices=["backfill", "refresh"])
+    parser.add_argument("--since", help="UTC start for backfill, e.g. '2023-01-01' (default: ROLLUP_BACKFILL_DAYS back)")
+    parser.add_argument("--db-uri", help="SQLAlchemy URI (default: config.DB_URI)")
+    args = parser.parse_args()
+
+    from config import DB_URI
+    from migrations import upgrade_schema
+    from parallel_report import make_worker_app
+    with make_worker_app(args.db_uri or DB_URI).app_context():
+        db.create_all()
+        upgrade_schema()
+        rollups = UptimeRollups()
+        if args.command == "backfill":
+            weeks = rollups.backfill(datetime.fromisoformat(args.since) if args.since else None)
+        else:
+            weeks = rollups.refresh()
+        print(json.dumps({"weeks_recomputed": weeks}))
@@ -1,17 +1,27 @@
 from datetime import datetime
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
 from models import StoreStatus
 
 bp = Blueprint("health", __name__)
 
 @bp.route("/health", methods=["GET"])
 def health_check():
+    bootstrap = current_app.extensions.get("bootstrap")
     try:
         store_count = StoreStatus.query.count()
+        if bootstrap is not None and not bootstrap.ready:
+            # Alive but not ready: the initial CSV load is still running in the background
+            return jsonify({
+                "status": "starting",
+                "timestamp": datetime.now().isoformat(),
+                "stores_in_db": store_count,
+                "bootstrap": bootstrap.as_dict()
+            }), 503
         return jsonify({
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
-            "stores_in_db": store_count
+            "stores_in_db": store_count,
+            "bootstrap": bootstrap.as_dict() if bootstrap is not None else None
         }), 200
     except Exception as e:
         return jsonify({
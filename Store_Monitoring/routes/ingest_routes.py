@@ -1,21 +1,62 @@
-from flask import Blueprint, request, jsonify
-import datetime
-from models import db, StoreStatus
+from flask import Blueprint, request, jsonify, current_app
+from ingest import PollValidationError, parse_body, parse_poll, validate_polls, write_polls
+from metrics import registry
 
 bp = Blueprint("ingest", __name__)
 
 @bp.route("/ingest", methods=["POST"])
+@registry.timed("ingest_request_seconds")
 def ingest():
     try:
-        data = request.get_json()
-        ts = datetime.datetime.strptime(data["timestamp_utc"], "%Y-%m-%d %H:%M:%S.%f UTC")
-        new_record = StoreStatus(
-            store_id=data["store_id"],
-            status=data["status"],
-            timestamp_utc=ts
-        )
-        db.session.add(new_record)
-        db.session.commit()
-        return jsonify({"message": "Ingested successfully"}), 200
+        payloads, is_batch = parse_body(request.get_data(), request.content_type or "")
+        buffer = current_app.extensions.get("ingest_buffer")
+
+        if not is_batch:
+            record = parse_poll(payloads[0])
+            registry.inc("ingest_polls_total", result="accepted")
+            if buffer is not None:
+                buffer.add([record])
+                return jsonify({"message": "Ingested successfully (buffered)"}), 202
+            write_polls([record])
+            return jsonify({"message": "Ingested successfully"}), 200
+
+        records, errors = validate_polls(payloads)
+        registry.inc("ingest_polls_total", len(records), result="accepted")
+        registry.inc("ingest_polls_total", len(errors), result="rejected")
+        if not records:
+            return jsonify({"error": "No valid polls in batch", "accepted": 0,
+                            "rejected": len(errors), "errors": errors}), 400
+
+        if buffer is not None:
+            buffer.add(records)
+            return jsonify({
+                "message": f"Ingested {len(records)} polls (buffered)",
+                "accepted": len(records),
+                "rejected": len(errors),
+                "errors": errors
+            }), 202
+
+        written = write_polls(records)
+        return jsonify({
+            "message": f"Ingested {written} polls",
+            "accepted": len(records),
+            "written": written,  # polls already stored are not written again
+            "rejected": len(errors),
+            "errors": errors
+        }), 200
+    except PollValidationError as e:
+        registry.inc("ingest_polls_total", result="rejected")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/ingest/consumer", methods=["GET"])
+def consumer_status():
+    try:
+        consumer = current_app.extensions.get("poll_consumer")
+        if consumer is None:
+            return jsonify({"error": "No poll consumer is running (set CONSUMER_ENABLED)"}), 404
+        return jsonify(consumer.status()), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
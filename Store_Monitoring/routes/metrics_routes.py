@@ -0,0 +1,8 @@
+from flask import Blueprint, Response
+from metrics import registry
+
+bp = Blueprint("metrics", __name__)
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
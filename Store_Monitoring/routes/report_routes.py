@@ -1,26 +1,26 @@
-from flask import Blueprint, request, jsonify, send_file
-import os, uuid
-from datetime import datetime
-import threading
-from services import StoreMonitoringService, report_status
+from flask import Blueprint, Response, request, jsonify, send_file, current_app
+import os
+from jobs import ReportQueueFull, get_job, job_as_dict, list_jobs
+from models import COMPLETE, EXPIRED, FAILED, QUEUED, RUNNING
+from report_cache import cache_summary
+from report_store import MIME_TYPES, iter_report_csv, query_report, report_format
+from report_writer import REPORT_COLUMNS
+from config import REPORT_PAGE_MAX, REPORT_PAGE_SIZE
 
 bp = Blueprint("report", __name__)
 
 @bp.route("/trigger_report", methods=["POST"])
 def trigger_report():
+    bootstrap = current_app.extensions.get("bootstrap")
+    if bootstrap is not None and not bootstrap.ready:
+        return jsonify({"error": "Initial CSV load still running; try again shortly",
+                        "bootstrap": bootstrap.as_dict()}), 503
+
     try:
-        report_id = str(uuid.uuid4())
-        report_status[report_id] = {"status": "Running", "started_at": datetime.now().isoformat()}
-        service = StoreMonitoringService()
-
-        thread = threading.Thread(
-            target=service.generate_report_background,  # call method on instance
-            args=(report_id,),
-        )
-        thread.daemon = True
-        thread.start()
-
-        return jsonify({"report_id": report_id}), 200
+        report_id, attached = current_app.extensions["report_queue"].submit()
+        return jsonify({"report_id": report_id, "attached": attached}), 200
+    except ReportQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -30,27 +30,122 @@ def get_report():
 
     if not report_id:
         return jsonify({"error": "report_id parameter is required"}), 400
-    if report_id not in report_status:
+
+    job = get_job(report_id)
+    if job is None:
         return jsonify({"error": "Report not found"}), 404
 
-    status_info = report_status[report_id]
+    store_ids = requested_store_ids()
+    partial = request.args.get("partial", "false").lower() == "true" and has_partial_rows(job)
+    try:
+        page = requested_page()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if status_info["status"] == "Running":
-        return jsonify({"status": "Running"}), 200
-    elif status_info["status"] == "Complete":
-        if os.path.exists(status_info["file_path"]):
+    if job.status in (QUEUED, RUNNING):
+        if partial:
+            return stream_report(job, store_ids)
+        return jsonify({
+            "status": "Running",
+            "queued": job.status == QUEUED,
+            "progress": job_as_dict(job)["progress"]
+        }), 200
+    elif job.status == COMPLETE:
+        if os.path.exists(job.file_path):
+            if page is not None:
+                return report_page(job, store_ids, *page)
+            if store_ids is not None:
+                return stream_report(job, store_ids)
+            fmt = report_format(job.file_path)
+            if fmt != "csv":
+                return send_file(os.path.abspath(job.file_path), as_attachment=True,
+                                 download_name=f"store_monitoring_report_{report_id}.{fmt}", mimetype=MIME_TYPES[fmt])
+            compressed = job.file_path.endswith(".gz")
             return send_file(
-                status_info["file_path"],
+                os.path.abspath(job.file_path),
                 as_attachment=True,
-                download_name=f"store_monitoring_report_{report_id}.csv",
-                mimetype="text/csv"
+                download_name=f"store_monitoring_report_{report_id}.csv{'.gz' if compressed else ''}",
+                mimetype="application/gzip" if compressed else "text/csv"
             )
         return jsonify({"error": "Report file not found"}), 404
-    elif status_info["status"] == "Failed":
-        return jsonify({"error": status_info.get("error", "Unknown error")}), 500
+    elif job.status == FAILED:
+        if partial:
+            return stream_report(job, store_ids)
+        return jsonify({"error": job.error or "Unknown error"}), 500
+    elif job.status == EXPIRED:
+        return jsonify({"error": "Report expired from the cache, trigger a new one"}), 410
 
     return jsonify({"error": "Unknown report status"}), 500
 
+def requested_store_ids():
+    """store_id query parameters, repeated or comma separated; None when absent."""
+    values = [part for value in request.args.getlist("store_id") for part in value.split(",") if part]
+    return set(values) if values else None
+
+def requested_page():
+    """``(columns, offset, limit)`` when rows are asked for as a JSON page, else None."""
+    args = request.args
+    if args.get("format") != "json" and not any(name in args for name in ("columns", "offset", "limit")):
+        return None
+
+    columns = [part for value in args.getlist("columns") for part in value.split(",") if part] or REPORT_COLUMNS
+    unknown = [column for column in columns if column not in REPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    offset = int_arg("offset", 0)
+    limit = int_arg("limit", REPORT_PAGE_SIZE)
+    if offset < 0 or not 0 < limit <= REPORT_PAGE_MAX:
+        raise ValueError(f"offset must be >= 0 and limit between 1 and {REPORT_PAGE_MAX}")
+    return columns, offset, limit
+
+def int_arg(name: str, default: int) -> int:
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+def has_partial_rows(job) -> bool:
+    # Columnar files have no readable rows until their footer is written
+    return bool(job.file_path) and report_format(job.file_path) == "csv" and os.path.exists(job.file_path)
+
+def report_page(job, store_ids, columns, offset, limit):
+    total, rows = query_report(job.file_path, store_ids, columns, offset, limit)
+    return jsonify({
+        "report_id": job.report_id,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "columns": columns,
+        "rows": rows,
+    }), 200
+
+def stream_report(job, store_ids=None):
+    """Chunked text/csv response of the rows written so far, optionally only for ``store_ids``."""
+    return Response(
+        iter_report_csv(job.file_path, store_ids),
+        mimetype="text/csv",
+        headers={
+            "X-Report-Status": job.status,
+            "X-Stores-Processed": str(job.stores_processed),
+            "X-Total-Stores": str(job.total_stores or 0),
+        }
+    )
+
 @bp.route("/reports", methods=["GET"])
 def list_reports():
-    return jsonify({"reports": report_status}), 200
+    limit = request.args.get("limit", 100, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    jobs = list_jobs(limit, offset, request.args.get("status"))
+    return jsonify({"reports": {job.report_id: job_as_dict(job) for job in jobs}, "limit": limit,
+                    "offset": offset}), 200
+
+
+@bp.route("/report_cache", methods=["GET"])
+def report_cache_stats():
+    try:
+        return jsonify(cache_summary()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,22 @@
+from flask import Blueprint, request, jsonify
+
+bp = Blueprint("store", __name__)
+
+@bp.route("/stores/<store_id>/uptime", methods=["GET"])
+def get_store_uptime(store_id):
+    from store_uptime import UptimeQueryError, store_exists, store_uptime  # pulls in pandas on first use
+
+    try:
+        if not store_exists(store_id):
+            return jsonify({"error": "Store not found"}), 404
+        return jsonify(store_uptime(
+            store_id,
+            start=request.args.get("start"),
+            end=request.args.get("end"),
+            window=request.args.get("window"),
+            as_of=request.args.get("as_of")
+        )), 200
+    except UptimeQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from flask import Blueprint, request, jsonify
+
+bp = Blueprint("trends", __name__)
+
+@bp.route("/trends/uptime", methods=["GET"])
+def get_uptime_trend():
+    from rollups import TrendQueryError, parse_utc, query_targets, rolled_range  # pulls in pandas on first use
+
+    try:
+        granularity = request.args.get("granularity", "day")
+        store_ids = [s for s in request.args.get("store_id", "").split(",") if s]
+        end = request.args.get("end")
+        start = request.args.get("start")
+        if end:
+            end = parse_utc(end, "end")
+        else:
+            last = rolled_range()[1]
+            if last is None:
+                return jsonify({"granularity": granularity, "series": []}), 200
+            end = last + timedelta(weeks=1)
+        start = parse_utc(start, "start") if start else end - timedelta(days=90)
+
+        targets = [f"store:{store_id}:{granularity}" for store_id in store_ids] or [f"fleet:{granularity}"]
+        series = query_targets(targets, start, end)
+        return jsonify({
+            "granularity": granularity,
+            "start": start.isoformat() + "Z",
+            "end": end.isoformat() + "Z",
+            "series": series,
+        }), 200
+    except TrendQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Grafana SimpleJSON / JSON API datasource: point the datasource URL at /trends/grafana
+@bp.route("/trends/grafana", methods=["GET"])
+def grafana_health():
+    return "OK", 200
+
+
+@bp.route("/trends/grafana/search", methods=["POST"])
+def grafana_search():
+    from rollups import search_targets
+
+    try:
+        body = request.get_json(silent=True) or {}
+        return jsonify(search_targets(str(body.get("target") or ""))), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/trends/grafana/query", methods=["POST"])
+def grafana_query():
+    from rollups import TrendQueryError, parse_utc, query_targets
+
+    try:
+        body = request.get_json(silent=True) or {}
+        time_range = body.get("range") or {}
+        if not time_range.get("from") or not time_range.get("to"):
+            return jsonify({"error": "range.from and range.to are required"}), 400
+        targets = [t["target"] for t in body.get("targets", []) if isinstance(t, dict) and t.get("target")]
+        start, end = parse_utc(time_range["from"], "range.from"), parse_utc(time_range["to"], "range.to")
+        return jsonify(query_targets(targets, start, end)), 200
+    except TrendQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
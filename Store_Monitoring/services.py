@@ -1,101 +1,87 @@
 import os
+import time
 import pytz
-import pandas as pd
-from datetime import datetime, timedelta, time
-
-from models import db, StoreStatus, BusinessHours, StoreTimezone
-from config import logger
-report_status = {}
+from functools import cached_property, partial
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+
+from models import db, StoreStatus, BusinessHours, StoreTimezone, COMPLETE, FAILED
+from config import (DB_URI, DEFAULT_TIMEZONE, HOURLY_AGGREGATES_ENABLED, REPORT_DB_TABLE, REPORT_FORMAT,
+                    REPORT_DISTRIBUTED, REPORT_INCREMENTAL, REPORT_MEMORY_LIMIT_MB, REPORT_WORKERS, REPORT_WRITE_BATCH,
+                    logger)
+from aggregates import AggregateReport, HourlyAggregates
+from csv_loader import CsvBulkLoader
+from business_hours import DEFAULT_BUSINESS_HOURS, report_window_index
+from report_engine import ReportEngine, format_report_rows
+from bounded_report import BoundedReport, MemoryBudget
+from distributed import ReportCoordinator
+from parallel_report import iter_report_shards, shard_store_ids, shared_worker_app
+from report_store import open_report_writer, report_format, store_report_rows
+from jobs import data_watermark, update_job, utcnow
+from report_cache import bump_version, evict_reports, find_base_report, find_cached_report
+from changes import changed_stores, latest_change_seq, record_full_change
+from metrics import registry, report_profile
+from memory import MB, PeakRss
+from retention import archive_cutoff, with_archived_polls
+from timeline import StatusTimeline
+from database import read_snapshot
 
 class StoreMonitoringService:
-    def __init__(self):
-        pass
+    def __init__(self, hours_index=None):
+        self.hours_index = hours_index
+
+    @cached_property
+    def archive_cutoff(self):
+        """retention.archive_cutoff(), read once per service rather than once per store."""
+        return archive_cutoff()
 
-    def load_data_from_csvs(self, csv_folder: str, reset: bool = False):
+    @registry.timed("service_call_seconds", method="load_data_from_csvs")
+    def load_data_from_csvs(self, csv_folder: str, reset: bool = False) -> dict:
         try:
             if reset:
                 logger.info("Reset mode ON: Clearing existing data...")
                 db.session.query(StoreStatus).delete()
                 db.session.query(BusinessHours).delete()
                 db.session.query(StoreTimezone).delete()
+                # Bulk deletes skip the after_flush listener that versions ORM edits
+                bump_version("business_hours")
+                bump_version("store_timezones")
+                record_full_change("reset")
+
+            loader = CsvBulkLoader()
 
             status_file = os.path.join(csv_folder, 'store_status.csv')
             if os.path.exists(status_file):
-                status_df = pd.read_csv(status_file)
-                status_df['timestamp_utc'] = pd.to_datetime(status_df['timestamp_utc'])
-
-                inserted = 0
-                for _, row in status_df.iterrows():
-                    exists = StoreStatus.query.filter_by(
-                        store_id=str(row['store_id']),
-                        timestamp_utc=row['timestamp_utc'],
-                        status=row['status']
-                    ).first()
-
-                    if not exists:
-                        store_status = StoreStatus(
-                            store_id=str(row['store_id']),
-                            timestamp_utc=row['timestamp_utc'],
-                            status=row['status']
-                        )
-                        db.session.add(store_status)
-                        inserted += 1
-                        logger.info(f"Inserted {inserted} new store status records")
-
-                logger.info(f"Inserted {inserted} new store status records")
+                loader.load_store_status(status_file)
 
             hours_file = os.path.join(csv_folder, 'menu_hours.csv')
             if os.path.exists(hours_file):
-                hours_df = pd.read_csv(hours_file)
-                inserted = 0
-                for _, row in hours_df.iterrows():
-                    start_time = datetime.strptime(row['start_time_local'], '%H:%M:%S').time()
-                    end_time = datetime.strptime(row['end_time_local'], '%H:%M:%S').time()
-
-                    exists = BusinessHours.query.filter_by(
-                        store_id=str(row['store_id']),
-                        day_of_week=int(row['dayOfWeek']),
-                        start_time_local=start_time,
-                        end_time_local=end_time
-                    ).first()
-
-                    if not exists:
-                        business_hour = BusinessHours(
-                            store_id=str(row['store_id']),
-                            day_of_week=int(row['dayOfWeek']),
-                            start_time_local=start_time,
-                            end_time_local=end_time
-                        )
-                        db.session.add(business_hour)
-                        inserted += 1
-
-                logger.info(f"Inserted {inserted} new business hours records")
+                loader.load_business_hours(hours_file)
             else:
                 logger.warning("Business hours CSV not found, will use 24/7 default")
 
             tz_file = os.path.join(csv_folder, 'timezones.csv')
             if os.path.exists(tz_file):
-                tz_df = pd.read_csv(tz_file)
-                inserted = 0
-                for _, row in tz_df.iterrows():
-                    exists = StoreTimezone.query.filter_by(
-                        store_id=str(row['store_id'])
-                    ).first()
-
-                    if not exists:
-                        store_tz = StoreTimezone(
-                            store_id=str(row['store_id']),
-                            timezone_str=row['timezone_str']
-                        )
-                        db.session.add(store_tz)
-                        inserted += 1
-
-                logger.info(f"Inserted {inserted} new timezone records")
+                loader.load_timezones(tz_file)
             else:
                 logger.warning("Timezone CSV not found, will use America/Chicago default")
 
+            if HOURLY_AGGREGATES_ENABLED:
+                aggregates = HourlyAggregates()
+                if reset or loader.stats.get('business_hours', {}).get('inserted') \
+                        or loader.stats.get('timezones', {}).get('inserted'):
+                    aggregates.rebuild()
+                else:
+                    aggregates.apply_new_polls(loader.poll_ranges)
+
             db.session.commit()
+            self.hours_index = None
+
+            from store_uptime import store_uptime_cache
+            store_uptime_cache.clear()
             logger.info("CSV load completed successfully")
+            return loader.stats
 
         except Exception as e:
             db.session.rollback()
@@ -103,18 +89,30 @@ class StoreMonitoringService:
             raise
 
     def get_store_timezone(self, store_id: str) -> str:
+        if self.hours_index is not None:
+            return self.hours_index.get_timezone(store_id)
+
         tz_record = StoreTimezone.query.filter_by(store_id=store_id).first()
-        return tz_record.timezone_str if tz_record else "America/Chicago"
+        return tz_record.timezone_str if tz_record else DEFAULT_TIMEZONE
 
     def get_business_hours(self, store_id: str) -> list[tuple]:
-        hours = BusinessHours.query.filter_by(store_id=store_id).all()
+        if self.hours_index is not None:
+            return self.hours_index.get_business_hours(store_id)
+
+        hours = BusinessHours.query.filter_by(store_id=store_id).order_by(BusinessHours.id).all()
 
         if not hours:
-            return [(i, time(0, 0, 0), time(23, 59, 59)) for i in range(7)]
+            return list(DEFAULT_BUSINESS_HOURS)
 
         return [(h.day_of_week, h.start_time_local, h.end_time_local) for h in hours]
 
+    @registry.timed("service_call_seconds", method="is_within_business_hours")
     def is_within_business_hours(self, timestamp: datetime, store_id: str) -> bool:
+        if self.hours_index is not None:
+            within = self.hours_index.is_within_business_hours(timestamp, store_id)
+            if within is not None:
+                return within
+
         store_tz = pytz.timezone(self.get_store_timezone(store_id))
 
         if timestamp.tzinfo is None:
@@ -136,7 +134,13 @@ class StoreMonitoringService:
 
         return False
 
+    @registry.timed("service_call_seconds", method="get_business_hours_in_period")
     def get_business_hours_in_period(self, store_id: str, start_datetime: datetime, end_datetime: datetime) -> float:
+        if self.hours_index is not None:
+            total_hours = self.hours_index.business_hours_in_period(store_id, start_datetime, end_datetime)
+            if total_hours is not None:
+                return total_hours
+
         store_tz = pytz.timezone(self.get_store_timezone(store_id))
         business_hours = self.get_business_hours(store_id)
 
@@ -183,63 +187,81 @@ class StoreMonitoringService:
 
         return total_hours
 
+    @registry.timed("store_uptime_seconds")
     def calculate_uptime_downtime(self, store_id: str, start_time: datetime, end_time: datetime) -> tuple[float, float]:
         buffer_time = timedelta(hours=2)
         query_start = start_time - buffer_time
 
-        status_data = StoreStatus.query.filter(
+        status_data = db.session.query(StoreStatus.timestamp_utc, StoreStatus.status).filter(
             StoreStatus.store_id == store_id,
             StoreStatus.timestamp_utc >= query_start,
             StoreStatus.timestamp_utc <= end_time
-        ).order_by(StoreStatus.timestamp_utc).all()
-
-        if not status_data:
-            business_hours_duration = self.get_business_hours_in_period(store_id, start_time, end_time)
-            return business_hours_duration, 0.0
-
-        total_uptime = 0.0
-        total_downtime = 0.0
-
-        for i in range(len(status_data)):
-            current_obs = status_data[i]
-            current_time = current_obs.timestamp_utc
-            is_active = current_obs.status == 'active'
+        ).order_by(StoreStatus.timestamp_utc, StoreStatus.id).all()
+        if self.archive_cutoff is not None:
+            status_data = with_archived_polls(store_id, status_data, query_start, end_time, self.archive_cutoff)
 
-            if current_time.tzinfo is None:
-                current_time = pytz.UTC.localize(current_time)
+        return self.uptime_from_polls(store_id, status_data, start_time, end_time)
 
-            if current_time < start_time:
-                continue
+    def uptime_from_polls(self, store_id: str, status_data: list[tuple], start_time: datetime,
+                          end_time: datetime) -> tuple[float, float]:
+        """Uptime/downtime hours from ``(timestamp_utc, status)`` polls in ``[start_time - 2h, end_time]``, in order."""
+        return self.uptime_from_timeline(store_id, StatusTimeline.from_polls(status_data), start_time, end_time)
 
-            if i + 1 < len(status_data):
-                next_time = status_data[i + 1].timestamp_utc
-                if next_time.tzinfo is None:
-                    next_time = pytz.UTC.localize(next_time)
-                interval_end = min(next_time, end_time)
-            else:
-                interval_end = end_time
-
-            if interval_end.tzinfo is None:
-                interval_end = pytz.UTC.localize(interval_end)
+    def uptime_from_timeline(self, store_id: str, timeline: StatusTimeline, start_time: datetime,
+                             end_time: datetime) -> tuple[float, float]:
+        return timeline.uptime(start_time, end_time, partial(self.get_business_hours_in_period, store_id),
+                               self.get_store_timezone(store_id))
 
-            if current_time < interval_end:
-                interval_start = max(current_time, start_time)
-                duration = self.get_business_hours_in_period(store_id, interval_start, interval_end)
-
-                if is_active:
-                    total_uptime += duration
-                else:
-                    total_downtime += duration
-
-        return total_uptime, total_downtime
-
-    def generate_report_background(self, report_id):
-        try:
-            from app import create_app
-            app = create_app()
+    def generate_report_background(self, report_id, app=None):
+        if app is None:
+            app = current_app._get_current_object() if has_app_context() else shared_worker_app(DB_URI)
 
-            with app.app_context():
+        with app.app_context(), report_profile(report_id), PeakRss() as rss:
+            try:
                 logger.info(f"Starting background report generation: {report_id}")
+                with registry.timer("report_seconds"):
+                    outcome = self._generate_report(report_id)
+                registry.inc("reports_total", status=outcome)
+
+            except Exception as e:
+                logger.error(f"Error generating report {report_id}: {e}")
+                db.session.rollback()
+                update_job(report_id, status=FAILED, error=str(e), completed_at=utcnow())
+                registry.inc("reports_total", status="failed")
+
+            rss.sample()
+            update_job(report_id, peak_rss_bytes=rss.peak)
+            registry.observe("report_peak_rss_bytes", rss.peak)
+            logger.info(f"Report {report_id} peak RSS {rss.peak / MB:.1f} MB")
+
+    def _generate_report(self, report_id) -> str:
+        if HOURLY_AGGREGATES_ENABLED:
+            # Edits that bypassed ingest (e.g. /admin) are folded into the buckets before the snapshot
+            HourlyAggregates().refresh_changed_stores()
+            db.session.commit()
+
+        # Reads come from one snapshot, so the report matches its watermark while /ingest keeps writing
+        with read_snapshot():
+            with registry.timer("report_phase_seconds", phase="prepare"):
+                # Data may have changed while the job sat in the queue. The submit-time watermark
+                # stays put: a job queued after new data may already hold this one.
+                watermark = data_watermark()
+                update_job(report_id, computed_watermark=watermark)
+                cached = find_cached_report(watermark)
+                if cached:
+                    if REPORT_DB_TABLE:
+                        store_report_rows(report_id, cached.file_path)
+                    update_job(
+                        report_id,
+                        status=COMPLETE,
+                        file_path=cached.file_path,
+                        completed_at=utcnow(),
+                        change_seq=cached.change_seq,
+                        stores_processed=cached.stores_processed,
+                        total_stores=cached.total_stores
+                    )
+                    logger.info(f"Report {report_id} reused cached report {cached.report_id}")
+                    return "cached"
 
                 # Fetch max timestamp
                 max_timestamp_result = db.session.query(StoreStatus.timestamp_utc).order_by(
@@ -253,69 +275,110 @@ class StoreMonitoringService:
                 if current_time.tzinfo is None:
                     current_time = pytz.UTC.localize(current_time)
 
-                one_hour_ago = current_time - timedelta(hours=1)
-                one_day_ago = current_time - timedelta(days=1)
-                one_week_ago = current_time - timedelta(weeks=1)
-
-                store_ids = [row[0] for row in db.session.query(StoreStatus.store_id).distinct().all()]
-
-                results = []
-
-                logger.info(f"Processing {len(store_ids)} stores for report {report_id}")
-
-                for idx, store_id in enumerate(store_ids, 1):
-                    try:
-                        uptime_hour, downtime_hour = self.calculate_uptime_downtime(store_id, one_hour_ago,
-                                                                                    current_time)
-                        uptime_day, downtime_day = self.calculate_uptime_downtime(store_id, one_day_ago,
-                                                                                  current_time)
-                        uptime_week, downtime_week = self.calculate_uptime_downtime(store_id, one_week_ago,
-                                                                                    current_time)
-
-                        results.append({
-                            'store_id': store_id,
-                            'uptime_last_hour': round(uptime_hour * 60, 2),  # minutes
-                            'uptime_last_day': round(uptime_day, 2),
-                            'uptime_last_week': round(uptime_week, 2),
-                            'downtime_last_hour': round(downtime_hour * 60, 2),
-                            'downtime_last_day': round(downtime_day, 2),
-                            'downtime_last_week': round(downtime_week, 2)
-                        })
-
-                        if idx % 100 == 0:
-                            logger.info(f"Processed {idx}/{len(store_ids)} stores")
-
-                    except Exception as e:
-                        logger.error(f"Error processing store {store_id}: {e}")
-                        continue
-
-                if results:
-                    df = pd.DataFrame(results)
-                    report_dir = "reports"
-                    os.makedirs(report_dir, exist_ok=True)
-                    report_path = os.path.join(report_dir, f"report_{report_id}.csv")
-                    df.to_csv(report_path, index=False)
-
-                    report_status[report_id] = {
-                        "status": "Complete",
-                        "file_path": report_path,
-                        "completed_at": datetime.now(pytz.UTC).isoformat(),
-                        "total_stores": len(results)
-                    }
-                    logger.info(f"Report {report_id} generated successfully ({len(results)} stores)")
+                bounded = REPORT_MEMORY_LIMIT_MB > 0 and not HOURLY_AGGREGATES_ENABLED and not REPORT_DISTRIBUTED
+                if bounded:
+                    # Store ids are paged from the database along with their polls instead of held in a list
+                    report = BoundedReport(current_time, MemoryBudget(REPORT_MEMORY_LIMIT_MB * MB))
+                    store_ids, total_stores = [], report.store_count()
                 else:
-                    raise Exception("No valid results generated")
-
-        except Exception as e:
-            logger.error(f"Error generating report {report_id}: {e}")
-            report_status[report_id] = {
-                "status": "Failed",
-                "error": str(e),
-                "completed_at": datetime.now(pytz.UTC).isoformat()
-            }
-
-def run_report_in_background(report_id):
-    service = StoreMonitoringService()
-    thread = Thread(target=service.generate_report_background, args=(report_id,))
-    thread.start()
-    logger.info(f"Report generation thread started for {report_id}")
+                    store_ids = [row[0] for row in db.session.query(StoreStatus.store_id).distinct().all()]
+                    total_stores = len(store_ids)
+
+                # A finished report at the same latest poll stays valid for every store not changed since
+                base = find_base_report(watermark) if REPORT_INCREMENTAL and not bounded else None
+                if base and report_format(base.file_path) != REPORT_FORMAT:
+                    base = None
+                dirty = changed_stores(base.change_seq) if base else None
+                update_job(report_id, change_seq=latest_change_seq())
+
+            logger.info(f"Processing {total_stores} stores for report {report_id}")
+
+            def on_progress(stores_done, total, shards_done=1, shard_count=1):
+                update_job(report_id, stores_processed=stores_done, total_stores=total)
+                shards = f"{shards_done}/{shard_count}" if shard_count else shards_done
+                logger.info(f"Report {report_id}: {stores_done}/{total} stores ({shards} shards)")
+
+            on_progress(0, total_stores, 0, 1)
+            report_dir = "reports"
+            os.makedirs(report_dir, exist_ok=True)
+            writer = open_report_writer(report_dir, report_id)
+            update_job(report_id, file_path=writer.partial_path)
+
+            try:
+                stores_done, pending = 0, store_ids
+                if dirty is not None:
+                    with registry.timer("report_phase_seconds", phase="reuse"):
+                        reused = writer.copy_rows(base.file_path, set(store_ids) - dirty, REPORT_WRITE_BATCH)
+                    pending = [store_id for store_id in store_ids if store_id not in reused]
+                    stores_done = len(reused)
+                    logger.info(f"Report {report_id} reused {len(reused)} rows of report {base.report_id}, "
+                                f"recomputing {len(pending)} stores")
+                    on_progress(stores_done, total_stores)
+
+                if bounded:
+                    batches = report.batches()
+                elif REPORT_DISTRIBUTED and pending:
+                    coordinator = ReportCoordinator(report_id, current_time, self.compute_report_rows)
+                    coordinator.plan(pending)
+                    batches = coordinator.batches()
+                else:
+                    batches = self._report_batches(current_time, pending)
+                computing_since = time.perf_counter()
+                for batch_size, rows, batches_done, batch_count in batches:
+                    compute_seconds = time.perf_counter() - computing_since
+                    registry.observe("report_phase_seconds", compute_seconds, phase="compute")
+                    # Stores are computed a batch at a time, so this is each batch's average, not per store
+                    registry.observe("report_batch_seconds_per_store", compute_seconds / max(batch_size, 1))
+
+                    with registry.timer("report_phase_seconds", phase="write"):
+                        writer.write_rows(rows)
+                    stores_done += batch_size
+                    on_progress(stores_done, total_stores, batches_done, batch_count)
+                    computing_since = time.perf_counter()
+            finally:
+                writer.close()
+
+            if not writer.rows:
+                raise Exception("No valid results generated")
+
+        with registry.timer("report_phase_seconds", phase="finalize"):
+            file_path = writer.commit()
+            if REPORT_DB_TABLE:
+                store_report_rows(report_id, file_path)
+            update_job(
+                report_id,
+                status=COMPLETE,
+                file_path=file_path,
+                completed_at=utcnow(),
+                stores_processed=writer.rows,
+                total_stores=total_stores
+            )
+            logger.info(f"Report {report_id} generated successfully ({writer.rows} stores)")
+            evict_reports()
+        return "complete" if dirty is None else "incremental"
+
+    def compute_report_rows(self, current_time, store_ids) -> list[dict]:
+        """Report rows for ``store_ids`` as of ``current_time``; distributed report workers call this per unit."""
+        return [row for _, rows, _, _ in self._report_batches(current_time, store_ids) for row in rows]
+
+    def _report_batches(self, current_time, store_ids):
+        """Yield ``(stores_in_batch, report_rows, batches_done, batch_count)`` as each batch of stores is computed."""
+        if not store_ids:
+            return
+        if REPORT_WORKERS > 1 and not HOURLY_AGGREGATES_ENABLED:
+            db_uri = db.engine.url.render_as_string(hide_password=False)
+            shards = iter_report_shards(current_time, store_ids, REPORT_WORKERS, db_uri)
+            for done, (shard_size, frame, shard_count) in enumerate(shards, 1):
+                yield shard_size, format_report_rows(frame), done, shard_count
+            return
+
+        batches = shard_store_ids(store_ids, -(-len(store_ids) // REPORT_WRITE_BATCH))
+        if not HOURLY_AGGREGATES_ENABLED:
+            # Incremental reports recompute a few stores; load only their hours
+            self.hours_index = report_window_index(current_time, store_ids if len(store_ids) <= 500 else None)
+        for done, batch in enumerate(batches, 1):
+            if HOURLY_AGGREGATES_ENABLED:
+                rows = AggregateReport(current_time, batch).report_rows()
+            else:
+                rows = ReportEngine(current_time, batch, self.hours_index).report_rows()
+            yield len(batch), rows, done, len(batches)
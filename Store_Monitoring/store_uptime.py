@@ -0,0 +1,201 @@
+import re
+import threading
+import time as timer
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import func
+
+from models import db, StoreStatus, StatusSegment
+from business_hours import BusinessHoursIndex
+from services import StoreMonitoringService
+from report_cache import table_versions
+from report_engine import POLL_BUFFER
+from retention import with_archived_polls
+from timeline import StatusTimeline
+from metrics import registry
+from config import STORE_CACHE_HORIZON, STORE_CACHE_SIZE, STORE_CACHE_TTL
+
+NAMED_WINDOWS = {
+    "last_hour": timedelta(hours=1),
+    "last_day": timedelta(days=1),
+    "last_week": timedelta(weeks=1),
+}
+LAST_N_HOURS = re.compile(r"^last_(\d+)_hours$")
+
+
+class UptimeQueryError(ValueError):
+    pass
+
+
+class StoreEntry:
+    """One store's status timeline since ``loaded_from`` and its business-hours index, as of ``loaded_at``."""
+
+    __slots__ = ("timeline", "loaded_from", "loaded_at", "versions", "service")
+
+    def __init__(self, store_id: str, loaded_from: datetime, horizon_end: datetime, versions: dict):
+        rows = db.session.query(StoreStatus.timestamp_utc, StoreStatus.status).filter(
+            StoreStatus.store_id == store_id,
+            StoreStatus.timestamp_utc >= loaded_from
+        ).order_by(StoreStatus.timestamp_utc, StoreStatus.id).all()
+
+        self.timeline = StatusTimeline.from_polls(with_archived_polls(store_id, rows, loaded_from, horizon_end))
+        self.loaded_from = loaded_from
+        self.loaded_at = timer.monotonic()
+        self.versions = versions
+        self.service = StoreMonitoringService(
+            hours_index=BusinessHoursIndex.build(loaded_from, horizon_end, store_ids=[store_id]))
+
+
+class StoreUptimeCache:
+    """LRU of per-store polls and business hours for ad-hoc uptime queries.
+
+    Entries cover the last ``horizon`` before the load; older windows are
+    computed straight from the database. Polls ingested in this process are
+    appended to cached timelines; an entry is dropped when business hours or
+    timezones change, and after ``ttl`` seconds so writes from other processes
+    show up.
+    """
+
+    def __init__(self, max_stores: int = STORE_CACHE_SIZE, ttl: float = STORE_CACHE_TTL,
+                 horizon: timedelta = STORE_CACHE_HORIZON):
+        self.max_stores = max_stores
+        self.ttl = ttl
+        self.horizon = horizon
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append_polls(self, records: list[dict]):
+        """Add freshly written polls to the timelines of cached stores."""
+        with self._lock:
+            for record in records:
+                entry = self._entries.get(record["store_id"])
+                if entry is not None:
+                    entry.timeline.append(record["timestamp_utc"], record["status"])
+
+    def invalidate(self, store_ids):
+        with self._lock:
+            for store_id in store_ids:
+                self._entries.pop(store_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entry(self, store_id: str) -> tuple[StoreEntry, bool]:
+        """The store's cached entry, loading it on a miss; returns ``(entry, hit)``."""
+        versions = table_versions()
+        with self._lock:
+            entry = self._entries.get(store_id)
+            if entry is not None and entry.versions == versions and timer.monotonic() - entry.loaded_at < self.ttl:
+                self._entries.move_to_end(store_id)
+                registry.inc("store_cache_total", result="hit")
+                return entry, True
+
+        now = datetime.now(pytz.UTC).replace(tzinfo=None)
+        latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar() or now
+        entry = StoreEntry(store_id, latest - self.horizon - POLL_BUFFER, max(latest, now) + timedelta(days=1), versions)
+        registry.inc("store_cache_total", result="miss")
+
+        with self._lock:
+            self._entries[store_id] = entry
+            self._entries.move_to_end(store_id)
+            while len(self._entries) > self.max_stores:
+                self._entries.popitem(last=False)
+        return entry, False
+
+    def uptime(self, store_id: str, start: datetime, end: datetime, cached_entry=None) -> dict:
+        """Business-hours uptime/downtime for ``[start, end]`` (tz-aware UTC) via calculate_uptime_downtime's rules.
+
+        ``cached_entry`` is an ``(entry, hit)`` pair already fetched with :meth:`entry`.
+        """
+        entry, hit = cached_entry or self.entry(store_id)
+        naive_start = start.astimezone(pytz.UTC).replace(tzinfo=None)
+
+        if naive_start - POLL_BUFFER >= entry.loaded_from:
+            uptime, downtime = entry.service.uptime_from_timeline(store_id, entry.timeline, start, end)
+        else:
+            hit = False
+            uptime, downtime = entry.service.calculate_uptime_downtime(store_id, start, end)
+
+        return {"uptime_hours": uptime, "downtime_hours": downtime, "cached": hit,
+                "timezone": entry.service.get_store_timezone(store_id)}
+
+
+store_uptime_cache = StoreUptimeCache()
+
+
+def store_exists(store_id: str) -> bool:
+    if db.session.query(StoreStatus.id).filter(StoreStatus.store_id == store_id).first() is not None:
+        return True
+    return db.session.query(StatusSegment.id).filter(StatusSegment.store_id == store_id).first() is not None
+
+
+def latest_poll_time() -> datetime:
+    latest = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+    return pytz.UTC.localize(latest) if latest else datetime.now(pytz.UTC)
+
+
+def parse_utc(value: str, name: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace(" UTC", "").replace("Z", "+00:00"))
+    except ValueError:
+        raise UptimeQueryError(f"{name} must be an ISO 8601 timestamp")
+    return pytz.UTC.localize(parsed) if parsed.tzinfo is None else parsed.astimezone(pytz.UTC)
+
+
+def resolve_window(window: str, as_of: datetime, timezone_str: str) -> tuple[datetime, datetime]:
+    """UTC ``(start, end)`` of a named window ending at ``as_of``; today/yesterday use the store's local days."""
+    if window in NAMED_WINDOWS:
+        return as_of - NAMED_WINDOWS[window], as_of
+
+    match = LAST_N_HOURS.match(window)
+    if match:
+        return as_of - timedelta(hours=int(match.group(1))), as_of
+
+    if window in ("today", "yesterday"):
+        tz = pytz.timezone(timezone_str)
+        local_date = as_of.astimezone(tz).date()
+        if window == "yesterday":
+            local_date -= timedelta(days=1)
+        start = tz.localize(datetime.combine(local_date, datetime.min.time())).astimezone(pytz.UTC)
+        end = tz.localize(datetime.combine(local_date + timedelta(days=1), datetime.min.time())).astimezone(pytz.UTC)
+        return start, min(end, as_of)
+
+    raise UptimeQueryError(
+        f"unknown window '{window}'; use {', '.join(NAMED_WINDOWS)}, last_<n>_hours, today or yesterday")
+
+
+def store_uptime(store_id: str, start: str = None, end: str = None, window: str = None, as_of: str = None) -> dict:
+    """Uptime for one store over ``start``/``end`` or a named ``window`` ending at ``as_of`` (default: latest poll)."""
+    if window and (start or end):
+        raise UptimeQueryError("give either start/end or window, not both")
+    if not window and not (start and end):
+        raise UptimeQueryError("start and end, or window, are required")
+
+    cached_entry = store_uptime_cache.entry(store_id)
+    if window:
+        reference = parse_utc(as_of, "as_of") if as_of else latest_poll_time()
+        start_dt, end_dt = resolve_window(window, reference, cached_entry[0].service.get_store_timezone(store_id))
+    else:
+        start_dt, end_dt = parse_utc(start, "start"), parse_utc(end, "end")
+    if end_dt <= start_dt:
+        raise UptimeQueryError("end must be after start")
+
+    with registry.timer("store_uptime_query_seconds"):
+        figures = store_uptime_cache.uptime(store_id, start_dt, end_dt, cached_entry)
+
+    return {
+        "store_id": store_id,
+        "start": start_dt.isoformat(),
+        "end": end_dt.isoformat(),
+        "window": window,
+        "timezone": figures["timezone"],
+        "uptime_hours": round(figures["uptime_hours"], 4),
+        "downtime_hours": round(figures["downtime_hours"], 4),
+        "cached": figures["cached"],
+    }
@@ -0,0 +1,108 @@
+"""
+Incremental hourly aggregates: consistency with a full rebuild and with the report engine
+"""
+
+import random
+from datetime import datetime, timedelta, time
+
+import pytest
+from sqlalchemy import func
+
+from models import db, StoreStatus, BusinessHours, StoreTimezone, StoreHourlyUptime
+from aggregates import AggregateReport, HourlyAggregates
+from report_engine import ReportEngine
+
+NOW = datetime(2023, 3, 14, 6, 0, 0)
+
+
+def seed_hours():
+    db.session.add(StoreTimezone(store_id="a", timezone_str="America/New_York"))
+    db.session.add(StoreTimezone(store_id="b", timezone_str="Asia/Kolkata"))
+    for day in range(7):
+        db.session.add(BusinessHours(store_id="a", day_of_week=day,
+                                     start_time_local=time(9, 0), end_time_local=time(1, 30)))
+    db.session.add(BusinessHours(store_id="b", day_of_week=2,
+                                 start_time_local=time(10, 0), end_time_local=time(18, 0)))
+
+
+def test_incremental_updates_match_rebuild(app):
+    rng = random.Random(3)
+    seed_hours()
+    polls = list(dict.fromkeys(  # store_status rejects repeated polls
+        (store_id, NOW - timedelta(minutes=rng.randrange(9 * 24 * 60)), rng.choice(["active", "inactive"]))
+        for store_id in ("a", "b", "c") for _ in range(150)
+    ))
+    db.session.commit()
+
+    aggregates = HourlyAggregates()
+    for batch_start in range(0, len(polls), 40):
+        batch = polls[batch_start:batch_start + 40]
+        ranges = {}
+        for store_id, ts, status in batch:
+            db.session.add(StoreStatus(store_id=store_id, timestamp_utc=ts, status=status))
+            first, last = ranges.get(store_id, (ts, ts))
+            ranges[store_id] = (min(first, ts), max(last, ts))
+        db.session.flush()
+        aggregates.apply_new_polls(ranges)
+        db.session.commit()
+
+    outcome = aggregates.check_consistency()
+    assert outcome["consistent"], outcome["mismatches"][:3]
+    assert outcome["checked_stores"] == 3
+
+    db.session.query(StoreHourlyUptime).delete()
+    db.session.commit()
+    assert not aggregates.check_consistency()["consistent"]
+
+
+def test_refresh_catches_hours_edited_outside_ingest(app):
+    seed_hours()
+    for store_id in ("a", "b"):
+        for hours in range(0, 72, 2):
+            db.session.add(StoreStatus(store_id=store_id, timestamp_utc=NOW - timedelta(hours=hours, minutes=7),
+                                       status="active" if hours % 6 else "inactive"))
+    db.session.commit()
+    aggregates = HourlyAggregates()
+    aggregates.rebuild()
+    db.session.commit()
+    assert aggregates.refresh_changed_stores() == 0
+
+    BusinessHours.query.filter_by(store_id="a", day_of_week=0).one().end_time_local = time(23, 0)  # e.g. in /admin
+    db.session.commit()
+    assert not aggregates.check_consistency()["consistent"]
+
+    assert aggregates.refresh_changed_stores() == 1
+    db.session.commit()
+    assert aggregates.check_consistency()["consistent"]
+
+
+def test_aggregate_report_matches_engine(app):
+    rng = random.Random(11)
+    seed_hours()
+    for store_id in ("a", "b", "c"):
+        ts = NOW - timedelta(days=8, minutes=43)
+        while ts <= NOW:
+            db.session.add(StoreStatus(store_id=store_id, timestamp_utc=ts,
+                                       status=rng.choice(["active", "active", "inactive"])))
+            ts += timedelta(minutes=rng.randint(7, 150))
+    for hours in range(30):  # polled at :17, as of a time that is not on the hour either
+        db.session.add(StoreStatus(store_id="e", timestamp_utc=NOW - timedelta(hours=hours, minutes=43),
+                                   status="active"))
+    # "d" went quiet long ago, so every window falls back to all-up; "f" only polled just before the day window
+    db.session.add(StoreStatus(store_id="d", timestamp_utc=NOW - timedelta(days=20), status="inactive"))
+    db.session.add(StoreStatus(store_id="f", timestamp_utc=NOW - timedelta(hours=25), status="active"))
+    db.session.commit()
+
+    HourlyAggregates().rebuild()
+    db.session.commit()
+
+    store_ids = ["a", "b", "c", "d", "e", "f"]
+    as_of = db.session.query(func.max(StoreStatus.timestamp_utc)).scalar()
+    assert as_of.minute != 0
+    aggregated = AggregateReport(as_of, store_ids).compute()
+    engine = ReportEngine(as_of, store_ids).compute()
+
+    for column in engine.columns:
+        assert list(aggregated[column]) == pytest.approx(list(engine[column]), abs=1e-6), column
+    assert aggregated.at["d", "uptime_week"] > 167 and aggregated.at["d", "downtime_week"] == 0
+    assert aggregated.at["e", "uptime_hour"] == pytest.approx(1.0, abs=1e-3)
@@ -0,0 +1,42 @@
+"""
+Benchmark harness: synthetic fleet CSVs load cleanly and the baseline comparison flags regressions
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from fleet import generate_fleet  # noqa: E402
+from run_benchmarks import compare  # noqa: E402
+from models import StoreStatus, StoreTimezone  # noqa: E402
+from services import StoreMonitoringService  # noqa: E402
+
+
+def test_fleet_csvs_load(app, tmp_path):
+    summary = generate_fleet(str(tmp_path), stores=20, polls_per_hour=2, days=1,
+                             overnight_fraction=0.3, missing_timezone_fraction=0.2)
+
+    status = pd.read_csv(tmp_path / "store_status.csv", dtype={"store_id": str})
+    assert len(status) == summary["polls"] == 20 * 48
+    assert status["timestamp_utc"].str.endswith(" UTC").all()
+    assert summary["overnight_stores"] > 0 and summary["stores_with_timezone"] < 20
+
+    StoreMonitoringService().load_data_from_csvs(str(tmp_path))
+    assert StoreStatus.query.count() == summary["polls"]
+    assert StoreTimezone.query.count() == summary["stores_with_timezone"]
+
+
+def test_compare_flags_slower_phases():
+    baseline = {"meta": {}, "results": {"report": {"seconds": 2.0, "python_peak_mb": 10.0},
+                                        "ingest": {"seconds": 1.0}}}
+    current = {"meta": {}, "results": {"report": {"seconds": 2.3, "python_peak_mb": 13.0},
+                                       "ingest": {"seconds": 0.5}, "uptime": {"seconds": 9.0}}}
+
+    rows, regressed = compare(current, baseline, tolerance=0.2)
+
+    assert regressed
+    assert {(row["phase"], row["metric"]) for row in rows if row["regression"]} == {("report", "python_peak_mb")}
+    assert len(rows) == 3
@@ -0,0 +1,47 @@
+"""
+Memory-bounded reports: store groups cut by the poll budget give the same rows as one ReportEngine pass
+"""
+
+import time
+from datetime import datetime
+
+import pytz
+
+import services
+from bounded_report import BoundedReport, MemoryBudget
+from report_engine import ReportEngine
+from test_report_engine import seed_fleet
+from test_report_jobs import wait_for_report
+
+
+def test_groups_match_single_pass(app):
+    now = pytz.UTC.localize(datetime(2023, 3, 14, 4, 51, 8))
+    store_ids = sorted(seed_fleet(40, now.replace(tzinfo=None)))
+    budget = MemoryBudget(1 << 40)
+    budget.max_polls = 150
+    report = BoundedReport(now, budget, yield_per=7, max_stores=9)
+
+    groups = [(group, len(polls)) for group, polls in report.store_groups()]
+    assert [store_id for group, _ in groups for store_id in group] == store_ids
+    assert len(groups) > 40 // 9 + 1  # the budget, not only the page size, ended groups
+    assert report.store_count() == 40
+
+    rows = [row for _, batch_rows, _, _ in report.batches() for row in batch_rows]
+    assert rows == ReportEngine(now, store_ids).report_rows()
+
+
+def test_bounded_report_job_records_peak_rss(client, monkeypatch):
+    monkeypatch.setattr(services, "REPORT_MEMORY_LIMIT_MB", 4096)
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+
+    response = wait_for_report(client, report_id)
+    assert response.mimetype == "text/csv"
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+
+    deadline = time.time() + 5  # the peak is recorded just after the job completes
+    job = client.get("/reports").get_json()["reports"][report_id]
+    while "peak_rss_bytes" not in job and time.time() < deadline:
+        time.sleep(0.05)
+        job = client.get("/reports").get_json()["reports"][report_id]
+    assert job["progress"] == {"stores_processed": 2, "total_stores": 2}
+    assert job["peak_rss_bytes"] > 0
@@ -0,0 +1,68 @@
+"""
+BusinessHoursIndex lookups against the query-per-call service methods
+"""
+
+import random
+from datetime import datetime, timedelta, time
+
+import pytest
+import pytz
+
+from models import db, BusinessHours, StoreTimezone
+from business_hours import BusinessHoursIndex
+from services import StoreMonitoringService
+
+
+@pytest.fixture
+def stores(app):
+    db.session.add_all([
+        StoreTimezone(store_id="overnight", timezone_str="America/New_York"),
+        StoreTimezone(store_id="split", timezone_str="Europe/Berlin"),
+        StoreTimezone(store_id="ignored", timezone_str="Asia/Tokyo"),
+    ])
+    for day in range(7):
+        db.session.add(BusinessHours(store_id="overnight", day_of_week=day,
+                                     start_time_local=time(20, 0), end_time_local=time(3, 30)))
+        db.session.add(BusinessHours(store_id="split", day_of_week=day,
+                                     start_time_local=time(7, 0), end_time_local=time(11, 0)))
+        db.session.add(BusinessHours(store_id="split", day_of_week=day,
+                                     start_time_local=time(10, 0), end_time_local=time(22, 15, 59)))
+    db.session.commit()
+    # "default" has neither a timezone nor business hours: America/Chicago, 24x7
+    return ["overnight", "split", "default"]
+
+
+@pytest.mark.parametrize("window_end", [
+    datetime(2023, 1, 25, 12, 0, tzinfo=pytz.UTC),
+    datetime(2023, 3, 27, 6, 0, tzinfo=pytz.UTC),   # spans both DST switches
+    datetime(2023, 11, 6, 6, 0, tzinfo=pytz.UTC),
+])
+def test_index_matches_service_queries(stores, window_end):
+    rng = random.Random(11)
+    window_start = window_end - timedelta(weeks=1, hours=2)
+    index = BusinessHoursIndex.build(window_start, window_end)
+    indexed = StoreMonitoringService(hours_index=index)
+    direct = StoreMonitoringService()
+
+    span = int((window_end - window_start).total_seconds())
+    for store_id in stores:
+        assert indexed.get_store_timezone(store_id) == direct.get_store_timezone(store_id)
+        for _ in range(300):
+            start = window_start + timedelta(seconds=rng.randrange(span), microseconds=rng.randrange(10 ** 6))
+            end = min(start + timedelta(minutes=rng.choice([0, 5, 61, 400, 1500, 5000])), window_end)
+
+            assert indexed.is_within_business_hours(start, store_id) == \
+                direct.is_within_business_hours(start, store_id)
+            assert indexed.get_business_hours_in_period(store_id, start, end) == \
+                pytest.approx(direct.get_business_hours_in_period(store_id, start, end), abs=1e-9)
+
+
+def test_index_falls_back_outside_its_window(stores):
+    window_end = datetime(2023, 1, 25, 12, 0, tzinfo=pytz.UTC)
+    index = BusinessHoursIndex.build(window_end - timedelta(days=1), window_end)
+    service = StoreMonitoringService(hours_index=index)
+
+    long_ago = window_end - timedelta(days=30)
+    assert index.business_hours_in_period("split", long_ago, long_ago + timedelta(days=1)) is None
+    assert service.get_business_hours_in_period("split", long_ago, long_ago + timedelta(days=1)) == \
+        pytest.approx(4 + 12.266388, abs=1e-6)
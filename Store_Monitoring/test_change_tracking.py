@@ -0,0 +1,104 @@
+"""
+Store change tracking: stores dirtied by edits and back-filled polls, and incremental reports
+"""
+
+import time
+from datetime import datetime, time as dtime, timedelta
+
+import pytest
+import pytz
+from sqlalchemy import func
+
+import services
+from app import create_app
+from changes import changed_stores, latest_change_seq, record_full_change
+from ingest import write_polls
+from models import db, BusinessHours, StoreStatus, StoreTimezone, StoreChange, ReportJob
+from report_engine import ReportEngine
+from report_writer import ReportWriter, iter_report_lines
+from test_report_engine import seed_fleet
+
+NOW = datetime(2023, 3, 14, 4, 51, 8, 120000)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # reports/ is written relative to the working directory
+    app = create_app(f"sqlite:///{tmp_path / 'changes.db'}", bootstrap="off")
+    with app.app_context():
+        seed_fleet(20, NOW)
+        yield app.test_client()
+
+
+def run_report(client) -> ReportJob:
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if client.get("/reports").get_json()["reports"][report_id]["status"] in ("Complete", "Failed"):
+            break
+        time.sleep(0.05)
+    db.session.expire_all()
+    return ReportJob.query.filter_by(report_id=report_id).one()
+
+
+def report_lines(path) -> list[str]:
+    return sorted(iter_report_lines(path))
+
+
+def test_edits_and_backfills_mark_only_their_stores(app):
+    seed_fleet(10, NOW)
+    seq = latest_change_seq()
+
+    hours = BusinessHours.query.filter_by(store_id="store-001").first()
+    hours.end_time_local = dtime(23, 30)
+    timezone = StoreTimezone.query.filter_by(store_id="store-002").one()
+    timezone.store_id = "store-009"
+    db.session.commit()
+    assert changed_stores(seq) == {"store-001", "store-002", "store-009"}
+    assert changed_stores(seq, sources=["business_hours"]) == {"store-001"}
+
+    seq = latest_change_seq()
+    write_polls([{"store_id": "store-003", "status": "active", "timestamp_utc": NOW + timedelta(minutes=5)}])
+    assert changed_stores(seq) == set()  # a newer poll moves the report's current time instead
+
+    write_polls([{"store_id": "store-004", "status": "inactive", "timestamp_utc": NOW - timedelta(hours=5)}])
+    assert changed_stores(seq) == {"store-004"}
+
+    record_full_change("reset")
+    db.session.commit()
+    assert changed_stores(seq) is None
+
+
+def test_incremental_report_recomputes_only_changed_stores(client, monkeypatch):
+    first = run_report(client)
+    assert first.status == "Complete" and first.change_seq is not None
+
+    hours = BusinessHours.query.filter_by(store_id="store-002").first()
+    hours.start_time_local = dtime(0, 0)
+    db.session.commit()
+    assert client.post("/ingest", json={"store_id": "store-004", "status": "inactive",
+                                        "timestamp_utc": (NOW - timedelta(days=3)).strftime(
+                                            "%Y-%m-%d %H:%M:%S.%f UTC")}).status_code == 200
+
+    computed = []
+
+    class SpyEngine(ReportEngine):
+        def __init__(self, current_time, store_ids, hours_index=None):
+            computed.extend(store_ids)
+            super().__init__(current_time, store_ids, hours_index)
+
+    monkeypatch.setattr(services, "ReportEngine", SpyEngine)
+    second = run_report(client)
+
+    assert second.status == "Complete"
+    assert sorted(computed) == ["store-002", "store-004"]
+    assert second.stores_processed == first.stores_processed
+
+    latest = pytz.UTC.localize(db.session.query(func.max(StoreStatus.timestamp_utc)).scalar())
+    store_ids = [store_id for (store_id,) in db.session.query(StoreStatus.store_id).distinct()]
+    full = ReportWriter("full.csv")
+    full.write_rows(ReportEngine(latest, store_ids).report_rows())
+    assert report_lines(second.file_path) == report_lines(full.commit())
+
+    # Rows logged before the oldest kept report are no longer needed
+    assert StoreChange.query.filter(StoreChange.id <= first.change_seq).count() == 0
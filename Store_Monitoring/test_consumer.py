@@ -0,0 +1,97 @@
+"""
+Poll consumer: committed offsets, partial lines, replay after a crash, CSV logs and rejected lines
+"""
+
+import json
+
+import pytest
+
+import consumer as consumer_module
+from consumer import FileTailSource, PollConsumer, PollSource, committed_offset
+from models import StoreStatus
+from test_ingest import POLL
+
+
+def poll_line(i, store_id="1"):
+    return json.dumps(dict(POLL, store_id=store_id, timestamp_utc=f"2023-01-22 12:00:{i:02d}.000000 UTC")) + "\n"
+
+
+def test_consumes_complete_lines_and_commits_offsets(app, tmp_path):
+    log = tmp_path / "polls.ndjson"
+    log.write_text("".join(poll_line(i) for i in range(5)) + "\n{not json\n" + poll_line(5)[:20])
+    consumer = PollConsumer(app, FileTailSource(str(log)), name="test", batch_size=4)
+
+    assert consumer.drain() == 6
+    complete = log.stat().st_size - 20
+    assert StoreStatus.query.count() == 5
+    assert committed_offset("test") == complete
+    assert consumer.status()["lag"] == 20
+    assert (consumer.stats["written"], consumer.stats["rejected"]) == (5, 1)
+
+    with open(log, "a") as f:  # the writer finishes the partial line
+        f.write(poll_line(5)[20:] + poll_line(2))
+    assert consumer.drain() == 2
+    assert StoreStatus.query.count() == 6
+    assert consumer.status()["lag"] == 0
+
+
+def test_replays_batch_after_failed_commit(app, tmp_path, monkeypatch):
+    log = tmp_path / "polls.ndjson"
+    log.write_text("".join(poll_line(i) for i in range(3)) + poll_line(1))
+    consumer = PollConsumer(app, FileTailSource(str(log)), name="test")
+
+    def crash(name, position):
+        raise RuntimeError("killed before commit")
+
+    monkeypatch.setattr(consumer_module, "save_offset", crash)
+    with pytest.raises(RuntimeError):
+        consumer.run_once()
+    assert StoreStatus.query.count() == 0 and committed_offset("test") == 0
+
+    monkeypatch.undo()
+    assert consumer.drain() == 4
+    assert consumer.stats["duplicates"] == 1
+    assert consumer.drain() == 0
+
+    # Another consumer name starts from zero and re-reads everything without new rows
+    other = PollConsumer(app, FileTailSource(str(log)), name="other")
+    assert other.drain() == 4
+    assert (other.stats["written"], other.stats["duplicates"]) == (0, 4)
+    assert StoreStatus.query.count() == 3
+
+
+def test_csv_log(app, tmp_path):
+    log = tmp_path / "polls.csv"
+    log.write_text("store_id,status,timestamp_utc\n"
+                   "7,active,2023-01-22 12:00:00.000000 UTC\n"
+                   "7,inactive,2023-01-22 13:00:00.000000 UTC\n")
+    consumer = PollConsumer(app, FileTailSource(str(log)), name="csv")
+
+    assert consumer.drain() == 2
+    assert sorted(s.status for s in StoreStatus.query.filter_by(store_id="7")) == ["active", "inactive"]
+    assert committed_offset("csv") == log.stat().st_size
+
+
+def test_sources_must_implement_read_and_end_offset():
+    class ReadOnly(PollSource):
+        def read(self, offset, max_records):
+            return [], offset
+
+    with pytest.raises(TypeError):
+        ReadOnly()
+
+
+def test_replayed_poll_with_changed_status_is_skipped(app, tmp_path):
+    log = tmp_path / "polls.ndjson"
+    log.write_text(poll_line(0) + poll_line(1))
+    consumer = PollConsumer(app, FileTailSource(str(log)), name="test", batch_size=2)
+    assert consumer.drain() == 2
+
+    # The same store and timestamp again in a later batch, now inactive
+    with open(log, "a") as f:
+        f.write(poll_line(1).replace('"active"', '"inactive"') + poll_line(2))
+    assert consumer.drain() == 2
+
+    assert (consumer.stats["written"], consumer.stats["duplicates"]) == (3, 1)
+    assert [(s.timestamp_utc.second, s.status) for s in StoreStatus.query.order_by(StoreStatus.timestamp_utc)] == [
+        (0, "active"), (1, "active"), (2, "active")]
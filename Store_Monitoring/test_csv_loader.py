@@ -0,0 +1,58 @@
+"""
+Bulk CSV loading: dedup and reset/append semantics
+"""
+
+from datetime import datetime
+
+from models import db, StoreStatus, BusinessHours, StoreTimezone
+from services import StoreMonitoringService
+
+
+def write_csvs(folder):
+    (folder / "store_status.csv").write_text(
+        "store_id,status,timestamp_utc\n"
+        "1,active,2023-01-22 12:09:39.388884 UTC\n"
+        "1,active,2023-01-22 12:09:39.388884 UTC\n"
+        "2,inactive,2023-01-24 09:06:42.605777 UTC\n"
+        "1,inactive,2023-01-22 13:00:00 UTC\n"
+    )
+    (folder / "menu_hours.csv").write_text(
+        "store_id,dayOfWeek,start_time_local,end_time_local\n"
+        "1,0,00:00:00,00:10:00\n"
+        "1,0,00:00:00,00:10:00\n"
+        "2,3,22:00:00,02:00:00\n"
+    )
+    (folder / "timezones.csv").write_text(
+        "store_id,timezone_str\n"
+        "1,Asia/Beirut\n"
+        "1,America/Denver\n"
+    )
+
+
+def test_append_skips_rows_already_loaded(app, tmp_path):
+    write_csvs(tmp_path)
+    db.session.add(StoreStatus(store_id="2", status="inactive",
+                               timestamp_utc=datetime(2023, 1, 24, 9, 6, 42, 605777)))
+    db.session.commit()
+
+    stats = StoreMonitoringService().load_data_from_csvs(str(tmp_path))
+
+    assert stats["store_status"]["rows_read"] == 4
+    assert stats["store_status"]["inserted"] == 2
+    assert StoreStatus.query.count() == 3
+    assert BusinessHours.query.count() == 2
+    assert [tz.timezone_str for tz in StoreTimezone.query.all()] == ["Asia/Beirut"]
+
+    stats = StoreMonitoringService().load_data_from_csvs(str(tmp_path))
+    assert {name: table["inserted"] for name, table in stats.items()} == \
+        {"store_status": 0, "business_hours": 0, "timezones": 0}
+
+
+def test_reset_reloads_from_scratch(app, tmp_path):
+    write_csvs(tmp_path)
+    db.session.add(StoreStatus(store_id="9", status="active", timestamp_utc=datetime(2023, 1, 1)))
+    db.session.commit()
+
+    StoreMonitoringService().load_data_from_csvs(str(tmp_path), reset=True)
+
+    assert sorted(s.store_id for s in StoreStatus.query.all()) == ["1", "1", "2"]
@@ -0,0 +1,113 @@
+"""
+Engine configuration: pool options, SQLite WAL, report snapshots, and /ingest latency while a report runs
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from database import REPORT_ENGINE, engine_options, read_snapshot, report_db_uri
+from jobs import create_job, update_job
+from models import db, StoreStatus, ReportJob
+from test_report_engine import seed_fleet
+
+NOW = datetime(2023, 3, 14, 4, 51, 8, 120000)
+
+
+def poll(store_id, when, status="active"):
+    return {"store_id": store_id, "status": status, "timestamp_utc": when.strftime("%Y-%m-%d %H:%M:%S.%f UTC")}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # reports/ is written relative to the working directory
+    app = create_app(f"sqlite:///{tmp_path / 'pool.db'}", bootstrap="off")
+    with app.app_context():
+        yield app
+
+
+def test_engine_options():
+    assert engine_options("sqlite:///x.db") == {"connect_args": {"timeout": 30.0}}
+
+    server = engine_options("postgresql://u:p@db/stores")
+    assert (server["pool_size"], server["max_overflow"], server["pool_pre_ping"]) == (5, 10, True)
+    assert "isolation_level" not in server
+    reports = engine_options("postgresql://u:p@db/stores", read_only=True)
+    assert reports["isolation_level"] == "REPEATABLE READ"
+    assert "default_transaction_read_only=on" in reports["connect_args"]["options"]
+
+    assert report_db_uri("sqlite:////data/x.db") == "sqlite:///file:/data/x.db?mode=ro&uri=true"
+    assert report_db_uri("sqlite://") is None
+    assert report_db_uri("postgresql://u:p@db/stores") == "postgresql://u:p@db/stores"
+
+
+def test_snapshot_reads_do_not_see_or_block_writes(app):
+    assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    seed_fleet(3, NOW)
+    client = app.test_client()
+    job = create_job("watermark")
+    before = StoreStatus.query.count()
+
+    responses = []
+
+    def ingest():  # its own thread, so its own app context and session, like a real request
+        responses.append(client.post("/ingest", json=poll("store-000", NOW + timedelta(minutes=5))))
+
+    with read_snapshot():
+        assert StoreStatus.query.count() == before
+        started = time.perf_counter()
+        writer = threading.Thread(target=ingest)
+        writer.start()
+        writer.join()
+        assert time.perf_counter() - started < 2
+        assert responses[0].status_code == 200
+        assert StoreStatus.query.count() == before  # still the snapshot
+        update_job(job.report_id, stores_processed=2)  # job bookkeeping still writes
+
+        with pytest.raises(Exception, match="readonly"):
+            db.session.execute(text("DELETE FROM store_status"))
+
+    assert StoreStatus.query.count() == before + 1
+    db.session.expire_all()
+    assert ReportJob.query.filter_by(report_id=job.report_id).one().stores_processed == 2
+    assert REPORT_ENGINE in app.extensions
+
+
+def test_ingest_latency_while_report_runs(app):
+    seed_fleet(60, NOW)
+    client = app.test_client()
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+
+    latencies, statuses = [], []
+    stop = threading.Event()
+
+    def ingest():
+        minute = 0
+        while minute < 2000 and not (stop.is_set() and latencies):
+            minute += 1
+            started = time.perf_counter()
+            response = client.post("/ingest", json=poll(f"store-{minute % 60:03d}", NOW + timedelta(seconds=minute)))
+            latencies.append(time.perf_counter() - started)
+            statuses.append(response.status_code)
+
+    writer = threading.Thread(target=ingest)
+    writer.start()
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        status = client.get("/reports").get_json()["reports"][report_id]["status"]
+        if status in ("Complete", "Failed"):
+            break
+        time.sleep(0.05)
+    stop.set()
+    writer.join()
+
+    assert status == "Complete"
+    assert set(statuses) == {200}
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f"ingest during report: {len(latencies)} requests, p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms")
+    assert p99 < 2.0
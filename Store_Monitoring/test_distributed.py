@@ -0,0 +1,112 @@
+"""
+Distributed reports: units computed by several worker processes, expired leases retried, and failed units
+"""
+
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+import pytz
+
+import services
+from distributed import ReportCoordinator, ReportWorker, claim_unit, complete_unit
+from models import db, ReportJob, ReportRow, ReportUnit, RUNNING, FAILED, UNIT_DONE, UNIT_FAILED
+from report_engine import ReportEngine
+from services import StoreMonitoringService
+from test_report_engine import seed_fleet
+from test_report_jobs import wait_for_report
+
+NOW = datetime(2023, 1, 25, 18, 13, 22)
+HERE = Path(__file__).parent
+
+
+def running_job(report_id):
+    db.session.add(ReportJob(report_id=report_id, status=RUNNING, watermark="w", created_at=NOW))
+    db.session.commit()
+
+
+def test_worker_processes_compute_units_and_expired_leases_are_retried(app):
+    store_ids = seed_fleet(30, NOW)
+    current_time = pytz.UTC.localize(NOW)
+    running_job("dist")
+    coordinator = ReportCoordinator("dist", current_time, None, unit_size=4, computes=False, poll_interval=0.05)
+    assert coordinator.plan(store_ids) == 8
+
+    # A worker that claims a unit and dies: its lease is already over, so the unit goes to someone else
+    crashed = claim_unit("crashed", "dist", lease_seconds=-1)
+
+    db_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    workers = [subprocess.Popen([sys.executable, "distributed.py", "worker", "--db-uri", db_uri, "--exit-when-idle"],
+                                cwd=HERE) for _ in range(3)]
+    for worker in workers:
+        assert worker.wait(timeout=120) == 0
+
+    db.session.expire_all()
+    units = ReportUnit.query.filter_by(report_id="dist").order_by(ReportUnit.seq).all()
+    assert {unit.status for unit in units} == {UNIT_DONE}
+    assert units[crashed.seq].attempts == 2
+    assert "crashed" not in {unit.worker for unit in units}
+    assert not complete_unit(crashed.id, crashed.lease_token, "dist", [{"store_id": "x"}])
+
+    rows = [row for _, batch_rows, _, _ in coordinator.batches() for row in batch_rows]
+    assert rows == ReportEngine(current_time, store_ids).report_rows()
+    assert ReportUnit.query.count() == 0 and ReportRow.query.count() == 0
+
+
+def test_unit_fails_after_max_attempts(app):
+    store_ids = seed_fleet(3, NOW)
+    running_job("bad")
+    coordinator = ReportCoordinator("bad", pytz.UTC.localize(NOW), None, unit_size=2, computes=False)
+    coordinator.plan(store_ids)
+
+    def broken(current_time, store_ids):
+        raise ValueError("no such table")
+
+    worker = ReportWorker(app, broken)
+    while worker.run_once("bad"):
+        pass
+    failed = ReportUnit.query.filter_by(report_id="bad", status=UNIT_FAILED).all()
+    assert len(failed) == 2 and failed[0].attempts == 3 and failed[0].error == "no such table"
+
+    with pytest.raises(Exception, match="failed after 3 attempts: no such table"):
+        list(coordinator.batches())
+    assert ReportUnit.query.count() == 0
+
+
+def test_requeued_job_replans_and_orphans_are_not_claimed(app):
+    store_ids = seed_fleet(5, NOW)
+    running_job("again")
+    ReportCoordinator("again", pytz.UTC.localize(NOW), None, unit_size=2, computes=False).plan(store_ids)
+    leased = claim_unit("dead-worker", "again")
+    rows = ReportEngine(pytz.UTC.localize(NOW), store_ids[:2]).report_rows()
+    assert complete_unit(leased.id, leased.lease_token, "again", rows)
+
+    # The coordinator died; requeue_interrupted runs the same report_id again
+    coordinator = ReportCoordinator("again", pytz.UTC.localize(NOW), None, unit_size=2, computes=False)
+    assert coordinator.plan(store_ids) == 3
+    assert ReportUnit.query.filter_by(report_id="again", status=UNIT_DONE).count() == 0
+    assert ReportRow.query.filter_by(report_id="again").count() == 0
+
+    ReportJob.query.filter_by(report_id="again").update({"status": FAILED})
+    db.session.commit()
+    assert claim_unit("worker") is None
+
+
+def test_distributed_report_job(client, monkeypatch):
+    monkeypatch.setattr(services, "REPORT_DISTRIBUTED", True)
+    calls = []
+    compute = StoreMonitoringService.compute_report_rows
+
+    def counting(self, current_time, store_ids):
+        calls.append(list(store_ids))
+        return compute(self, current_time, store_ids)
+
+    monkeypatch.setattr(StoreMonitoringService, "compute_report_rows", counting)
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+
+    response = wait_for_report(client, report_id)
+    assert response.mimetype == "text/csv"
+    assert sorted(line.split(",")[0] for line in response.get_data(as_text=True).splitlines()[1:]) == ["1", "2"]
+    assert calls and ReportUnit.query.count() == 0
@@ -0,0 +1,106 @@
+"""
+Asyncio ingest gateway: batched writes, validation parity with /ingest, 429 backpressure and 413 for oversized batches
+"""
+
+import asyncio
+import json
+
+from gateway import IngestGateway
+from ingest import parse_poll
+from models import StoreStatus
+from test_ingest import POLL
+
+
+async def call(gateway, method, path, body=b"", content_type="application/json"):
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path,
+             "headers": [(b"content-type", content_type.encode())]}
+    await gateway(scope, receive, send)
+    headers = dict(sent[0]["headers"])
+    return sent[0]["status"], json.loads(sent[1]["body"]), headers
+
+
+def polls(count, store_id="1"):
+    return [dict(POLL, store_id=store_id, timestamp_utc=f"2023-01-22 12:{i // 60:02d}:{i % 60:02d}.000000 UTC")
+            for i in range(count)]
+
+
+def test_concurrent_posts_are_written_in_batches(app):
+    gateway = IngestGateway(app, batch_size=50, flush_interval=0.01)
+
+    async def scenario():
+        results = await asyncio.gather(*(call(gateway, "POST", "/ingest", json.dumps(poll).encode())
+                                         for poll in polls(120)))
+        await gateway.stop()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert {status for status, _, _ in results} == {202}
+    assert StoreStatus.query.count() == 120
+    assert gateway.stats["written"] == 120
+    assert gateway.stats["batches"] < 120
+
+
+def test_validation_matches_flask_route(app):
+    gateway = IngestGateway(app)
+
+    async def scenario():
+        single = await call(gateway, "POST", "/ingest", json.dumps({"store_id": "1"}).encode())
+        batch = await call(gateway, "POST", "/ingest", b"\n".join(
+            json.dumps(poll).encode() for poll in [POLL, {"store_id": "2", "status": "on"}]),
+            content_type="application/x-ndjson")
+        health = await call(gateway, "GET", "/health")
+        await gateway.stop()
+        return single, batch, health
+
+    single, batch, health = asyncio.run(scenario())
+
+    assert single[0] == 400 and "missing field" in single[1]["error"]
+    assert batch[0] == 202
+    assert (batch[1]["accepted"], batch[1]["rejected"], batch[1]["errors"][0]["index"]) == (1, 1, 1)
+    assert health[0] == 200 and health[1]["rejected"] == 2
+
+
+def test_full_queue_returns_429(app):
+    gateway = IngestGateway(app, queue_size=10, batch_size=10, flush_interval=1.0)
+
+    async def scenario():
+        await gateway.start()
+        gateway.queue.put_nowait(parse_poll(POLL))  # the writer only runs once the event loop yields
+        first = await call(gateway, "POST", "/ingest", json.dumps(polls(9, "a")).encode())
+        second = await call(gateway, "POST", "/ingest", json.dumps(polls(5, "b")).encode())
+        await gateway.stop()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first[0] == 202
+    assert second[0] == 429
+    assert int(second[2][b"retry-after"]) >= 1
+    assert gateway.stats["throttled"] == 5
+
+
+def test_batch_larger_than_queue_returns_413(app):
+    gateway = IngestGateway(app, queue_size=10, batch_size=10, flush_interval=1.0)
+
+    async def scenario():
+        await gateway.start()
+        response = await call(gateway, "POST", "/ingest", json.dumps(polls(11)).encode())
+        await gateway.stop()
+        return response
+
+    status, body, headers = asyncio.run(scenario())
+
+    assert status == 413  # retrying could never fit it
+    assert b"retry-after" not in headers
+    assert (body["accepted"], body["rejected"]) == (0, 11)
+    assert gateway.stats["throttled"] == 0
@@ -0,0 +1,117 @@
+"""
+/ingest: single polls, JSON arrays and NDJSON batches
+"""
+
+import json
+
+import pytest
+
+from app import create_app
+from models import StoreStatus
+
+POLL = {"store_id": "0001", "status": "active", "timestamp_utc": "2023-01-24 09:06:42.605777 UTC"}
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(f"sqlite:///{tmp_path / 'ingest.db'}")
+    with app.app_context():
+        yield app.test_client()
+
+
+def test_single_poll_keeps_original_response(client):
+    response = client.post("/ingest", json=POLL)
+
+    assert response.status_code == 200
+    assert response.get_json() == {"message": "Ingested successfully"}
+    assert StoreStatus.query.count() == 1
+
+
+def test_json_array_reports_rejected_indices(client):
+    batch = [POLL, dict(POLL, status="sleeping"), dict(POLL, store_id="0002"), {"store_id": "0003"}]
+
+    response = client.post("/ingest", json=batch)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body["accepted"], body["rejected"]) == (2, 2)
+    assert [error["index"] for error in body["errors"]] == [1, 3]
+    assert sorted(s.store_id for s in StoreStatus.query.all()) == ["0001", "0002"]
+
+
+def test_ndjson_batch(client):
+    lines = [json.dumps(dict(POLL, store_id=str(i))) for i in range(5)] + ["{not json"]
+
+    response = client.post("/ingest", data="\n".join(lines), content_type="application/x-ndjson")
+
+    assert response.get_json()["errors"] == [{"index": 5, "error": "poll must be a JSON object"}]
+    assert StoreStatus.query.count() == 5
+
+
+def test_replayed_batch_reports_only_new_rows(client):
+    batch = [dict(POLL, store_id=str(i)) for i in range(3)]
+    assert client.post("/ingest", json=batch).get_json()["written"] == 3
+
+    body = client.post("/ingest", json=batch + [dict(POLL, store_id="3")]).get_json()
+
+    assert (body["accepted"], body["written"]) == (4, 1)
+    assert StoreStatus.query.count() == 4
+
+
+def test_batch_with_no_valid_polls_is_rejected(client):
+    response = client.post("/ingest", json=[{"status": "active"}])
+
+    assert response.status_code == 400
+    assert StoreStatus.query.count() == 0
+
+
+def test_buffer_flushes_on_size_and_close(client):
+    from flask import current_app
+    from ingest import IngestBuffer, parse_poll
+
+    buffer = IngestBuffer(current_app._get_current_object(), max_rows=3, max_delay=60)
+    records = [parse_poll(dict(POLL, store_id=str(i))) for i in range(4)]
+
+    buffer.add(records[:2])
+    assert StoreStatus.query.count() == 0
+    buffer.add(records[2:3])
+    assert StoreStatus.query.count() == 3
+
+    buffer.add(records[3:])
+    buffer.close()
+    assert StoreStatus.query.count() == 4
+
+
+def test_buffer_retries_failed_writes_and_counts_drops(client, monkeypatch):
+    import ingest
+    from flask import current_app
+    from ingest import IngestBuffer, parse_poll
+
+    write_polls, failures = ingest.write_polls, []
+
+    def locked_twice(records):
+        if len(failures) < 2:
+            failures.append(len(records))
+            raise Exception("database is locked")
+        return write_polls(records)
+
+    monkeypatch.setattr(ingest, "write_polls", locked_twice)
+    buffer = IngestBuffer(current_app._get_current_object(), max_rows=2, max_delay=60, retries=3)
+    buffer.add([parse_poll(dict(POLL, store_id=str(i))) for i in range(2)])
+    assert StoreStatus.query.count() == 0 and buffer.pending() == 2
+
+    buffer.add([parse_poll(dict(POLL, store_id="2"))])
+    buffer.close()
+    assert failures == [2, 3] and StoreStatus.query.count() == 3  # the retry carries the newer poll along
+
+    def always_locked(records):
+        raise Exception("database is locked")
+
+    monkeypatch.setattr(ingest, "write_polls", always_locked)
+    counted = []
+    monkeypatch.setattr(ingest.registry, "inc", lambda name, amount=1, **labels: counted.append((name, amount, labels)))
+    buffer = IngestBuffer(current_app._get_current_object(), max_rows=100, max_delay=60, retries=2)
+    buffer.add([parse_poll(dict(POLL, store_id="9"))])
+    buffer.close()
+    assert buffer.dropped_rows == 1 and buffer.pending() == 0
+    assert counted == [("ingest_buffer_polls_total", 1, {"result": "dropped"})]
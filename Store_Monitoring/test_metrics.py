@@ -0,0 +1,69 @@
+"""
+Instrumentation: counters, timing quantiles, SQL hooks, the /metrics endpoint and report profiles
+"""
+
+import os
+
+import pytest
+
+from metrics import MetricsRegistry, registry, report_profile
+from test_ingest import POLL
+
+
+@pytest.fixture
+def enabled_metrics():
+    registry.reset()
+    registry.enable()
+    yield registry
+    registry.disable()
+    registry.reset()
+
+
+def test_disabled_registry_records_nothing():
+    metrics = MetricsRegistry(enabled=False)
+
+    @metrics.timed("call_seconds")
+    def work():
+        return 42
+
+    assert work() == 42
+    metrics.inc("things_total")
+    with metrics.timer("block_seconds"):
+        pass
+    assert metrics.count("call_seconds") == metrics.count("things_total") == metrics.count("block_seconds") == 0
+
+
+def test_summary_quantiles():
+    metrics = MetricsRegistry(enabled=True, reservoir_size=1000)
+    try:
+        for value in range(1, 101):
+            metrics.observe("store_seconds", value / 100)
+        assert metrics.quantile("store_seconds", 0.5) == pytest.approx(0.51)
+        assert metrics.quantile("store_seconds", 0.99) == pytest.approx(1.0)
+    finally:
+        metrics.disable()
+
+
+def test_metrics_endpoint_reports_ingest_and_queries(client, enabled_metrics):
+    response = client.post("/ingest", json=[POLL, dict(POLL, store_id="0002"), {"store_id": "3"}])
+    assert response.status_code == 200
+
+    assert registry.count("ingest_polls_total", result="accepted") == 2
+    assert registry.count("ingest_polls_total", result="rejected") == 1
+    assert registry.count("sql_query_seconds", statement="INSERT") >= 1
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'store_monitoring_ingest_polls_total{result="accepted"} 2' in text
+    assert "# TYPE store_monitoring_ingest_request_seconds summary" in text
+    assert 'store_monitoring_ingest_request_seconds{quantile="0.99"}' in text
+    assert "store_monitoring_metrics_enabled 1" in text
+
+
+def test_report_profile_dump(tmp_path):
+    with report_profile("abc", str(tmp_path)) as profiler:
+        assert profiler is not None
+        sum(range(1000))
+    assert os.path.getsize(tmp_path / "report_abc.prof") > 0
+
+    with report_profile("abc", "") as profiler:
+        assert profiler is None
@@ -0,0 +1,55 @@
+"""
+Sharded process-pool report generation against the single-process engine
+"""
+
+from datetime import datetime
+
+import pytz
+from sqlalchemy import event
+
+from models import db
+from parallel_report import compute_report_parallel, shard_store_ids
+from report_engine import ReportEngine
+from test_report_engine import seed_fleet
+
+
+def test_shards_are_contiguous_and_complete():
+    store_ids = [f"s{i:02d}" for i in range(10)][::-1]
+
+    shards = shard_store_ids(store_ids, 4)
+
+    assert [len(shard) for shard in shards] == [3, 3, 2, 2]
+    assert sum(shards, []) == sorted(store_ids)
+    assert shard_store_ids(store_ids[:2], 8) == [["s08"], ["s09"]]
+
+
+def test_parallel_report_matches_single_process(app):
+    now = pytz.UTC.localize(datetime(2023, 1, 25, 18, 13, 22, 479220))
+    store_ids = seed_fleet(30, now.replace(tzinfo=None))
+    progress = []
+
+    merged = compute_report_parallel(
+        now, store_ids, workers=2, db_uri=db.engine.url.render_as_string(hide_password=False),
+        on_progress=lambda *args: progress.append(args))
+
+    expected = ReportEngine(now, store_ids).compute()
+    assert list(merged.index) == store_ids
+    assert (merged[expected.columns] - expected).abs().max().max() < 1e-9
+    assert progress[-1] == (30, 30, 8, 8)
+
+
+def test_shard_polls_are_read_by_store_id_not_by_python_range(app):
+    now = datetime(2023, 1, 25, 18, 13, 22)
+    store_ids = seed_fleet(6, now)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        shard = ReportEngine(pytz.UTC.localize(now), [store_ids[4], store_ids[1]]).compute()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    # min()/max() follow Python's string order, which a locale collation on Postgres need not share
+    assert not [statement for statement in statements if "BETWEEN" in statement.upper()]
+    expected = ReportEngine(pytz.UTC.localize(now), store_ids).compute()
+    assert (shard - expected.loc[shard.index]).abs().max().max() < 1e-9
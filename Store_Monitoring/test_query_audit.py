@@ -0,0 +1,59 @@
+"""
+store_status indexes: the EXPLAIN audit of hot queries and the upgrade of pre-index databases
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from models import db, StoreStatus
+from migrations import upgrade_store_status_indexes
+from query_audit import audit
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE store_status (id INTEGER PRIMARY KEY, store_id VARCHAR(50) NOT NULL, "
+    "timestamp_utc DATETIME NOT NULL, status VARCHAR(20) NOT NULL)",
+    "CREATE INDEX ix_store_status_store_id ON store_status (store_id)",
+]
+
+
+def test_hot_queries_use_indexes(app):
+    with db.engine.connect() as connection:
+        results = audit(connection)
+
+    assert {result["query"] for result in results} >= {"uptime_window", "latest_poll", "csv_dedup", "report_window",
+                                                       "bounded_report_window"}
+    assert [result for result in results if result["full_scans"]] == []
+
+
+def test_audit_flags_full_scans(app):
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_store_status_store_ts")
+        connection.exec_driver_sql("DROP INDEX uq_store_status_poll")
+        flagged = {result["query"]: result["full_scans"] for result in audit(connection) if result["full_scans"]}
+
+    assert flagged == {"report_store_ids": ["SCAN store_status"]}
+
+
+def test_upgrade_adds_indexes_and_drops_duplicates(app):
+    db.drop_all()
+    with db.engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+        ts = datetime(2023, 1, 25, 12, 0)
+        connection.execute(StoreStatus.__table__.insert(), [
+            {"store_id": "1", "timestamp_utc": ts, "status": "active"},
+            {"store_id": "1", "timestamp_utc": ts, "status": "active"},
+            {"store_id": "1", "timestamp_utc": ts, "status": "inactive"},
+        ])
+
+    with db.engine.begin() as connection:
+        created = upgrade_store_status_indexes(connection)
+    with db.engine.begin() as connection:
+        assert upgrade_store_status_indexes(connection) == []
+
+    names = {index["name"] for index in inspect(db.engine).get_indexes("store_status")}
+    assert set(created) == {"ix_store_status_store_ts", "uq_store_status_poll", "ix_store_status_timestamp_utc"}
+    assert names == set(created)
+    with db.engine.connect() as connection:
+        assert connection.execute(text("SELECT id FROM store_status ORDER BY id")).scalars().all() == [1, 3]
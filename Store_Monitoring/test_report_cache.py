@@ -0,0 +1,115 @@
+"""
+Report cache: reuse of finished reports keyed on the data watermark, invalidation, and eviction
+"""
+
+import os
+from datetime import datetime, time as dtime, timedelta
+
+from models import db, BusinessHours, ReportJob, StoreStatus, COMPLETE, EXPIRED
+from changes import record_changes
+from jobs import create_job, data_watermark, update_job, utcnow
+from report_cache import cache_summary, evict_reports
+from services import StoreMonitoringService
+from test_report_jobs import wait_for_report
+
+
+def test_trigger_reuses_finished_report_until_data_changes(client):
+    first = client.post("/trigger_report").get_json()["report_id"]
+    wait_for_report(client, first)
+
+    again = client.post("/trigger_report").get_json()
+    assert again == {"report_id": first, "attached": True}
+    assert cache_summary()["cached_reports"] == 1
+
+    hours = BusinessHours(store_id="1", day_of_week=2, start_time_local=dtime(9), end_time_local=dtime(17))
+    db.session.add(hours)
+    db.session.commit()
+    watermark = data_watermark()
+
+    # Editing existing hours keeps the row count but must still change the key
+    hours.end_time_local = dtime(18)
+    db.session.commit()
+    assert data_watermark() != watermark
+
+    fresh = client.post("/trigger_report").get_json()
+    assert fresh["attached"] is False and fresh["report_id"] != first
+
+
+def test_editing_a_poll_invalidates_cached_report(client):
+    first = client.post("/trigger_report").get_json()["report_id"]
+    wait_for_report(client, first)
+    watermark = data_watermark()
+
+    # A back-filled poll edited in place keeps the row count and the latest poll
+    poll = StoreStatus.query.filter_by(store_id="1").order_by(StoreStatus.timestamp_utc).first()
+    poll.status = "inactive"
+    db.session.commit()
+    assert data_watermark() != watermark
+
+    fresh = client.post("/trigger_report").get_json()
+    assert fresh["attached"] is False and fresh["report_id"] != first
+    assert wait_for_report(client, fresh["report_id"]).get_data() != wait_for_report(client, first).get_data()
+
+
+def test_store_changes_after_a_report_stop_its_reuse(client):
+    first = client.post("/trigger_report").get_json()["report_id"]
+    wait_for_report(client, first)
+    watermark = data_watermark()
+
+    # An edit the cache key cannot see, such as a bulk UPDATE logged by its caller
+    record_changes(["1"], "store_status")
+    db.session.commit()
+    assert data_watermark() == watermark
+
+    fresh = client.post("/trigger_report").get_json()
+    assert fresh["attached"] is False and fresh["report_id"] != first
+
+
+def test_eviction_expires_old_reports_and_keeps_shared_files(client):
+    os.makedirs("reports", exist_ok=True)
+    jobs = []
+    for i in range(3):
+        path = os.path.join("reports", f"report_{i}.csv")
+        with open(path, "w") as f:
+            f.write("store_id\n")
+        job = create_job(f"watermark-{i}")
+        update_job(job.report_id, status=COMPLETE, file_path=path, completed_at=utcnow() - timedelta(minutes=10 - i))
+        jobs.append(job)
+
+    # A newer job that reused the oldest job's file
+    shared = create_job("watermark-0")
+    update_job(shared.report_id, status=COMPLETE, file_path=jobs[0].file_path, completed_at=utcnow())
+
+    evicted = evict_reports(max_reports=2, max_age_hours=1)
+
+    assert set(evicted) == {jobs[0].report_id, jobs[1].report_id}
+    assert os.path.exists(jobs[0].file_path) and not os.path.exists(jobs[1].file_path)
+    assert ReportJob.query.filter_by(report_id=jobs[1].report_id).one().status == EXPIRED
+    assert client.get(f"/get_report?report_id={jobs[1].report_id}").status_code == 410
+
+    update_job(jobs[2].report_id, completed_at=datetime(2020, 1, 1))
+    assert evict_reports(max_reports=2, max_age_hours=1) == [jobs[2].report_id]
+    assert client.get("/report_cache").get_json()["cached_reports"] == 1
+
+
+def test_reset_reload_of_hours_invalidates_cached_report(client, tmp_path):
+    def load(closes):
+        folder = tmp_path / f"csv_{closes}"
+        folder.mkdir()
+        (folder / "store_status.csv").write_text(
+            "store_id,status,timestamp_utc\n" + "".join(
+                f"1,active,2023-01-25 {hour:02d}:00:00.000000 UTC\n" for hour in range(8, 23)))
+        (folder / "menu_hours.csv").write_text(
+            "store_id,dayOfWeek,start_time_local,end_time_local\n" + "".join(
+                f"1,{day},09:00:00,{closes}:00:00\n" for day in range(7)))
+        (folder / "timezones.csv").write_text("store_id,timezone_str\n1,UTC\n")
+        StoreMonitoringService().load_data_from_csvs(str(folder), reset=True)
+
+    load(12)
+    first = client.post("/trigger_report").get_json()["report_id"]
+    assert wait_for_report(client, first).get_data(as_text=True).splitlines()[1].split(",")[2] == "3.0"
+
+    load(21)  # same row counts, different hours
+    fresh = client.post("/trigger_report").get_json()
+    assert fresh["attached"] is False
+    assert wait_for_report(client, fresh["report_id"]).get_data(as_text=True).splitlines()[1].split(",")[2] == "12.0"
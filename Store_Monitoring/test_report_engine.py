@@ -0,0 +1,82 @@
+"""
+Parity tests: the vectorized ReportEngine against the per-store service methods
+"""
+
+import random
+from datetime import datetime, timedelta, time
+
+import pytest
+import pytz
+
+from models import db, StoreStatus, BusinessHours, StoreTimezone
+from report_engine import ReportEngine, REPORT_WINDOWS
+from services import StoreMonitoringService
+
+TIMEZONES = ["America/Chicago", "America/New_York", "Asia/Kolkata", "Europe/Berlin", "America/Denver"]
+
+
+def seed_fleet(num_stores, now, seed=7):
+    rng = random.Random(seed)
+    store_ids = [f"store-{i:03d}" for i in range(num_stores)]
+
+    for idx, store_id in enumerate(store_ids):
+        if idx % 4 != 0:  # every fourth store falls back to America/Chicago
+            db.session.add(StoreTimezone(store_id=store_id, timezone_str=rng.choice(TIMEZONES)))
+
+        if idx % 5 != 0:  # every fifth store falls back to 24x7
+            for day in range(7):
+                if rng.random() < 0.15:
+                    continue
+                start = time(rng.randint(0, 23), rng.choice([0, 15, 30, 45]))
+                end = time(rng.randint(0, 23), rng.choice([0, 30]), 59)
+                db.session.add(BusinessHours(store_id=store_id, day_of_week=day,
+                                             start_time_local=start, end_time_local=end))
+
+        if idx % 7 == 3:
+            # Polls only before the week, so every window falls back to business hours
+            db.session.add(StoreStatus(store_id=store_id, status="active",
+                                       timestamp_utc=now - timedelta(days=9)))
+            continue
+
+        ts = now - timedelta(days=7, hours=3)
+        while ts <= now:
+            db.session.add(StoreStatus(store_id=store_id,
+                                       status=rng.choice(["active", "active", "inactive"]),
+                                       timestamp_utc=ts))
+            ts += timedelta(minutes=rng.randint(20, 180))
+
+    db.session.commit()
+    return store_ids
+
+
+@pytest.mark.parametrize("now", [
+    datetime(2023, 1, 25, 18, 13, 22, 479220),
+    datetime(2023, 3, 14, 4, 51, 8, 120000),   # window spans the US spring-forward
+    datetime(2023, 11, 2, 23, 7, 0, 5),        # window spans the EU fall-back
+])
+def test_engine_matches_per_store_calculation(app, now):
+    store_ids = seed_fleet(40, now)
+    current_time = pytz.UTC.localize(now)
+
+    frame = ReportEngine(current_time, store_ids).compute()
+
+    service = StoreMonitoringService()
+    assert list(frame.index) == store_ids
+    for store_id in store_ids:
+        for name, window in REPORT_WINDOWS:
+            uptime, downtime = service.calculate_uptime_downtime(store_id, current_time - window, current_time)
+            assert frame.at[store_id, f"uptime_{name}"] == pytest.approx(uptime, abs=1e-9)
+            assert frame.at[store_id, f"downtime_{name}"] == pytest.approx(downtime, abs=1e-9)
+
+
+def test_engine_skips_stores_with_unknown_timezone(app):
+    now = datetime(2023, 1, 25, 18, 0, 0)
+    db.session.add(StoreTimezone(store_id="bad", timezone_str="Mars/Olympus_Mons"))
+    db.session.add(StoreStatus(store_id="bad", status="active", timestamp_utc=now))
+    db.session.add(StoreStatus(store_id="good", status="active", timestamp_utc=now - timedelta(minutes=30)))
+    db.session.commit()
+
+    rows = ReportEngine(now, ["bad", "good"]).report_rows()
+
+    assert [row["store_id"] for row in rows] == ["good"]
+    assert rows[0]["uptime_last_hour"] == 30.0
@@ -0,0 +1,143 @@
+"""
+Durable report jobs: queueing, deduplication on the data watermark, and /get_report
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import jobs
+from app import create_app
+from models import db, StoreStatus, ReportJob, COMPLETE, FAILED, QUEUED, RUNNING
+from jobs import create_job, data_watermark
+from migrations import upgrade_report_job_indexes
+
+
+def wait_for_report(client, report_id, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = client.get(f"/get_report?report_id={report_id}")
+        if response.mimetype != "application/json" or response.get_json().get("status") != "Running":
+            return response
+        time.sleep(0.1)
+    pytest.fail("report did not finish")
+
+
+def test_report_job_runs_to_completion(client):
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+
+    response = wait_for_report(client, report_id)
+
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True).startswith("store_id,uptime_last_hour")
+    job = ReportJob.query.filter_by(report_id=report_id).one()
+    assert (job.status, job.stores_processed, job.total_stores) == ("Complete", 2, 2)
+    assert client.get("/reports").get_json()["reports"][report_id]["status"] == "Complete"
+
+
+def test_trigger_attaches_to_active_job_for_same_data(client):
+    running = create_job(data_watermark(), status=RUNNING)
+
+    body = client.post("/trigger_report").get_json()
+
+    assert body == {"report_id": running.report_id, "attached": True}
+    assert client.get(f"/get_report?report_id={running.report_id}").get_json()["status"] == "Running"
+
+    db.session.add(StoreStatus(store_id="3", status="inactive", timestamp_utc=datetime(2023, 1, 25, 18, 5)))
+    db.session.commit()
+    fresh = client.post("/trigger_report").get_json()
+    assert fresh["attached"] is False and fresh["report_id"] != running.report_id
+
+
+def test_trigger_racing_another_process_attaches_to_its_job(client, monkeypatch):
+    other = create_job(data_watermark(), status=RUNNING)
+    with pytest.raises(IntegrityError):
+        create_job(data_watermark())
+    db.session.rollback()
+
+    lookups = []
+    find_active_job = jobs.find_active_job
+
+    def stale_lookup(watermark):  # the other worker commits its job just after our first lookup
+        lookups.append(watermark)
+        return None if len(lookups) == 1 else find_active_job(watermark)
+
+    monkeypatch.setattr(jobs, "find_active_job", stale_lookup)
+    body = client.post("/trigger_report").get_json()
+
+    assert body == {"report_id": other.report_id, "attached": True}
+    assert ReportJob.query.filter(ReportJob.status.in_((QUEUED, RUNNING))).count() == 1
+
+
+def test_job_queued_before_new_data_runs_alongside_the_newer_job(client):
+    from flask import current_app
+    from services import StoreMonitoringService
+
+    report_queue = current_app.extensions["report_queue"]
+    report_queue._workers = ["busy"]  # run the jobs by hand below
+    first, _ = report_queue.submit()
+    db.session.add(StoreStatus(store_id="1", status="inactive", timestamp_utc=datetime(2023, 1, 25, 18, 30)))
+    db.session.commit()
+    second, attached = report_queue.submit()
+    assert not attached
+
+    # The first job computes from the newer data, the watermark the second job is queued under
+    StoreMonitoringService().generate_report_background(first, current_app._get_current_object())
+    StoreMonitoringService().generate_report_background(second, current_app._get_current_object())
+
+    jobs_by_id = {job.report_id: job for job in ReportJob.query}
+    assert (jobs_by_id[first].status, jobs_by_id[second].status) == (COMPLETE, COMPLETE), jobs_by_id[first].error
+    assert jobs_by_id[first].computed_watermark == jobs_by_id[second].watermark
+    assert jobs_by_id[second].file_path == jobs_by_id[first].file_path  # reused
+
+
+def test_restart_resumes_interrupted_jobs_without_a_trigger(client, tmp_path):
+    crashed = create_job(data_watermark(), status=RUNNING)
+    ReportJob.query.filter_by(report_id=crashed.report_id).update(
+        {"updated_at": datetime.utcnow() - timedelta(days=1)})
+    db.session.commit()
+
+    restarted = create_app(f"sqlite:///{tmp_path / 'jobs.db'}")
+    assert restarted.extensions["report_queue"]._workers
+    with restarted.app_context():
+        response = wait_for_report(restarted.test_client(), crashed.report_id)
+    assert response.mimetype == "text/csv"
+
+
+def test_upgrade_fails_duplicate_active_jobs_before_adding_the_index(app):
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX uq_report_jobs_active_watermark")
+    for report_id, status in (("first", RUNNING), ("second", QUEUED), ("done", COMPLETE)):
+        db.session.add(ReportJob(report_id=report_id, status=status, watermark="w",
+                                 created_at=datetime(2023, 1, 25)))
+    db.session.commit()
+
+    with db.engine.begin() as connection:
+        assert upgrade_report_job_indexes(connection) == ["uq_report_jobs_active_watermark"]
+    with db.engine.begin() as connection:
+        assert upgrade_report_job_indexes(connection) == []
+
+    statuses = dict(db.session.query(ReportJob.report_id, ReportJob.status))
+    assert statuses == {"first": RUNNING, "second": FAILED, "done": COMPLETE}
+
+
+def test_full_queue_rejects_new_reports(client):
+    from flask import current_app
+
+    report_queue = current_app.extensions["report_queue"]
+    report_queue._workers = ["busy"]  # keep the jobs queued
+    for minute in range(report_queue._queue.maxsize):
+        db.session.add(StoreStatus(store_id="9", status="active", timestamp_utc=datetime(2023, 1, 26, 0, minute)))
+        db.session.commit()
+        assert client.post("/trigger_report").status_code == 200
+
+    db.session.add(StoreStatus(store_id="9", status="active", timestamp_utc=datetime(2023, 1, 27)))
+    db.session.commit()
+    assert client.post("/trigger_report").status_code == 503
+    assert ReportJob.query.filter_by(status=QUEUED).count() == report_queue._queue.maxsize
+
+
+def test_unknown_report(client):
+    assert client.get("/get_report?report_id=nope").status_code == 404
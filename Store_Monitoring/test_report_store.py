@@ -0,0 +1,85 @@
+"""
+Report formats and queries: store filters, column projection and pages from CSV, Parquet and Arrow files,
+and the report_rows table
+"""
+
+import pytest
+
+import services
+from models import ReportRow
+from report_cache import evict_reports
+from report_store import iter_report_csv, iter_report_rows, open_report_writer, query_report
+from report_writer import REPORT_COLUMNS
+from test_report_jobs import wait_for_report
+
+ROWS = [
+    {"store_id": f"s{i:02d}", "uptime_last_hour": i * 1.5, "uptime_last_day": 20.25, "uptime_last_week": 140.0,
+     "downtime_last_hour": 60 - i * 1.5, "downtime_last_day": 3.75, "downtime_last_week": 28.0}
+    for i in range(25)
+]
+
+
+def write_report(tmp_path, fmt):
+    writer = open_report_writer(str(tmp_path), f"fixture-{fmt}", fmt)
+    for start in range(0, len(ROWS), 10):  # several row groups / record batches
+        writer.write_rows(ROWS[start:start + 10])
+    return writer.commit()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_queries_agree_across_formats(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    path = write_report(tmp_path, fmt)
+
+    assert list(iter_report_rows(path)) == ROWS
+    assert query_report(path, offset=8, limit=5) == (25, ROWS[8:13])
+    assert query_report(path, offset=20, limit=10) == (25, ROWS[20:])
+
+    wanted = {"s03", "s11", "s24", "missing"}
+    total, rows = query_report(path, wanted, ["store_id", "uptime_last_hour"], offset=1, limit=1)
+    assert (total, rows) == (3, [{"store_id": "s11", "uptime_last_hour": 16.5}])
+    assert query_report(path, {"s05"}, ["downtime_last_week"]) == (1, [{"downtime_last_week": 28.0}])
+
+    lines = "".join(iter_report_csv(path, {"s00", "s01"})).splitlines()
+    assert lines[0] == ",".join(REPORT_COLUMNS) and [line.split(",")[0] for line in lines[1:]] == ["s00", "s01"]
+
+    copy = open_report_writer(str(tmp_path), f"copy-{fmt}", fmt)
+    assert copy.copy_rows(path, {"s01", "s02"}) == {"s01", "s02"}
+    assert list(iter_report_rows(copy.commit())) == ROWS[1:3]
+
+
+def test_get_report_pages_and_projects(client):
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+    wait_for_report(client, report_id)
+
+    page = client.get(f"/get_report?report_id={report_id}&columns=store_id,uptime_last_day&limit=1&offset=1")
+    assert page.status_code == 200
+    body = page.get_json()
+    assert (body["total"], body["offset"], body["limit"]) == (2, 1, 1)
+    assert body["rows"] == [{"store_id": "2", "uptime_last_day": body["rows"][0]["uptime_last_day"]}]
+
+    filtered = client.get(f"/get_report?report_id={report_id}&store_id=1&format=json").get_json()
+    assert filtered["total"] == 1 and filtered["rows"][0]["store_id"] == "1"
+    assert set(filtered["columns"]) == set(REPORT_COLUMNS)
+
+    for bad in ("columns=store_id,bogus", "limit=0", "offset=-1", "offset=x"):
+        assert client.get(f"/get_report?report_id={report_id}&{bad}").status_code == 400
+
+    reports = client.get("/reports?status=Complete&limit=5&offset=0").get_json()
+    assert list(reports["reports"]) == [report_id] and reports["limit"] == 5
+    assert client.get("/reports?status=Complete&offset=1").get_json()["reports"] == {}
+
+
+def test_finished_rows_are_copied_to_the_report_table(client, monkeypatch):
+    monkeypatch.setattr(services, "REPORT_DB_TABLE", True)
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+    wait_for_report(client, report_id)
+
+    rows = ReportRow.query.filter_by(report_id=report_id).order_by(ReportRow.store_id).all()
+    assert [row.store_id for row in rows] == ["1", "2"]
+    assert rows[0].uptime_last_day + rows[0].downtime_last_day > 0
+
+    assert evict_reports(max_reports=0) == [report_id]
+    assert ReportRow.query.count() == 0
+    assert client.get(f"/get_report?report_id={report_id}").status_code == 410
@@ -0,0 +1,67 @@
+"""
+Incremental report files and streamed /get_report responses
+"""
+
+import gzip
+
+import pytest
+
+from jobs import create_job, update_job
+from models import COMPLETE, RUNNING
+from report_writer import ReportWriter, iter_report_lines, report_path
+from test_report_jobs import wait_for_report
+
+
+def row(store_id, uptime=60.0):
+    return {
+        'store_id': store_id, 'uptime_last_hour': uptime, 'uptime_last_day': 1.5, 'uptime_last_week': 10.25,
+        'downtime_last_hour': 0.0, 'downtime_last_day': 0.0, 'downtime_last_week': 0.0,
+    }
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_partial_file_is_readable_between_batches(tmp_path, compress):
+    writer = ReportWriter(report_path(str(tmp_path), "r1", compress))
+    writer.write_rows([row("a"), row("b")])
+
+    lines = list(iter_report_lines(writer.partial_path))
+    assert lines[0].startswith("store_id,uptime_last_hour") and len(lines) == 3
+
+    writer.write_rows([row("c", 12.35)])
+    assert list(iter_report_lines(writer.partial_path, {"c"}))[1:] == ["c,12.35,1.5,10.25,0.0,0.0,0.0\n"]
+
+    path = writer.commit()
+    assert path.endswith(".csv.gz" if compress else ".csv")
+    assert len(list(iter_report_lines(path))) == 4
+    if compress:
+        assert gzip.open(path, "rt").read().count("\n") == 4
+
+
+def test_get_report_streams_running_and_filtered_reports(client, tmp_path):
+    job = create_job("watermark", status=RUNNING)
+    writer = ReportWriter(report_path(str(tmp_path), job.report_id))
+    writer.write_rows([row("a"), row("b")])
+    update_job(job.report_id, file_path=writer.partial_path, stores_processed=2, total_stores=5)
+
+    status = client.get(f"/get_report?report_id={job.report_id}").get_json()
+    assert status["status"] == "Running"
+
+    response = client.get(f"/get_report?report_id={job.report_id}&partial=true")
+    assert response.mimetype == "text/csv" and response.is_streamed
+    assert response.headers["X-Report-Status"] == RUNNING
+    assert response.headers["X-Stores-Processed"] == "2"
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+
+    writer.write_rows([row("c")])
+    update_job(job.report_id, status=COMPLETE, file_path=writer.commit())
+    sliced = client.get(f"/get_report?report_id={job.report_id}&store_id=a,c")
+    assert [line.split(",")[0] for line in sliced.get_data(as_text=True).splitlines()] == ["store_id", "a", "c"]
+
+
+def test_generated_report_has_every_store(client, monkeypatch):
+    monkeypatch.setattr("services.REPORT_WRITE_BATCH", 1)
+    report_id = client.post("/trigger_report").get_json()["report_id"]
+
+    lines = wait_for_report(client, report_id).get_data(as_text=True).splitlines()
+
+    assert sorted(line.split(",")[0] for line in lines[1:]) == ["1", "2"]
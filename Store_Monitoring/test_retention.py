@@ -0,0 +1,141 @@
+"""
+Retention: daily archives, status segments, and reads that span the archived range
+"""
+
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+import pytz
+
+from models import db, StoreStatus, StatusSegment, ArchivePartition
+from report_engine import ReportEngine, REPORT_WINDOWS
+from retention import RetentionManager, archive_cutoff, expand_segments, read_archive, run_segments
+import retention
+import services
+from services import StoreMonitoringService
+from test_report_engine import seed_fleet
+
+NOW = datetime(2023, 3, 14, 4, 51, 8, 120000)
+
+
+def polls_frame():
+    rows = db.session.query(StoreStatus.store_id, StoreStatus.timestamp_utc, StoreStatus.status).order_by(
+        StoreStatus.store_id, StoreStatus.timestamp_utc).all()
+    return pd.DataFrame(rows, columns=["store_id", "timestamp_utc", "status"])
+
+
+def test_run_segments_and_expansion():
+    polls = pd.DataFrame({
+        "store_id": ["a", "a", "a", "a", "b"],
+        "timestamp_utc": pd.to_datetime(["2023-01-01 00:10", "2023-01-01 02:30", "2023-01-01 03:05",
+                                         "2023-01-01 04:00", "2023-01-01 01:00"]),
+        "status": ["active", "active", "inactive", "inactive", "active"],
+    })
+    segments = run_segments(polls)
+    assert segments[["store_id", "status", "polls"]].values.tolist() == [
+        ["a", "active", 2], ["a", "inactive", 2], ["b", "active", 1]]
+
+    expanded = expand_segments(segments, datetime(2023, 1, 1, 0, 30), datetime(2023, 1, 1, 3, 30))
+    a = expanded[expanded["store_id"] == "a"]
+    assert [ts.strftime("%H:%M") for ts in a["timestamp_utc"]] == ["01:00", "02:00", "02:30", "03:05"]
+    assert a["status"].tolist() == ["active", "active", "active", "inactive"]
+
+    # 23:00 and 23:30 CST, then 00:10 the next local day
+    late = polls.assign(store_id="c", status="active").iloc[:3].assign(
+        timestamp_utc=pd.to_datetime(["2023-01-01 05:00", "2023-01-01 05:30", "2023-01-01 06:10"]))
+    assert run_segments(late)["polls"].tolist() == [3]
+    assert run_segments(late, {"c": "America/Chicago"})["polls"].tolist() == [2, 1]
+
+
+def test_compact_archives_old_days(app, tmp_path):
+    seed_fleet(12, NOW)
+    before = polls_frame()
+    latest_day = datetime.combine(NOW.date(), datetime.min.time())
+
+    archived = RetentionManager(hot_days=3, archive_dir=str(tmp_path)).compact()
+
+    cutoff = latest_day - timedelta(days=3)
+    assert archive_cutoff() == cutoff
+    assert [day["day"] for day in archived] == sorted(day["day"] for day in archived)
+    assert db.session.query(StoreStatus).filter(StoreStatus.timestamp_utc < cutoff).count() == 0
+    assert polls_frame().equals(before[before["timestamp_utc"] >= cutoff].reset_index(drop=True))
+
+    cold = pd.concat([read_archive(p.file_path) for p in ArchivePartition.query.order_by(ArchivePartition.day)])
+    cold = cold.sort_values(["store_id", "timestamp_utc"], kind="stable", ignore_index=True)
+    old = before[before["timestamp_utc"] < cutoff].reset_index(drop=True)
+    assert cold["timestamp_utc"].tolist() == old["timestamp_utc"].tolist()
+    assert cold["store_id"].tolist() == old["store_id"].tolist()
+    assert db.session.query(db.func.sum(StatusSegment.polls)).scalar() == len(old)
+
+    # Nothing left to archive until newer polls arrive
+    assert RetentionManager(hot_days=3, archive_dir=str(tmp_path)).compact() == []
+
+
+def test_reads_span_archived_days(app, tmp_path, monkeypatch):
+    store_ids = seed_fleet(12, NOW)
+    current_time = pytz.UTC.localize(NOW)
+    service = StoreMonitoringService()
+    before = {store_id: service.calculate_uptime_downtime(store_id, current_time - timedelta(weeks=1), current_time)
+              for store_id in store_ids}
+    recent = {store_id: service.calculate_uptime_downtime(store_id, current_time - timedelta(days=1), current_time)
+              for store_id in store_ids}
+
+    RetentionManager(hot_days=3, archive_dir=str(tmp_path)).compact()
+    lookups = []
+    monkeypatch.setattr(services, "archive_cutoff", lambda: lookups.append(1) or archive_cutoff())
+    service = StoreMonitoringService()
+
+    frame = ReportEngine(current_time, store_ids).compute()
+    for store_id in store_ids:
+        for name, window in REPORT_WINDOWS:
+            uptime, downtime = service.calculate_uptime_downtime(store_id, current_time - window, current_time)
+            assert frame.at[store_id, f"uptime_{name}"] == pytest.approx(uptime, abs=1e-9)
+            assert frame.at[store_id, f"downtime_{name}"] == pytest.approx(downtime, abs=1e-9)
+
+        # Hot windows are exact; archived time is resolved to the hour
+        assert service.calculate_uptime_downtime(store_id, current_time - timedelta(days=1),
+                                                 current_time) == pytest.approx(recent[store_id])
+        uptime, downtime = service.calculate_uptime_downtime(store_id, current_time - timedelta(weeks=1),
+                                                             current_time)
+        assert uptime == pytest.approx(before[store_id][0], abs=1.0)
+        assert downtime == pytest.approx(before[store_id][1], abs=1.0)
+    assert len(lookups) == 1
+
+
+def test_engine_batches_read_only_their_stores_archive(app, tmp_path, monkeypatch):
+    store_ids = seed_fleet(12, NOW)
+    RetentionManager(hot_days=3, archive_dir=str(tmp_path)).compact()
+    current_time = pytz.UTC.localize(NOW)
+    whole = ReportEngine(current_time, store_ids).compute()
+
+    read = []
+    expand = retention.expand_segments
+
+    def spy(segments, start, end):
+        read.append(set(segments["store_id"]))
+        return expand(segments, start, end)
+
+    monkeypatch.setattr(retention, "expand_segments", spy)
+    batch = store_ids[2:5]
+    frame = ReportEngine(current_time, batch).compute()
+
+    assert read and read[0] <= set(batch)
+    pd.testing.assert_frame_equal(frame, whole.loc[batch])
+
+
+def test_failed_partition_keeps_hot_rows(app, tmp_path, monkeypatch):
+    seed_fleet(4, NOW)
+    total = StoreStatus.query.count()
+    manager = RetentionManager(hot_days=3, archive_dir=str(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db.session, "add", fail)
+    with pytest.raises(RuntimeError):
+        manager.archive_day(date(2023, 3, 7))
+
+    assert StoreStatus.query.count() == total
+    assert StatusSegment.query.count() == 0
+    assert not list((tmp_path / "store_status").iterdir())
@@ -0,0 +1,139 @@
+"""
+Uptime rollups: daily/weekly sums against hourly buckets, incremental refresh, and the trend endpoints
+"""
+
+import calendar
+import threading
+from datetime import datetime, timedelta, time
+
+import pytest
+
+from models import db, StoreStatus, BusinessHours, UptimeRollup, FleetUptimeRollup
+from aggregates import hourly_buckets, load_polls_around
+from business_hours import BusinessHoursIndex
+from report_cache import prune_store_changes
+from rollups import RollupScheduler, TrendQueryError, UptimeRollups, parse_target, query_targets, week_floor
+from test_report_engine import seed_fleet
+
+NOW = datetime(2023, 1, 25, 18, 13, 22)  # a Wednesday
+WEEK_START = datetime(2023, 1, 16)
+
+
+def rollup_sums(granularity, period_start):
+    rows = UptimeRollup.query.filter_by(granularity=granularity, period_start=period_start).all()
+    return {row.store_id: (row.uptime_seconds, row.downtime_seconds) for row in rows}
+
+
+def test_backfill_matches_hourly_buckets(app):
+    seed_fleet(12, NOW)
+    assert UptimeRollups().backfill(NOW - timedelta(days=14)) == 3
+
+    end = WEEK_START + timedelta(weeks=1)
+    polls = load_polls_around(WEEK_START, end)
+    ranges = {store_id: (WEEK_START, end) for store_id in polls["store_id"].unique()}
+    buckets = hourly_buckets(polls, BusinessHoursIndex.build(WEEK_START, end), ranges)
+    expected = buckets.groupby("store_id")[["uptime_seconds", "downtime_seconds"]].sum()
+
+    weekly = rollup_sums("week", WEEK_START)
+    assert set(weekly) == set(expected.index)
+    for store_id, (uptime, downtime) in weekly.items():
+        assert uptime == pytest.approx(expected.loc[store_id, "uptime_seconds"])
+        assert downtime == pytest.approx(expected.loc[store_id, "downtime_seconds"])
+
+    days = [rollup_sums("day", WEEK_START + timedelta(days=d)) for d in range(7)]
+    for store_id, (uptime, downtime) in weekly.items():
+        assert sum(day.get(store_id, (0, 0))[0] for day in days) == pytest.approx(uptime)
+
+    fleet = FleetUptimeRollup.query.filter_by(granularity="week", period_start=WEEK_START).one()
+    assert fleet.stores == len(weekly)
+    assert fleet.uptime_seconds == pytest.approx(sum(up for up, _ in weekly.values()))
+    assert fleet.downtime_seconds == pytest.approx(sum(down for _, down in weekly.values()))
+
+
+def test_refresh_picks_up_new_polls_and_hours_changes(app):
+    store_ids = seed_fleet(6, NOW)
+    rollups = UptimeRollups()
+    rollups.backfill(NOW - timedelta(days=14))
+    assert rollups.refresh() == 1  # only the newest week is recomputed when nothing changed
+
+    store_id = store_ids[1]
+    before = rollup_sums("week", WEEK_START)[store_id]
+    BusinessHours.query.filter_by(store_id=store_id).delete()
+    for day in range(7):
+        db.session.add(BusinessHours(store_id=store_id, day_of_week=day,
+                                     start_time_local=time(0, 0), end_time_local=time(23, 59, 59)))
+    db.session.commit()
+    assert rollups.refresh() > 1
+    assert sum(rollup_sums("week", WEEK_START)[store_id]) > sum(before)
+
+    db.session.add(StoreStatus(store_id="newcomer", status="active", timestamp_utc=NOW + timedelta(hours=1)))
+    db.session.add(StoreStatus(store_id="newcomer", status="active", timestamp_utc=NOW + timedelta(hours=5)))
+    db.session.commit()
+    rollups.refresh()
+    assert rollup_sums("week", week_floor(NOW))["newcomer"][0] == pytest.approx(4 * 3600)
+
+
+def test_prune_keeps_changes_for_cli_maintained_rollups(app):
+    store_ids = seed_fleet(6, NOW)
+    rollups = UptimeRollups()
+    rollups.backfill(NOW - timedelta(days=14))  # as `python rollups.py backfill`, with ROLLUPS_ENABLED off
+
+    store_id = store_ids[1]
+    before = rollup_sums("week", WEEK_START)[store_id]
+    BusinessHours.query.filter_by(store_id=store_id).delete()
+    for day in range(7):
+        db.session.add(BusinessHours(store_id=store_id, day_of_week=day,
+                                     start_time_local=time(0, 0), end_time_local=time(23, 59, 59)))
+    db.session.commit()
+
+    prune_store_changes()
+    db.session.commit()
+    assert rollups.refresh() > 1
+    assert sum(rollup_sums("week", WEEK_START)[store_id]) > sum(before)
+
+
+def test_scheduler_refreshes_on_start(app, monkeypatch):
+    refreshed = threading.Event()
+    monkeypatch.setattr(UptimeRollups, "refresh", lambda self: refreshed.set())
+    scheduler = RollupScheduler(app, interval=3600)
+    try:
+        assert refreshed.wait(5)
+    finally:
+        scheduler.stop()
+
+
+def test_query_targets_shape(app):
+    seed_fleet(4, NOW)
+    UptimeRollups().backfill(NOW - timedelta(days=14))
+
+    fleet, store = query_targets(["fleet:day", "store:store-001:week"], NOW - timedelta(days=10), NOW)
+    assert fleet["target"] == "fleet:day" and len(fleet["datapoints"]) >= 7
+    assert all(0 <= pct <= 100 for pct, _ in fleet["datapoints"])
+    assert [ms for _, ms in fleet["datapoints"]] == sorted(ms for _, ms in fleet["datapoints"])
+    assert store["datapoints"][0][1] == calendar.timegm(WEEK_START.timetuple()) * 1000
+
+    assert parse_target("store:a:b:day") == ("a:b", "day")
+    with pytest.raises(TrendQueryError):
+        parse_target("store::week")
+
+
+def test_trend_endpoints(client):
+    UptimeRollups().backfill()  # the fixture runs inside the app context
+
+    response = client.get("/trends/uptime?granularity=week")
+    assert response.status_code == 200
+    assert response.get_json()["series"][0]["target"] == "fleet:week"
+    assert client.get("/trends/uptime?granularity=month").status_code == 400
+    assert client.get("/trends/uptime?start=yesterday").status_code == 400
+
+    assert client.get("/trends/grafana").status_code == 200
+    targets = client.post("/trends/grafana/search", json={"target": "store:"}).get_json()
+    assert "store:1:day" in targets and "fleet:day" not in targets
+
+    response = client.post("/trends/grafana/query", json={
+        "range": {"from": "2020-01-01T00:00:00.000Z", "to": "2030-01-01T00:00:00.000Z"},
+        "targets": [{"target": "fleet:day"}, {"target": "store:2:week"}],
+    })
+    assert response.status_code == 200
+    assert [series["target"] for series in response.get_json()] == ["fleet:day", "store:2:week"]
+    assert client.post("/trends/grafana/query", json={"targets": []}).status_code == 400
@@ -0,0 +1,81 @@
+"""
+Startup: cold start without heavy imports, background CSV bootstrap with readiness on /health, lazy /admin
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from app import create_app
+from services import StoreMonitoringService
+from test_csv_loader import write_csvs
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app(sys.argv[1], bootstrap="off")
+seconds = time.perf_counter() - started
+heavy = [name for name in ("pandas", "numpy", "flask_admin") if name in sys.modules]
+status = app.test_client().get("/admin/").status_code
+print(json.dumps({"seconds": seconds, "heavy": heavy, "admin_status": status,
+                  "admin_loaded": "flask_admin" in sys.modules}))
+"""
+
+
+def test_cold_start_defers_pandas_and_admin(tmp_path):
+    result = subprocess.run([sys.executable, "-c", COLD_START, f"sqlite:///{tmp_path / 'cold.db'}"],
+                            cwd=HERE, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"cold start: {report['seconds']:.3f}s")
+    assert report["heavy"] == []
+    assert report["seconds"] < 10
+    assert (report["admin_status"], report["admin_loaded"]) == (200, True)
+
+
+def test_background_bootstrap_reports_readiness(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    write_csvs(data)
+
+    release = threading.Event()
+    load = StoreMonitoringService.load_data_from_csvs
+
+    def slow_load(self, csv_folder, reset=False):
+        release.wait(10)
+        return load(self, csv_folder, reset)
+
+    monkeypatch.setattr(StoreMonitoringService, "load_data_from_csvs", slow_load)
+    app = create_app(f"sqlite:///{tmp_path / 'boot.db'}", bootstrap="background", csv_folder=str(data))
+    client = app.test_client()
+
+    starting = client.get("/health")
+    assert starting.status_code == 503
+    assert starting.get_json()["bootstrap"]["state"] in ("pending", "loading")
+    assert client.post("/trigger_report").status_code == 503
+
+    release.set()
+    assert app.extensions["bootstrap"].wait(10)
+    ready = client.get("/health")
+    assert ready.status_code == 200
+    assert ready.get_json()["bootstrap"]["state"] == "ready"
+    assert ready.get_json()["stores_in_db"] == 3
+
+
+def test_bootstrap_skips_populated_database(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    write_csvs(data)
+    db_uri = f"sqlite:///{tmp_path / 'boot.db'}"
+
+    create_app(db_uri, bootstrap="sync", csv_folder=str(data))
+    again = create_app(db_uri, bootstrap="sync", csv_folder=str(data))
+
+    assert again.extensions["bootstrap"].stats is None
+    assert again.test_client().get("/health").get_json()["stores_in_db"] == 3
@@ -0,0 +1,79 @@
+"""
+/stores/<store_id>/uptime: parity with calculate_uptime_downtime, named windows, and cache updates on ingest
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from app import create_app
+from services import StoreMonitoringService
+from store_uptime import resolve_window, store_uptime_cache
+from test_report_engine import seed_fleet
+
+NOW = datetime(2023, 3, 14, 4, 51, 8, 120000)
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(f"sqlite:///{tmp_path / 'uptime.db'}")
+    with app.app_context():
+        store_uptime_cache.clear()
+        seed_fleet(12, NOW)
+        yield app.test_client()
+        store_uptime_cache.clear()
+
+
+def query(client, store_id, **params):
+    return client.get(f"/stores/{store_id}/uptime", query_string=params)
+
+
+@pytest.mark.parametrize("hours_back, length", [(1, 1), (6, 6), (30, 24), (7 * 24, 7 * 24 - 1)])
+def test_matches_calculate_uptime_downtime(client, hours_back, length):
+    end_utc = pytz.UTC.localize(NOW)
+    start = end_utc - timedelta(hours=hours_back)
+    end = start + timedelta(hours=length)
+
+    for store_id in (f"store-{i:03d}" for i in range(12)):
+        body = query(client, store_id, start=start.isoformat(), end=end.isoformat()).get_json()
+        uptime, downtime = StoreMonitoringService().calculate_uptime_downtime(store_id, start, end)
+        assert body["uptime_hours"] == pytest.approx(uptime, abs=1e-4), store_id
+        assert body["downtime_hours"] == pytest.approx(downtime, abs=1e-4), store_id
+
+
+def test_cache_is_reused_and_updated_on_ingest(client):
+    first = query(client, "store-001", window="last_6_hours").get_json()
+    again = query(client, "store-001", window="last_6_hours").get_json()
+    assert (first["cached"], again["cached"]) == (False, True)
+    span = datetime.fromisoformat(first["end"]) - datetime.fromisoformat(first["start"])
+    assert span == timedelta(hours=6)
+
+    poll_time = NOW + timedelta(minutes=1)
+    response = client.post("/ingest", json={"store_id": "store-001", "status": "inactive",
+                                            "timestamp_utc": poll_time.strftime("%Y-%m-%d %H:%M:%S.%f UTC")})
+    assert response.status_code == 200
+
+    after = query(client, "store-001", window="last_6_hours").get_json()
+    assert after["cached"] is True
+    assert after["end"] == pytz.UTC.localize(poll_time).isoformat()
+
+    end = pytz.UTC.localize(poll_time)
+    uptime, downtime = StoreMonitoringService().calculate_uptime_downtime("store-001", end - timedelta(hours=6), end)
+    assert after["uptime_hours"] == pytest.approx(uptime, abs=1e-4)
+    assert after["downtime_hours"] == pytest.approx(downtime, abs=1e-4)
+
+
+def test_yesterday_uses_store_local_days():
+    as_of = pytz.UTC.localize(datetime(2023, 3, 14, 4, 51))  # 2023-03-13 21:51 in Los Angeles
+    start, end = resolve_window("yesterday", as_of, "America/Los_Angeles")
+
+    assert start == pytz.UTC.localize(datetime(2023, 3, 12, 8, 0))
+    assert end == pytz.UTC.localize(datetime(2023, 3, 13, 7, 0))  # 23-hour DST day
+
+
+def test_bad_requests(client):
+    assert query(client, "store-001").status_code == 400
+    assert query(client, "store-001", window="fortnight").status_code == 400
+    assert query(client, "store-001", start="2023-03-14T00:00:00", end="2023-03-13T00:00:00").status_code == 400
+    assert query(client, "nope", window="last_hour").status_code == 404
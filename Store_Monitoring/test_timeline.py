@@ -0,0 +1,105 @@
+"""
+StatusTimeline: run building, merge-on-append, window slicing and parity with the per-poll walk
+"""
+
+from datetime import datetime, time, timedelta
+
+import pytest
+import pytz
+
+from models import db, BusinessHours, StoreStatus, StoreTimezone
+from report_engine import ReportEngine
+from services import StoreMonitoringService
+from timeline import StatusTimeline
+
+T0 = datetime(2023, 1, 2, 9, 0)
+
+
+def flat_hours(start, end):
+    return (end - start).total_seconds() / 3600
+
+
+def polls(*spec):
+    return [(T0 + timedelta(minutes=minutes), status) for minutes, status in spec]
+
+
+def test_runs_merge_on_append():
+    timeline = StatusTimeline.from_polls(polls((0, "active"), (60, "active"), (120, "inactive")))
+    assert (len(timeline), timeline.run_count) == (3, 2)
+
+    timeline.append(T0 + timedelta(minutes=180), "inactive")
+    timeline.append(T0 + timedelta(minutes=240), "active")
+    assert (len(timeline), timeline.run_count) == (5, 3)
+
+    timeline.append(T0 + timedelta(minutes=30), "inactive")  # late poll splits the first run
+    assert (len(timeline), timeline.run_count) == (6, 5)
+    assert list(timeline.run_first) == [0, 1, 2, 3, 5]
+
+
+def test_window_starts_at_first_poll_inside():
+    timeline = StatusTimeline.from_polls(polls((0, "active"), (60, "active"), (90, "active"), (150, "inactive")))
+    start = pytz.UTC.localize(T0 + timedelta(minutes=45))
+    end = pytz.UTC.localize(T0 + timedelta(minutes=200))
+
+    # The 45-60 minute gap before the first poll inside the window is not counted
+    assert timeline.uptime(start, end, flat_hours) == pytest.approx((1.5, 50 / 60))
+    assert timeline.uptime(end + timedelta(hours=3), end + timedelta(hours=4), flat_hours) == (1.0, 0.0)
+
+
+def test_runs_are_cut_at_offset_transitions_and_local_days():
+    spring_forward = datetime(2023, 3, 12, 8, 0)  # 02:00 CST -> 03:00 CDT
+    timeline = StatusTimeline.from_polls([(spring_forward - timedelta(hours=h), "active") for h in (3, 1)]
+                                         + [(spring_forward + timedelta(hours=h), "active") for h in (1, 3)])
+    start_ns, end_ns = timeline.poll_ns[0], timeline.poll_ns[-1]
+
+    starts, _, _ = timeline.window(start_ns, end_ns)
+    assert len(starts) == 1
+    starts, _, _ = timeline.window(start_ns, end_ns, "America/Chicago")
+    assert list(starts) == [start_ns, timeline.poll_ns[1], timeline.poll_ns[2]]  # local midnight, then the offset
+
+
+def per_poll(service, store_id, polls, start, end):
+    """The per-poll walk calculate_uptime_downtime did before timelines."""
+    uptime = downtime = 0.0
+    for i, (ts, status) in enumerate(polls):
+        ts = pytz.UTC.localize(ts)
+        if ts < start:
+            continue
+        interval_end = min(pytz.UTC.localize(polls[i + 1][0]), end) if i + 1 < len(polls) else end
+        if ts < interval_end:
+            hours = service.get_business_hours_in_period(store_id, ts, interval_end)
+            if status == "active":
+                uptime += hours
+            else:
+                downtime += hours
+    return uptime, downtime
+
+
+def test_overnight_hours_match_the_per_poll_walk(app):
+    night = datetime(2023, 1, 2, 21, 0)
+    statuses = {"steady": ["active"] * 7, "flips": ["active"] * 4 + ["inactive"] * 3}
+    for store_id, store_statuses in statuses.items():
+        db.session.add(StoreTimezone(store_id=store_id, timezone_str="UTC"))
+        for day in range(7):
+            db.session.add(BusinessHours(store_id=store_id, day_of_week=day,
+                                         start_time_local=time(20, 0), end_time_local=time(3, 0)))
+        for minutes, status in zip((0, 60, 120, 180, 210, 240, 300), store_statuses):
+            db.session.add(StoreStatus(store_id=store_id, status=status,
+                                       timestamp_utc=night + timedelta(minutes=minutes)))
+    db.session.commit()
+
+    service = StoreMonitoringService()
+    end = pytz.UTC.localize(night + timedelta(hours=6))
+    start = pytz.UTC.localize(night)
+    for store_id in statuses:
+        polls = [(row.timestamp_utc, row.status)
+                 for row in StoreStatus.query.filter_by(store_id=store_id).order_by(StoreStatus.timestamp_utc)]
+        expected = per_poll(service, store_id, polls, start, end)
+        assert service.calculate_uptime_downtime(store_id, start, end) == pytest.approx(expected)
+        assert sum(expected) == pytest.approx(3.0)  # the walk drops hours spilling past midnight
+
+    frame = ReportEngine(end, list(statuses)).compute()
+    for store_id in statuses:
+        uptime, downtime = service.calculate_uptime_downtime(store_id, end - timedelta(days=1), end)
+        assert (frame.loc[store_id, "uptime_day"], frame.loc[store_id, "downtime_day"]) == pytest.approx(
+            (uptime, downtime))
@@ -0,0 +1,61 @@
+"""
+OffsetTable lookups against pytz's astimezone, including the instants around DST gaps and overlaps
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+import pytz
+
+from tz_offsets import EPOCH, offset_table
+
+ZONES = ["America/Chicago", "America/New_York", "Europe/Berlin", "Asia/Kolkata", "Asia/Kathmandu",
+         "Australia/Adelaide", "Australia/Lord_Howe", "America/Santiago", "Pacific/Chatham", "UTC", "Etc/GMT+5",
+         "EST"]
+
+
+def pytz_offset_us(tz, utc: datetime) -> int:
+    offset = pytz.UTC.localize(utc).astimezone(tz).utcoffset()
+    return (offset.days * 86_400 + offset.seconds) * 1_000_000
+
+
+def utc_us(utc: datetime) -> int:
+    delta = utc - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+@pytest.mark.parametrize("tz_name", ZONES)
+def test_offsets_match_pytz(tz_name):
+    tz, table = pytz.timezone(tz_name), offset_table(tz_name)
+    rng = random.Random(tz_name)
+    instants = [datetime(2015, 1, 1) + timedelta(microseconds=rng.randrange(15 * 365 * 86_400 * 10**6))
+                for _ in range(500)]
+    # Both sides of every switch near the report years: the gap and overlap edges
+    for change in table.changes_us[(table.changes_us > utc_us(datetime(2020, 1, 1)))
+                                   & (table.changes_us < utc_us(datetime(2026, 1, 1)))]:
+        switch = EPOCH + timedelta(microseconds=int(change))
+        instants += [switch - timedelta(microseconds=1), switch, switch + timedelta(minutes=30)]
+
+    expected = [pytz_offset_us(tz, instant) for instant in instants]
+    as_us = np.array([utc_us(instant) for instant in instants], dtype=np.int64)
+
+    assert [table.offset_us(value) for value in as_us.tolist()] == expected
+    assert table.offsets_at(as_us).tolist() == expected
+    assert (table.to_local_us(as_us) - as_us).tolist() == expected
+
+
+def test_switches_and_unknown_zones():
+    chicago = offset_table("America/Chicago")
+    spring = utc_us(datetime(2023, 3, 12, 8))  # 02:00 CST -> 03:00 CDT, 02:xx local never happens
+    fall = utc_us(datetime(2023, 11, 5, 7))  # 02:00 CDT -> 01:00 CST, 01:xx local happens twice
+    assert spring in chicago.changes_us and fall in chicago.changes_us
+    hour = 3600 * 1_000_000
+    assert chicago.offsets_at(np.array([spring - 1, spring, fall - 1, fall])).tolist() == [
+        -6 * hour, -5 * hour, -5 * hour, -6 * hour]
+
+    assert len(offset_table("UTC").changes_us) == 0
+    assert offset_table("America/Chicago") is chicago
+    with pytest.raises(pytz.UnknownTimeZoneError):
+        offset_table("Mars/Olympus_Mons")
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from report_engine import NS_PER_DAY, POLL_BUFFER, to_ns
+from tz_offsets import offset_table
+
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+POLL_BUFFER_NS = int(POLL_BUFFER.total_seconds()) * 1_000_000_000
+EMPTY_NS = np.empty(0, dtype=np.int64)
+
+
+def _push(array: np.ndarray, used: int, value) -> np.ndarray:
+    if used == len(array):
+        grown = np.empty(max(8, 2 * len(array)), dtype=array.dtype)
+        grown[:used] = array[:used]
+        array = grown
+    array[used] = value
+    return array
+
+
+def _datetime(ns: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+class StatusTimeline:
+    """One store's polls kept as runs of equal status in NumPy arrays.
+
+    Every poll time is kept (ns since the epoch, sorted) so a window can find its
+    first poll by binary search; ``run_first`` indexes the first poll of each
+    run. A run lasts until the next run's first poll, and the last run until the
+    end of the window asked for. Runs are measured a store-local day at a time,
+    so uptime needs one business-hours lookup per run and day rather than per
+    poll, with the per-poll walk's results.
+    """
+
+    __slots__ = ("_poll_ns", "_active", "_size", "_run_first", "_runs")
+
+    def __init__(self, poll_ns=EMPTY_NS, active=()):
+        poll_ns = np.asarray(poll_ns, dtype=np.int64)
+        active = np.asarray(active, dtype=bool)
+        order = np.argsort(poll_ns, kind="stable")
+        self._load(poll_ns[order], active[order])
+
+    @classmethod
+    def from_polls(cls, polls) -> "StatusTimeline":
+        """From ``(timestamp_utc, status)`` tuples in order; naive timestamps are UTC."""
+        return cls(pd.to_datetime([ts for ts, _ in polls], utc=True).asi8, [status == "active" for _, status in polls])
+
+    def _load(self, poll_ns: np.ndarray, active: np.ndarray):
+        self._poll_ns = poll_ns.copy()
+        self._active = active.copy()
+        self._size = len(poll_ns)
+        changed = np.ones(len(poll_ns), dtype=bool)
+        changed[1:] = active[1:] != active[:-1]
+        self._run_first = np.flatnonzero(changed)
+        self._runs = len(self._run_first)
+
+    @property
+    def poll_ns(self) -> np.ndarray:
+        return self._poll_ns[:self._size]
+
+    @property
+    def run_first(self) -> np.ndarray:
+        return self._run_first[:self._runs]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def run_count(self) -> int:
+        return self._runs
+
+    def append(self, timestamp: datetime, status: str):
+        """Add one poll, extending the last run when the status is unchanged."""
+        ns, active = to_ns(timestamp), status == "active"
+        if self._size and ns < self._poll_ns[self._size - 1]:
+            # Late poll: re-sort, keeping it after polls with the same time
+            poll_ns = np.append(self.poll_ns, ns)
+            order = np.argsort(poll_ns, kind="stable")
+            self._load(poll_ns[order], np.append(self._active[:self._size], active)[order])
+            return
+
+        if not self._runs or self._active[self._size - 1] != active:
+            self._run_first = _push(self._run_first, self._runs, self._size)
+            self._runs += 1
+        self._poll_ns = _push(self._poll_ns, self._size, ns)
+        self._active = _push(self._active, self._size, active)
+        self._size += 1
+
+    def has_polls(self, start_ns: int, end_ns: int) -> bool:
+        poll_ns = self.poll_ns
+        return np.searchsorted(poll_ns, start_ns, "left") < np.searchsorted(poll_ns, end_ns, "right")
+
+    def window(self, start_ns: int, end_ns: int, tz_name: str = "UTC"):
+        """``(starts, ends, active)`` of the runs from the first poll at or after ``start_ns`` to ``end_ns``.
+
+        Runs are also cut at the first poll of each local day of ``tz_name`` and
+        wherever its UTC offset changes. get_business_hours_in_period places an
+        interval's openings by the local day and offset at its start, so a run
+        whose polls all start on one local day and offset measures the same as
+        its polls one by one.
+        """
+        poll_ns = self.poll_ns
+        lo = np.searchsorted(poll_ns, start_ns, "left")
+        hi = np.searchsorted(poll_ns, end_ns, "right")
+        if lo >= hi:
+            return EMPTY_NS, EMPTY_NS, np.empty(0, dtype=bool)
+
+        run_first = self.run_first
+        r_lo = np.searchsorted(run_first, lo, "right") - 1
+        r_hi = np.searchsorted(run_first, hi - 1, "right") - 1
+        firsts = run_first[r_lo:r_hi + 1].copy()
+        firsts[0] = lo
+
+        inside = poll_ns[lo:hi]
+        offsets = offset_table(tz_name).offsets_at(inside // 1000) * 1000
+        local_day = (inside + offsets) // NS_PER_DAY
+        cuts = np.flatnonzero((local_day[1:] != local_day[:-1]) | (offsets[1:] != offsets[:-1])) + lo + 1
+        if len(cuts):
+            firsts = np.union1d(firsts, cuts)
+
+        starts = poll_ns[firsts]
+        ends = np.empty_like(starts)
+        ends[:-1] = starts[1:]
+        ends[-1] = end_ns
+        return starts, ends, self._active[firsts]
+
+    def uptime(self, start: datetime, end: datetime, business_hours, tz_name: str = "UTC"):
+        """Uptime/downtime hours in ``[start, end]`` by calculate_uptime_downtime's rules.
+
+        ``business_hours(start, end)`` gives the business hours of an interval
+        for a store in ``tz_name``.
+        """
+        start_ns, end_ns = to_ns(start), to_ns(end)
+        if not self.has_polls(start_ns - POLL_BUFFER_NS, end_ns):
+            return business_hours(start, end), 0.0
+
+        total_uptime = 0.0
+        total_downtime = 0.0
+        for run_start, run_end, active in zip(*self.window(start_ns, end_ns, tz_name)):
+            if run_start < run_end:
+                duration = business_hours(_datetime(run_start), _datetime(run_end))
+                if active:
+                    total_uptime += duration
+                else:
+                    total_downtime += duration
+        return total_uptime, total_downtime
@@ -0,0 +1,71 @@
+from bisect import bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pytz
+
+US_PER_SECOND = 1_000_000
+EPOCH = datetime(1970, 1, 1)
+BEFORE_ALL = np.iinfo(np.int64).min
+
+
+def _us(delta) -> int:
+    return (delta.days * 86_400 + delta.seconds) * US_PER_SECOND + delta.microseconds
+
+
+class OffsetTable:
+    """A timezone's UTC offsets as sorted transition instants, so UTC -> local is a binary search.
+
+    Built from pytz's own tables, so every lookup matches
+    ``dt.astimezone(tz).utcoffset()``. Going from UTC to local time is never
+    ambiguous: an instant in a DST gap or overlap just gets the offset in force
+    at it. ``transitions_us`` (µs since the epoch) starts at ``BEFORE_ALL`` and
+    ``offsets_us[i]`` applies from ``transitions_us[i]`` on.
+    """
+
+    __slots__ = ("tz_name", "transitions_us", "offsets_us", "_transitions", "_offsets")
+
+    def __init__(self, tz_name: str, transitions_us, offsets_us):
+        self.tz_name = tz_name
+        self.transitions_us = np.asarray(transitions_us, dtype=np.int64)
+        self.offsets_us = np.asarray(offsets_us, dtype=np.int64)
+        self._transitions = self.transitions_us.tolist()  # bisect on lists beats NumPy for one value
+        self._offsets = self.offsets_us.tolist()
+
+    @classmethod
+    def from_pytz(cls, tz_name: str) -> "OffsetTable":
+        tz = pytz.timezone(tz_name)
+        times = getattr(tz, "_utc_transition_times", None)
+        if not times:
+            return cls(tz_name, [BEFORE_ALL], [_us(tz.utcoffset(EPOCH))])
+
+        transitions, offsets = [BEFORE_ALL], [_us(tz._transition_info[0][0])]
+        for when, (offset, _, _) in zip(times[1:], tz._transition_info[1:]):
+            if _us(offset) != offsets[-1]:  # skip abbreviation-only and DST-flag-only changes
+                transitions.append(_us(when - EPOCH))
+                offsets.append(_us(offset))
+        return cls(tz_name, transitions, offsets)
+
+    @property
+    def changes_us(self) -> np.ndarray:
+        """Instants at which the offset changes, without the leading ``BEFORE_ALL``."""
+        return self.transitions_us[1:]
+
+    def offset_us(self, utc_us: int) -> int:
+        return self._offsets[bisect_right(self._transitions, utc_us) - 1]
+
+    def offsets_at(self, utc_us: np.ndarray) -> np.ndarray:
+        """Offsets in force at each instant of ``utc_us`` (µs since the epoch)."""
+        return self.offsets_us[np.searchsorted(self.transitions_us, utc_us, "right") - 1]
+
+    def to_local_us(self, utc_us: np.ndarray) -> np.ndarray:
+        """Local wall-clock time of each instant, as µs since the local epoch."""
+        utc_us = np.asarray(utc_us, dtype=np.int64)
+        return utc_us + self.offsets_at(utc_us)
+
+
+@lru_cache(maxsize=None)
+def offset_table(tz_name: str) -> OffsetTable:
+    """Cached per zone; raises pytz.UnknownTimeZoneError like pytz.timezone."""
+    return OffsetTable.from_pytz(tz_name)